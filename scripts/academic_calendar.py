@@ -0,0 +1,262 @@
+#!/usr/bin/env python3
+"""
+Calendar engine for the academic CLI
+Expands schedule.json classes and exams into dated occurrences, answers
+range and conflict queries, and streams them out as iCalendar
+"""
+
+import re
+import heapq
+import bisect
+import hashlib
+from datetime import date, datetime, time, timedelta, timezone
+from functools import lru_cache
+from typing import Dict, Iterable, Iterator, List, NamedTuple, Optional, TextIO, Tuple
+
+WEEKDAYS = {
+    "monday": 0, "mon": 0,
+    "tuesday": 1, "tue": 1, "tues": 1,
+    "wednesday": 2, "wed": 2,
+    "thursday": 3, "thu": 3, "thur": 3, "thurs": 3,
+    "friday": 4, "fri": 4,
+    "saturday": 5, "sat": 5,
+    "sunday": 6, "sun": 6,
+}
+
+# Length assumed when a schedule entry only gives a start time
+DEFAULT_CLASS_MINUTES = 60
+DEFAULT_EXAM_MINUTES = 120
+
+# Weeks of expanded class meetings kept per calendar
+WEEK_CACHE_SIZE = 64
+# Distinct schedule time strings whose parse is remembered (the daemon keeps them for its lifetime)
+TIME_CACHE_SIZE = 1024
+
+_TIME_RE = re.compile(r"(\d{1,2})(?::(\d{2}))?\s*([ap])?\.?\s*m?\.?", re.IGNORECASE)
+
+class Occurrence(NamedTuple):
+    """One dated class meeting or exam"""
+    start: datetime
+    end: datetime
+    course: str
+    kind: str        # "class", or the exam type (Midterm, Final, ...)
+    location: str
+    all_day: bool = False
+
+@lru_cache(maxsize=TIME_CACHE_SIZE)
+def parse_time_range(text: str) -> Optional[Tuple[time, Optional[time]]]:
+    """Parse '10:00 AM', '14:30' or '10:00-11:15 AM' into (start, end)"""
+    parts = list(_TIME_RE.finditer(text or ""))
+    if not parts:
+        return None
+
+    # A trailing AM/PM applies to both ends of a range ("10-11:15 am")
+    last_meridiem = parts[-1].group(3)
+    times = []
+    for match in parts[:2]:
+        hour = int(match.group(1))
+        minute = int(match.group(2) or 0)
+        meridiem = (match.group(3) or last_meridiem or "").lower()
+        if meridiem == "p" and hour < 12:
+            hour += 12
+        elif meridiem == "a" and hour == 12:
+            hour = 0
+        if hour > 23 or minute > 59:
+            return None
+        times.append(time(hour, minute))
+
+    return times[0], (times[1] if len(times) > 1 else None)
+
+def _end_of(start: datetime, end_time: Optional[time], default_minutes: int) -> datetime:
+    if end_time is None:
+        return start + timedelta(minutes=default_minutes)
+    end = datetime.combine(start.date(), end_time)
+    return end if end > start else start + timedelta(minutes=default_minutes)
+
+class AcademicCalendar:
+    """Typed, pre-parsed view of schedule.json"""
+
+    def __init__(self, schedule: Dict):
+        # weekday -> [(start time, end time, course, location)], sorted by start
+        self.weekly = {day: [] for day in range(7)}
+        self.unparsed = []
+        exams = []
+
+        for course, schedule_data in schedule.items():
+            for class_info in schedule_data.get("classes", []):
+                weekday = WEEKDAYS.get(class_info["day"].strip().lower())
+                parsed = parse_time_range(class_info["time"])
+                if weekday is None or parsed is None:
+                    self.unparsed.append((course, class_info))
+                    continue
+                self.weekly[weekday].append((parsed[0], parsed[1], course, class_info.get("location", "")))
+
+            for exam in schedule_data.get("exams", []):
+                try:
+                    # Dates may be written as datetimes ("2024-12-10T09:00"), as the CLI always accepted
+                    exam_day = datetime.fromisoformat(exam["date"]).date()
+                except ValueError:
+                    self.unparsed.append((course, exam))
+                    continue
+                parsed = parse_time_range(exam.get("time", ""))
+                if parsed:
+                    start = datetime.combine(exam_day, parsed[0])
+                    end = _end_of(start, parsed[1], DEFAULT_EXAM_MINUTES)
+                    all_day = False
+                else:
+                    start = datetime.combine(exam_day, time())
+                    end = start + timedelta(days=1)
+                    all_day = True
+                exams.append(Occurrence(start, end, course, exam["type"], exam.get("location", ""), all_day))
+
+        for meetings in self.weekly.values():
+            meetings.sort(key=lambda m: m[0])
+        exams.sort()
+        self.exams = exams
+        self._exam_starts = [exam.start for exam in exams]
+        # Per calendar, so a replaced calendar and its weeks are freed together
+        self._weeks = {}
+
+    def _week(self, monday: date) -> Tuple[Occurrence, ...]:
+        """All class meetings in the week starting on monday, sorted by start"""
+        if monday in self._weeks:
+            return self._weeks[monday]
+        if len(self._weeks) >= WEEK_CACHE_SIZE:
+            self._weeks.clear()
+        occurrences = []
+        for weekday in range(7):
+            day = monday + timedelta(days=weekday)
+            for start_time, end_time, course, location in self.weekly[weekday]:
+                start = datetime.combine(day, start_time)
+                end = _end_of(start, end_time, DEFAULT_CLASS_MINUTES)
+                occurrences.append(Occurrence(start, end, course, "class", location))
+        self._weeks[monday] = tuple(occurrences)
+        return self._weeks[monday]
+
+    def classes(self, start: datetime, end: datetime) -> Iterator[Occurrence]:
+        """Class meetings starting in [start, end), in order"""
+        monday = start.date() - timedelta(days=start.weekday())
+        while monday <= end.date():
+            for occurrence in self._week(monday):
+                if occurrence.start >= end:
+                    return
+                if occurrence.start >= start:
+                    yield occurrence
+            monday += timedelta(days=7)
+
+    def exams_between(self, start: datetime, end: datetime) -> List[Occurrence]:
+        """Exams starting in [start, end), in order"""
+        lo = bisect.bisect_left(self._exam_starts, start)
+        hi = bisect.bisect_left(self._exam_starts, end)
+        return self.exams[lo:hi]
+
+    def occurrences(self, start: datetime, end: datetime, kinds: str = "all") -> Iterator[Occurrence]:
+        """Classes and/or exams starting in [start, end), merged in start order"""
+        streams = []
+        if kinds in ("all", "classes"):
+            streams.append(self.classes(start, end))
+        if kinds in ("all", "exams"):
+            streams.append(iter(self.exams_between(start, end)))
+        return heapq.merge(*streams)
+
+    def conflicts(self, start: datetime, end: datetime) -> Iterator[Tuple[Occurrence, Occurrence]]:
+        """Pairs of overlapping occurrences in the window (sweep over an end-time heap)"""
+        active = []  # (end, seq, occurrence) for occurrences still in progress
+        for seq, occurrence in enumerate(self.occurrences(start, end)):
+            while active and active[0][0] <= occurrence.start:
+                heapq.heappop(active)
+            for _, _, other in active:
+                yield other, occurrence
+            heapq.heappush(active, (occurrence.end, seq, occurrence))
+
+def _ics_escape(text: str) -> str:
+    return (text.replace("\\", "\\\\").replace(";", "\\;")
+                .replace(",", "\\,").replace("\n", "\\n"))
+
+def _ics_fold(line: str) -> str:
+    """Fold a content line to 75 octets as RFC 5545 requires"""
+    if len(line.encode()) <= 75:
+        return line + "\r\n"
+    chunks = []
+    current = ""
+    for char in line:
+        limit = 75 if not chunks else 74
+        if len((current + char).encode()) > limit:
+            chunks.append(current)
+            current = char
+        else:
+            current += char
+    chunks.append(current)
+    return "\r\n ".join(chunks) + "\r\n"
+
+def write_ical(occurrences: Iterable[Occurrence], out: TextIO, calendar_name: str = "Academic Schedule") -> int:
+    """Stream occurrences to out as an iCalendar document; returns the event count"""
+    stamp = datetime.now(timezone.utc).strftime("%Y%m%dT%H%M%SZ")
+    out.write("BEGIN:VCALENDAR\r\nVERSION:2.0\r\nPRODID:-//uni//academic_cli//EN\r\n")
+    out.write(_ics_fold(f"X-WR-CALNAME:{_ics_escape(calendar_name)}"))
+
+    count = 0
+    for occurrence in occurrences:
+        uid_source = f"{occurrence.course}|{occurrence.kind}|{occurrence.start.isoformat()}"
+        uid = hashlib.sha1(uid_source.encode()).hexdigest()
+        if occurrence.all_day:
+            timing = (f"DTSTART;VALUE=DATE:{occurrence.start:%Y%m%d}\r\n"
+                      f"DTEND;VALUE=DATE:{occurrence.end:%Y%m%d}\r\n")
+        else:
+            timing = (f"DTSTART:{occurrence.start:%Y%m%dT%H%M%S}\r\n"
+                      f"DTEND:{occurrence.end:%Y%m%dT%H%M%S}\r\n")
+        summary = occurrence.course if occurrence.kind == "class" else f"{occurrence.course} {occurrence.kind}"
+
+        out.write("BEGIN:VEVENT\r\n")
+        out.write(f"UID:{uid}@academic_cli\r\nDTSTAMP:{stamp}\r\n")
+        out.write(timing)
+        out.write(_ics_fold(f"SUMMARY:{_ics_escape(summary)}"))
+        if occurrence.location:
+            out.write(_ics_fold(f"LOCATION:{_ics_escape(occurrence.location)}"))
+        out.write("END:VEVENT\r\n")
+        count += 1
+
+    out.write("END:VCALENDAR\r\n")
+    return count
+
+def _ics_unescape(text: str) -> str:
+    return re.sub(r"\\([\;,nN])", lambda m: "\n" if m.group(1) in "nN" else m.group(1), text)
+
+def iter_ics_components(lines: Iterable[str], names: Tuple[str, ...] = ("VEVENT", "VTODO")) -> Iterator[Dict[str, str]]:
+    """Stream components from iCalendar lines as {PROPERTY: value} dicts
+
+    Folded lines are unfolded on the fly and property parameters
+    (e.g. DTSTART;VALUE=DATE) are dropped, so the file is never held in memory.
+    """
+    def logical_lines():
+        pending = None
+        for raw in lines:
+            raw = raw.rstrip("\r\n")
+            if raw[:1] in (" ", "\t") and pending is not None:
+                pending += raw[1:]
+                continue
+            if pending is not None:
+                yield pending
+            pending = raw
+        if pending is not None:
+            yield pending
+
+    component = None
+    for line in logical_lines():
+        if line.upper().startswith("BEGIN:"):
+            if line[6:].strip().upper() in names:
+                component = {"_TYPE": line[6:].strip().upper()}
+        elif line.upper().startswith("END:"):
+            if component is not None and line[4:].strip().upper() == component["_TYPE"]:
+                yield component
+                component = None
+        elif component is not None and ":" in line:
+            key, value = line.split(":", 1)
+            component.setdefault(key.split(";", 1)[0].upper(), _ics_unescape(value))
+
+def ics_date(value: str) -> str:
+    """Convert an iCalendar DATE or DATE-TIME value to YYYY-MM-DD ('' if invalid)"""
+    digits = value.strip()[:8]
+    if len(digits) != 8 or not digits.isdigit():
+        return ""
+    return f"{digits[:4]}-{digits[4:6]}-{digits[6:]}"
@@ -5,59 +5,534 @@ Integrates course management, grade tracking, task management, and calendar
 """
 
 import json
+import gzip
+import os
+import csv
+import bisect
+import itertools
 import sys
 import argparse
+import tempfile
 import subprocess
 from pathlib import Path
 from datetime import datetime, timedelta
 from typing import Dict, List, Optional, Tuple
 
+from catalog import get_catalog
+from file_lock import FileLock
+from academic_calendar import AcademicCalendar, ics_date, iter_ics_components, write_ical
+from grades import FINAL_CATEGORY, GradeBook
+from tracing import span
+
+# Collections larger than this many records are written without indentation
+COMPACT_THRESHOLD = 200
+
+# The task journal is folded into tasks.json once it reaches either limit
+JOURNAL_MAX_ENTRIES = 500
+JOURNAL_MAX_BYTES = 256 * 1024
+# Suffix of a journal renamed aside while its compaction writes tasks.json
+JOURNAL_ASIDE = "compacting"
+
+# Completed tasks older than this many days are moved to the semester archives
+ARCHIVE_AFTER_DAYS = 30
+# Archive of completed tasks that have no semester field
+UNKNOWN_SEMESTER = "unknown"
+
+# Value used for each collection when its file is missing or unreadable
+COLLECTION_DEFAULTS = {
+    "courses": lambda: {},
+    "tasks": lambda: [],
+    "schedule": lambda: {},
+    "settings": lambda: {
+        "current_semester": "Fall 2024",
+        "academic_year": "2024-2025"
+    },
+}
+
+PRIORITY_ORDER = {"urgent": 0, "high": 1, "medium": 2, "low": 3}
+TASK_TYPES = ["assignment", "study", "exam", "project", "reading"]
+
+# iCalendar PRIORITY (1 = highest, 9 = lowest, 0 = undefined) to task priority
+ICS_PRIORITIES = {1: "urgent", 2: "high", 3: "high", 4: "high", 5: "medium",
+                  6: "low", 7: "low", 8: "low", 9: "low"}
+
+def merge_schedule_entries(theirs: Dict, ours: Dict) -> Dict:
+    """Union the classes and exams of two versions of a course's schedule"""
+    merged = {}
+    for field in ("classes", "exams"):
+        entries = list(theirs.get(field, []))
+        entries.extend(entry for entry in ours.get(field, []) if entry not in entries)
+        merged[field] = entries
+    return merged
+
+def validate_task_fields(fields: Dict) -> Optional[str]:
+    """Return a description of what is wrong with imported task fields, or None"""
+    if fields.get("extra"):
+        return f"{len(fields['extra'])} more fields than the header"
+    if not fields["title"]:
+        return "missing title"
+    if fields["due_date"]:
+        try:
+            datetime.strptime(fields["due_date"], "%Y-%m-%d")
+        except ValueError:
+            return f"invalid due date '{fields['due_date']}' (use YYYY-MM-DD)"
+    if fields["priority"] and fields["priority"] not in PRIORITY_ORDER:
+        return f"unknown priority '{fields['priority']}'"
+    if fields["type"] and fields["type"] not in TASK_TYPES:
+        return f"unknown type '{fields['type']}'"
+    return None
+
+class TaskIndex:
+    """Tasks bucketed by status and due date, built in a single pass"""
+    
+    def __init__(self, tasks: List[Dict]):
+        self.by_status = {}      # status -> tasks, in list order
+        self.open_by_due = {}    # "YYYY-MM-DD" -> unfinished tasks due that day
+        completed = []
+        
+        for task in tasks:
+            status = task["status"]
+            self.by_status.setdefault(status, []).append(task)
+            if status == "completed":
+                if task["completed"]:
+                    completed.append(task)
+            elif task["due_date"]:
+                self.open_by_due.setdefault(task["due_date"], []).append(task)
+        
+        # ISO timestamps and dates sort chronologically as plain strings
+        self.due_dates = sorted(self.open_by_due)
+        completed.sort(key=lambda t: t["completed"])
+        self.completed = completed
+        self.completed_times = [t["completed"] for t in completed]
+        self._sorted_by_status = {}
+    
+    def due_on(self, day: str) -> List[Dict]:
+        """Unfinished tasks due on day"""
+        return self.open_by_due.get(day, [])
+    
+    def due_between(self, start: str = "", end: str = "9999-12-31"):
+        """Yield unfinished tasks due in [start, end], earliest first"""
+        lo = bisect.bisect_left(self.due_dates, start)
+        hi = bisect.bisect_right(self.due_dates, end)
+        for day in self.due_dates[lo:hi]:
+            yield from self.open_by_due[day]
+    
+    def completed_since(self, timestamp: str) -> List[Dict]:
+        """Completed tasks finished at or after timestamp, oldest first"""
+        return self.completed[bisect.bisect_left(self.completed_times, timestamp):]
+    
+    def sorted_by_due(self, status: str) -> List[Dict]:
+        """Tasks with status ordered by due date then priority (undated last)"""
+        if status not in self._sorted_by_status:
+            self._sorted_by_status[status] = sorted(self.by_status.get(status, []), key=task_sort_key)
+        return self._sorted_by_status[status]
+
+def task_sort_key(task: Dict):
+    """Sort by due date, then priority"""
+    return (task["due_date"] or "9999-12-31", PRIORITY_ORDER.get(task["priority"], 2))
+
 class UnifiedAcademicSystem:
     def __init__(self, root_dir="~/university"):
         self.root_dir = Path(root_dir).expanduser()
         self.data_dir = self.root_dir / ".academic_data"
-        self.data_dir.mkdir(exist_ok=True)
         
         # Data files
         self.courses_file = self.data_dir / "courses.json"
         self.tasks_file = self.data_dir / "tasks.json"
         self.schedule_file = self.data_dir / "schedule.json"
         self.settings_file = self.data_dir / "settings.json"
+        self._files = {
+            "courses": self.courses_file,
+            "tasks": self.tasks_file,
+            "schedule": self.schedule_file,
+            "settings": self.settings_file,
+        }
+        
+        # Task mutations appended since tasks.json was last written (JSON lines)
+        self.journal_file = self.data_dir / "tasks.journal"
+        self._journal_entries = 0
+        self._journal_bytes = 0
+        
+        # Archived completed tasks, one gzipped JSON list per semester
+        self.archive_dir = self.data_dir / "archive"
         
-        # Load all data
-        self.load_data()
+        # Held while merging and writing, so concurrent CLI runs don't clobber each other
+        self._lock = FileLock(self.data_dir / ".lock")
+        
+        # Collections loaded so far, the file stamps they were read from,
+        # those modified since the last save, and which of their keys changed
+        self._loaded = {}
+        self._stamps = {}
+        self._dirty = set()
+        self._changed_keys = {}
+        self._task_index = None
+        self._calendar = None
+        
+        # Standings come from the root's .grades.json via its aggregate cache
+        self.gradebook = GradeBook(self.root_dir)
     
     def load_data(self):
-        """Load all data from JSON files"""
-        self.courses = self.load_json(self.courses_file, {})
-        self.tasks = self.load_json(self.tasks_file, [])
-        self.schedule = self.load_json(self.schedule_file, {})
-        self.settings = self.load_json(self.settings_file, {
-            "current_semester": "Fall 2024",
-            "academic_year": "2024-2025"
-        })
+        """Discard loaded collections so they are re-read from disk on next access"""
+        self._loaded.clear()
+        self._stamps.clear()
+        self._dirty.clear()
+        self._changed_keys.clear()
+        self._task_index = None
+        self._calendar = None
+    
+    def _file_stamp(self, name: str) -> Tuple:
+        """(mtime, size) of the files a collection is read from"""
+        paths = [self._files[name]]
+        if name == "tasks":
+            paths.append(self.journal_file)
+        stamp = []
+        for path in paths:
+            try:
+                st = path.stat()
+                stamp.append((st.st_mtime_ns, st.st_size))
+            except FileNotFoundError:
+                stamp.append(None)
+        return tuple(stamp)
+    
+    def refresh(self):
+        """Drop cached collections whose files were changed by another process"""
+        for name in list(self._loaded):
+            if name not in self._dirty and self._stamps.get(name) != self._file_stamp(name):
+                del self._loaded[name]
+                if name == "tasks":
+                    self._task_index = None
+                elif name == "schedule":
+                    self._calendar = None
+        self.gradebook.refresh()
+    
+    def _collection(self, name: str):
+        """Return a collection, parsing its JSON file on first access"""
+        if name not in self._loaded:
+            self._stamps[name] = self._file_stamp(name)
+            self._loaded[name] = self.load_json(self._files[name], COLLECTION_DEFAULTS[name]())
+            if name == "tasks":
+                self._replay_journal(self._loaded[name])
+        return self._loaded[name]
+    
+    @property
+    def courses(self) -> Dict:
+        return self._collection("courses")
+    
+    @property
+    def tasks(self) -> List[Dict]:
+        return self._collection("tasks")
+    
+    @property
+    def task_index(self) -> TaskIndex:
+        """Index over the hot tasks, rebuilt after any task mutation"""
+        if self._task_index is None:
+            self._task_index = TaskIndex(self.tasks)
+        return self._task_index
+    
+    @property
+    def schedule(self) -> Dict:
+        return self._collection("schedule")
+    
+    @property
+    def settings(self) -> Dict:
+        return self._collection("settings")
     
     def load_json(self, file_path: Path, default):
         """Load JSON data with fallback to default"""
         if file_path.exists():
             try:
-                with open(file_path, 'r') as f:
+                with span("json.load", "io", path=str(file_path)), open(file_path, 'r') as f:
                     return json.load(f)
             except:
                 return default
         return default
     
+    # TASK JOURNAL
+    def _snapshot_id(self) -> str:
+        """Identity of the current tasks.json; every snapshot write (temp file + rename) changes it"""
+        try:
+            st = self.tasks_file.stat()
+            return f"{st.st_ino}-{st.st_mtime_ns}"
+        except FileNotFoundError:
+            return "none"
+    
+    def _set_aside_journals(self, snapshot: str = "*") -> List[Path]:
+        """Journals a compaction renamed aside, oldest first; only those for `snapshot` if given
+        
+        They are named tasks.journal.compacting-<snapshot id>-<n>, after the
+        tasks.json they apply on top of.
+        """
+        if not self.data_dir.exists():
+            return []
+        paths = self.data_dir.glob(f"{self.journal_file.name}.{JOURNAL_ASIDE}-{snapshot}-*")
+        return sorted(paths, key=lambda path: int(path.name.rsplit("-", 1)[1]))
+    
+    def _replay_journal(self, tasks: List[Dict]):
+        """Apply journal entries written since the last tasks.json snapshot
+        
+        A journal set aside by a compaction that died before writing its
+        snapshot still applies; once the snapshot was written it's already in
+        there and is skipped (replaying it would revive archived tasks).
+        """
+        self._journal_entries = 0
+        self._journal_bytes = 0
+        journals = self._set_aside_journals(self._snapshot_id())
+        if self.journal_file.exists():
+            journals.append(self.journal_file)
+        
+        by_id = {task["id"]: task for task in tasks}
+        for journal in journals:
+            with span("journal.replay", "io", path=str(journal)), open(journal, 'r') as f:
+                for line in f:
+                    self._journal_bytes += len(line.encode())
+                    try:
+                        entry = json.loads(line)
+                    except ValueError:
+                        continue  # torn final line from an interrupted append
+                    self._journal_entries += 1
+                    self._apply_journal_entry(tasks, by_id, entry)
+    
+    def _apply_journal_entry(self, tasks: List[Dict], by_id: Dict, entry: Dict):
+        """Apply one journal entry to the snapshot it was written after
+        
+        Re-applying entries to that same snapshot is harmless; applying them
+        to a later snapshot is not, which is why compaction sets journals aside.
+        """
+        if entry["op"] == "add":
+            task = entry["task"]
+            if task["id"] in by_id:
+                by_id[task["id"]].update(task)
+            else:
+                tasks.append(task)
+                by_id[task["id"]] = task
+        elif entry["op"] == "update":
+            task = by_id.get(entry["id"])
+            if task is not None:
+                task.update(entry["fields"])
+    
+    def record_task_change(self, entry: Dict):
+        """Append a task mutation to the journal, compacting when it grows too large"""
+        self.record_task_changes([entry])
+    
+    def record_task_changes(self, entries: List[Dict]):
+        """Append a batch of task mutations to the journal with a single write"""
+        self._task_index = None
+        with self._lock:
+            if self._stamps.get("tasks") != self._file_stamp("tasks"):
+                self._rebase_tasks(entries)
+            
+            if len(entries) >= JOURNAL_MAX_ENTRIES:
+                # Cheaper to snapshot once than to journal and then compact
+                self.compact_tasks()
+                return
+            
+            payload = "".join(json.dumps(entry, separators=(",", ":")) + "\n" for entry in entries)
+            self.data_dir.mkdir(exist_ok=True)
+            with span("journal.append", "io", entries=len(entries)), open(self.journal_file, 'a') as f:
+                f.write(payload)
+                f.flush()
+                os.fsync(f.fileno())
+            
+            self._journal_entries += len(entries)
+            self._journal_bytes += len(payload.encode())
+            self._stamps["tasks"] = self._file_stamp("tasks")
+            if self._journal_entries >= JOURNAL_MAX_ENTRIES or self._journal_bytes >= JOURNAL_MAX_BYTES:
+                self.compact_tasks()
+    
+    def _rebase_tasks(self, entries: List[Dict]):
+        """Reload tasks written by another process and re-apply our pending entries
+
+        Added tasks whose id was taken in the meantime get a fresh id.
+        """
+        self._loaded.pop("tasks", None)
+        self._task_index = None
+        tasks = self.tasks
+        by_id = {task["id"]: task for task in tasks}
+        next_id = self.next_task_id()
+        for entry in entries:
+            if entry["op"] == "add" and entry["task"]["id"] in by_id:
+                entry["task"]["id"] = next_id
+                next_id += 1
+            self._apply_journal_entry(tasks, by_id, entry)
+    
+    def compact_tasks(self):
+        """Write a tasks.json snapshot and start an empty journal"""
+        with self._lock:
+            if "tasks" not in self._dirty and self._stamps.get("tasks") != self._file_stamp("tasks"):
+                # Nothing pending locally; snapshot what other processes wrote
+                self._loaded.pop("tasks", None)
+                self._task_index = None
+            self.data_dir.mkdir(exist_ok=True)
+            tasks = self.tasks
+            # Rename the journal aside under the name of the snapshot it applies to:
+            # if we die before the new snapshot is written, the next load still
+            # replays it; once it is written, the name no longer matches and the
+            # entries (already in the snapshot) are never applied again
+            if self.journal_file.exists():
+                snapshot = self._snapshot_id()
+                number = len(self._set_aside_journals(snapshot))
+                aside = self.data_dir / f"{self.journal_file.name}.{JOURNAL_ASIDE}-{snapshot}-{number}"
+                os.replace(self.journal_file, aside)
+            self.save_json(self.tasks_file, tasks)
+            self._dirty.discard("tasks")
+            for path in self._set_aside_journals():
+                path.unlink(missing_ok=True)
+            self._journal_entries = 0
+            self._journal_bytes = 0
+            self._stamps["tasks"] = self._file_stamp("tasks")
+    
+    def next_task_id(self) -> int:
+        """Return an id not used by any existing or archived task"""
+        highest = max((task["id"] for task in self.tasks), default=0)
+        return max(highest, self.settings.get("max_archived_task_id", 0)) + 1
+    
+    # TASK ARCHIVE
+    def archive_file(self, semester: str) -> Path:
+        """Archive file holding the completed tasks of a semester"""
+        slug = "".join(c if c.isalnum() else "_" for c in semester.lower()).strip("_")
+        return self.archive_dir / f"{slug or 'unknown'}.json.gz"
+    
+    def load_archive(self, archive_file: Path) -> List[Dict]:
+        """Load the tasks stored in one archive file"""
+        if not archive_file.exists():
+            return []
+        with span("json.load", "io", path=str(archive_file)), gzip.open(archive_file, 'rt') as f:
+            return json.load(f)
+    
+    def iter_archived_tasks(self, semester: str = ""):
+        """Yield archived tasks, from one semester or from all of them"""
+        if semester:
+            archive_files = [self.archive_file(semester)]
+        elif self.archive_dir.exists():
+            with span("scan", "scan", path=str(self.archive_dir)):
+                archive_files = sorted(self.archive_dir.glob("*.json.gz"))
+        else:
+            archive_files = []
+        
+        for archive_file in archive_files:
+            yield from self.load_archive(archive_file)
+    
+    def archive_tasks(self, days: int = ARCHIVE_AFTER_DAYS) -> int:
+        """Move completed tasks from past semesters, or older than days, into the archives"""
+        with self._lock:
+            self.refresh()
+            return self._archive_tasks(days)
+    
+    def _archive_tasks(self, days: int) -> int:
+        current_semester = self.settings["current_semester"]
+        cutoff = (datetime.now() - timedelta(days=days)).isoformat()
+        
+        by_semester = {}
+        keep = []
+        for task in self.tasks:
+            # Tasks from before semesters were recorded can't be placed in one:
+            # they go to their own archive, once past the day cutoff
+            semester = task.get("semester") or UNKNOWN_SEMESTER
+            past_semester = semester not in (current_semester, UNKNOWN_SEMESTER)
+            if task["status"] == "completed" and (past_semester or (task["completed"] or "") < cutoff):
+                by_semester.setdefault(semester, []).append(task)
+            else:
+                keep.append(task)
+        
+        if not by_semester:
+            return 0
+        
+        self.archive_dir.mkdir(parents=True, exist_ok=True)
+        archived_ids = []
+        for semester, tasks in by_semester.items():
+            archive_file = self.archive_file(semester)
+            # Merge by id so re-running after an interrupted archive can't duplicate tasks
+            merged = {task["id"]: task for task in self.load_archive(archive_file)}
+            merged.update((task["id"], task) for task in tasks)
+            self.save_json(archive_file, list(merged.values()), compress=True)
+            archived_ids.extend(task["id"] for task in tasks)
+        
+        # Archived ids stay reserved so new tasks never reuse them
+        self.settings["max_archived_task_id"] = max(
+            self.settings.get("max_archived_task_id", 0), max(archived_ids)
+        )
+        self.tasks[:] = keep
+        self.mark_dirty("tasks")
+        self.mark_changed("settings", "max_archived_task_id")
+        self.save_data()
+        return len(archived_ids)
+    
+    def mark_dirty(self, *collections: str):
+        """Flag collections (courses, tasks, schedule, settings) for the next save"""
+        self._dirty.update(collections)
+        if "tasks" in collections:
+            self._task_index = None
+        if "schedule" in collections:
+            self._calendar = None
+    
+    def mark_changed(self, collection: str, *keys: str):
+        """Flag individual records of a dict collection for the next save"""
+        self.mark_dirty(collection)
+        self._changed_keys.setdefault(collection, set()).update(keys)
+    
+    def _merge_from_disk(self, name: str):
+        """Fold records written by another process into our copy of a collection
+
+        Only the keys we changed (see mark_changed) override what is on disk;
+        a collection marked dirty without keys is written back as-is.
+        """
+        keys = self._changed_keys.get(name)
+        if not keys:
+            return
+        ours = self._loaded[name]
+        merged = self.load_json(self._files[name], COLLECTION_DEFAULTS[name]())
+        for key in keys:
+            if key not in ours:
+                merged.pop(key, None)
+            elif name == "schedule" and key in merged:
+                merged[key] = merge_schedule_entries(merged[key], ours[key])
+            else:
+                merged[key] = ours[key]
+        ours.clear()
+        ours.update(merged)
+        if name == "schedule":
+            self._calendar = None
+    
     def save_data(self):
-        """Save all data to JSON files"""
-        self.save_json(self.courses_file, self.courses)
-        self.save_json(self.tasks_file, self.tasks)
-        self.save_json(self.schedule_file, self.schedule)
-        self.save_json(self.settings_file, self.settings)
+        """Save modified collections to their JSON files"""
+        if not self._dirty:
+            return
+        with self._lock:
+            if "tasks" in self._dirty:
+                # A full rewrite of tasks supersedes the journal
+                self.compact_tasks()
+            self.data_dir.mkdir(exist_ok=True)
+            for name in sorted(self._dirty):
+                if self._stamps.get(name) != self._file_stamp(name):
+                    self._merge_from_disk(name)
+                self.save_json(self._files[name], self._loaded[name])
+                self._stamps[name] = self._file_stamp(name)
+            self._dirty.clear()
+            self._changed_keys.clear()
     
-    def save_json(self, file_path: Path, data):
-        """Save data to JSON file"""
-        with open(file_path, 'w') as f:
-            json.dump(data, f, indent=2)
+    def save_json(self, file_path: Path, data, compress: bool = False):
+        """Atomically save data to JSON file (temp file + rename)"""
+        if compress or len(data) > COMPACT_THRESHOLD:
+            dump_args = {"separators": (",", ":")}
+        else:
+            dump_args = {"indent": 2}
+        
+        with span("json.save", "io", path=str(file_path), compress=compress):
+            fd, tmp_path = tempfile.mkstemp(dir=file_path.parent, prefix=f".{file_path.name}.", suffix=".tmp")
+            try:
+                # mkstemp creates 0600 files; keep the permissions a plain open() would give
+                umask = os.umask(0)
+                os.umask(umask)
+                os.chmod(tmp_path, 0o666 & ~umask)
+                payload = json.dumps(data, **dump_args).encode()
+                with os.fdopen(fd, 'wb') as f:
+                    f.write(gzip.compress(payload, mtime=0) if compress else payload)
+                    f.flush()
+                    os.fsync(f.fileno())
+                os.replace(tmp_path, file_path)
+            except BaseException:
+                os.unlink(tmp_path)
+                raise
     
     # COURSE MANAGEMENT
     def add_course(self, name: str, code: str = "", credits: float = 3.0, 
@@ -75,6 +550,7 @@ class UnifiedAcademicSystem:
             "assignments": {},
             "notes_path": str(self.root_dir / name.replace(" ", "_"))
         }
+        self.mark_changed("courses", course_id)
         
         # Create course directory structure
         course_dir = self.root_dir / name.replace(" ", "_")
@@ -99,14 +575,24 @@ $aux_dir = '.latexmk/aux';
         print(f"✓ Added course: {name} ({code}) - {credits} credits")
         print(f"✓ Created .latexmkrc in {course_dir.name}")
         
+    def course_profiles(self):
+        """courses.json entries as summarized in the shared catalog"""
+        courses = get_catalog(self.root_dir).courses(("profile", "files"))
+        profiles = [(key, record) for key, record in courses.items() if "profile" in record]
+        # In courses.json order, as they were listed before the catalog
+        profiles.sort(key=lambda item: item[1]["profile"].get("order", 0))
+        return dict(profiles)
+    
     def list_courses(self):
         """List all courses"""
-        if not self.courses:
+        profiles = self.course_profiles()
+        if not profiles:
             print("No courses found")
             return
         
         print(f"\n=== Courses ({self.settings['current_semester']}) ===")
-        for course_id, course in self.courses.items():
+        for record in profiles.values():
+            course = record["profile"]
             schedule_info = f" [{course['schedule']}]" if course['schedule'] else ""
             print(f"  {course['name']} ({course['code']}) - {course['credits']} credits{schedule_info}")
             if course['instructor']:
@@ -117,7 +603,7 @@ $aux_dir = '.latexmk/aux';
                  priority: str = "medium", task_type: str = "assignment"):
         """Add a new task"""
         task = {
-            "id": len(self.tasks) + 1,
+            "id": self.next_task_id(),
             "title": title,
             "course": course,
             "due_date": due_date,
@@ -126,22 +612,34 @@ $aux_dir = '.latexmk/aux';
             "status": "pending",   # pending, in_progress, completed
             "created": datetime.now().isoformat(),
             "completed": None,
-            "notes": ""
+            "notes": "",
+            "semester": self.settings["current_semester"]
         }
         
         self.tasks.append(task)
-        self.save_data()
+        self.record_task_change({"op": "add", "task": task})
         
         due_info = f" (due: {due_date})" if due_date else ""
         course_info = f" [{course}]" if course else ""
         print(f"✓ Added task: {title}{course_info}{due_info}")
     
-    def list_tasks(self, status: str = "pending", course: str = ""):
-        """List tasks with optional filtering"""
+    def list_tasks(self, status: str = "pending", course: str = "", archived: bool = False):
+        """List tasks with optional filtering, optionally searching the archives too"""
+        if status and not archived:
+            candidates = self.task_index.sorted_by_due(status)
+        else:
+            candidates = self.tasks
+            if archived:
+                candidates = list(candidates) + list(self.iter_archived_tasks())
+            candidates = sorted(
+                (task for task in candidates if not status or task["status"] == status),
+                key=task_sort_key
+            )
+        
+        course_key = course.lower()
         filtered_tasks = [
-            task for task in self.tasks 
-            if (not status or task["status"] == status) and
-               (not course or task["course"].lower() == course.lower())
+            task for task in candidates 
+            if not course or task["course"].lower() == course_key
         ]
         
         if not filtered_tasks:
@@ -150,14 +648,6 @@ $aux_dir = '.latexmk/aux';
             print(f"No tasks found{filter_info}{course_info}")
             return
         
-        # Sort by due date, then priority
-        def sort_key(task):
-            due_date = task["due_date"] or "9999-12-31"
-            priority_order = {"urgent": 0, "high": 1, "medium": 2, "low": 3}
-            return (due_date, priority_order.get(task["priority"], 2))
-        
-        filtered_tasks.sort(key=sort_key)
-        
         print(f"\n=== Tasks ===")
         for task in filtered_tasks:
             priority_icon = {"urgent": "🔥", "high": "⚡", "medium": "📝", "low": "💭"}
@@ -175,7 +665,11 @@ $aux_dir = '.latexmk/aux';
             if task["id"] == task_id:
                 task["status"] = "completed"
                 task["completed"] = datetime.now().isoformat()
-                self.save_data()
+                self.record_task_change({
+                    "op": "update",
+                    "id": task_id,
+                    "fields": {"status": task["status"], "completed": task["completed"]}
+                })
                 print(f"✅ Completed: {task['title']}")
                 return
         print(f"Task {task_id} not found")
@@ -190,13 +684,113 @@ $aux_dir = '.latexmk/aux';
         for task in self.tasks:
             if task["id"] == task_id:
                 task["status"] = status
+                fields = {"status": status}
                 if status == "completed":
                     task["completed"] = datetime.now().isoformat()
-                self.save_data()
+                    fields["completed"] = task["completed"]
+                self.record_task_change({"op": "update", "id": task_id, "fields": fields})
                 print(f"✓ Updated task {task_id} status to: {status}")
                 return
         print(f"Task {task_id} not found")
     
+    def _iter_import_rows(self, source: Path, file_format: str):
+        """Stream raw task fields from a CSV or iCalendar file"""
+        with open(source, 'r', newline='', encoding='utf-8-sig') as f:
+            if file_format == "csv":
+                for row in csv.DictReader(f):
+                    # DictReader collects fields beyond the header as a list under None;
+                    # blank ones (trailing commas) are harmless
+                    extra = [value for value in row.pop(None, None) or [] if value.strip()]
+                    row = {(key or "").strip().lower(): (value or "").strip() for key, value in row.items()}
+                    yield {
+                        "extra": extra,
+                        "title": row.get("title", ""),
+                        "course": row.get("course", ""),
+                        "due_date": row.get("due", row.get("due_date", "")),
+                        "priority": row.get("priority", "").lower(),
+                        "type": row.get("type", "").lower(),
+                    }
+            else:
+                for component in iter_ics_components(f):
+                    ics_priority = component.get("PRIORITY", "0")
+                    priority = ICS_PRIORITIES.get(int(ics_priority) if ics_priority.isdigit() else 0, "")
+                    yield {
+                        "title": component.get("SUMMARY", "").strip(),
+                        "course": component.get("CATEGORIES", "").split(",")[0].strip(),
+                        "due_date": ics_date(component.get("DUE") or component.get("DTSTART", "")),
+                        "priority": priority,
+                        "type": "exam" if "exam" in component.get("SUMMARY", "").lower() else "",
+                    }
+    
+    def import_tasks(self, source: str, course: str = "", file_format: str = "",
+                     dry_run: bool = False) -> Dict[str, int]:
+        """Bulk-import tasks from a CSV or .ics file, committed as one batch"""
+        source_path = Path(source).expanduser()
+        if not source_path.exists():
+            print(f"File not found: {source}")
+            return {}
+        file_format = file_format or ("ics" if source_path.suffix.lower() in (".ics", ".ical") else "csv")
+        
+        # (title, course) -> due dates already present, for dedupe and conflict checks
+        existing = {}
+        for task in self.tasks:
+            key = (task["title"].strip().lower(), task["course"].strip().lower())
+            existing.setdefault(key, set()).add(task["due_date"])
+        
+        counts = {"inserted": 0, "skipped": 0, "conflicting": 0, "invalid": 0}
+        entries = []
+        next_id = self.next_task_id()
+        semester = self.settings["current_semester"]
+        now = datetime.now().isoformat()
+        
+        for line_no, row in enumerate(self._iter_import_rows(source_path, file_format), start=1):
+            row["course"] = row["course"] or course
+            problem = validate_task_fields(row)
+            if problem:
+                counts["invalid"] += 1
+                if counts["invalid"] <= 5:
+                    print(f"  ⚠ Row {line_no}: {problem}")
+                continue
+            
+            key = (row["title"].lower(), row["course"].lower())
+            due_dates = existing.setdefault(key, set())
+            if row["due_date"] in due_dates:
+                counts["skipped"] += 1
+                continue
+            if due_dates:
+                # Same task already exists with a different due date
+                counts["conflicting"] += 1
+                continue
+            due_dates.add(row["due_date"])
+            
+            task = {
+                "id": next_id,
+                "title": row["title"],
+                "course": row["course"],
+                "due_date": row["due_date"],
+                "priority": row["priority"] or "medium",
+                "type": row["type"] or "assignment",
+                "status": "pending",
+                "created": now,
+                "completed": None,
+                "notes": "",
+                "semester": semester
+            }
+            next_id += 1
+            counts["inserted"] += 1
+            if not dry_run:
+                self.tasks.append(task)
+                entries.append({"op": "add", "task": task})
+        
+        if entries:
+            self.record_task_changes(entries)
+        
+        prefix = "Would import" if dry_run else "Imported"
+        print(f"✓ {prefix} {counts['inserted']} tasks from {source_path.name} "
+              f"({counts['skipped']} duplicates skipped, {counts['conflicting']} conflicting, "
+              f"{counts['invalid']} invalid)")
+        return counts
+    
     # SCHEDULE MANAGEMENT
     def add_class_schedule(self, course: str, day: str, time: str, location: str = ""):
         """Add recurring class schedule"""
@@ -211,6 +805,7 @@ $aux_dir = '.latexmk/aux';
         }
         
         self.schedule[course]["classes"].append(class_info)
+        self.mark_changed("schedule", course)
         self.save_data()
         print(f"✓ Added class schedule: {course} - {day} {time}")
     
@@ -227,6 +822,7 @@ $aux_dir = '.latexmk/aux';
         }
         
         self.schedule[course]["exams"].append(exam_info)
+        self.mark_changed("schedule", course)
         self.save_data()
         
         # Auto-create study task
@@ -237,46 +833,76 @@ $aux_dir = '.latexmk/aux';
         print(f"✓ Added exam: {course} {exam_type} on {date}")
         print(f"✓ Created study task (due: {study_due})")
     
+    @property
+    def calendar(self) -> AcademicCalendar:
+        """Pre-parsed class/exam calendar, rebuilt after schedule changes"""
+        if self._calendar is None:
+            self._calendar = AcademicCalendar(self.schedule)
+        return self._calendar
+    
     def show_schedule(self, days: int = 7):
-        """Show upcoming schedule"""
+        """Show upcoming classes and exams"""
         print(f"\n=== Upcoming Schedule ({days} days) ===")
         
-        # Show classes
-        today = datetime.now()
-        days_of_week = ["monday", "tuesday", "wednesday", "thursday", "friday", "saturday", "sunday"]
+        now = datetime.now()
+        today = datetime.combine(now.date(), datetime.min.time())
+        end = today + timedelta(days=days + 1)
+        calendar = self.calendar
         
-        for course, schedule_data in self.schedule.items():
-            for class_info in schedule_data["classes"]:
-                day = class_info["day"].lower()
-                if day in days_of_week:
-                    location_info = f" at {class_info['location']}" if class_info['location'] else ""
-                    print(f"  📚 {course}: {class_info['day']} {class_info['time']}{location_info}")
+        # Show classes
+        for occurrence in calendar.classes(now, end):
+            location_info = f" at {occurrence.location}" if occurrence.location else ""
+            print(f"  📚 {occurrence.course}: {occurrence.start:%a %Y-%m-%d %I:%M %p}{location_info}")
         
         # Show upcoming exams
-        upcoming_exams = []
-        for course, schedule_data in self.schedule.items():
-            for exam in schedule_data["exams"]:
-                exam_date = datetime.fromisoformat(exam["date"])
-                if (exam_date - today).days <= days and exam_date >= today:
-                    upcoming_exams.append((exam_date, course, exam))
-        
-        upcoming_exams.sort()
-        for exam_date, course, exam in upcoming_exams:
-            days_until = (exam_date - today).days
-            time_info = f" at {exam['time']}" if exam['time'] else ""
-            location_info = f" ({exam['location']})" if exam['location'] else ""
-            print(f"  🎯 {course} {exam['type']} in {days_until} days: {exam['date']}{time_info}{location_info}")
+        for exam in calendar.exams_between(today, end):
+            days_until = (exam.start.date() - today.date()).days
+            time_info = "" if exam.all_day else f" at {exam.start:%I:%M %p}"
+            location_info = f" ({exam.location})" if exam.location else ""
+            print(f"  🎯 {exam.course} {exam.kind} in {days_until} days: {exam.start:%Y-%m-%d}{time_info}{location_info}")
+        
+        for course, entry in calendar.unparsed:
+            print(f"  ⚠ Could not read schedule entry for {course}: {entry}")
+    
+    def show_conflicts(self, days: int = 120):
+        """Report overlapping classes and exams in the coming days"""
+        now = datetime.now()
+        found = 0
+        for first, second in self.calendar.conflicts(now, now + timedelta(days=days)):
+            found += 1
+            print(f"  ⚠ {first.start:%a %Y-%m-%d %H:%M}: {first.course} {first.kind} "
+                  f"overlaps {second.course} {second.kind} ({second.start:%H:%M}-{second.end:%H:%M})")
+        if not found:
+            print(f"No conflicts in the next {days} days")
+    
+    def export_ical(self, output: str, days: int = 120) -> int:
+        """Write the next days of classes and exams to an .ics file"""
+        today = datetime.combine(datetime.now().date(), datetime.min.time())
+        occurrences = self.calendar.occurrences(today, today + timedelta(days=days))
+        with open(Path(output).expanduser(), 'w', newline='') as f:
+            count = write_ical(occurrences, f, f"Academic Schedule ({self.settings['current_semester']})")
+        print(f"✓ Exported {count} events to {output}")
+        return count
+    
+    # NOTE SEARCH
+    def search_notes(self, query: str, course: str = "", limit: int = 10, rebuild: bool = False):
+        """Ranked hits for query in the lecture and pset sources (see note_search.py)"""
+        from note_search import search_notes
+        search_notes(self.root_dir, query, course, limit, rebuild)
     
     # DASHBOARD
     def show_dashboard(self):
         """Show comprehensive academic dashboard"""
+        now = datetime.now()
+        today = now.strftime("%Y-%m-%d")
+        index = self.task_index
+        
         print("=" * 60)
-        print(f"   📚 ACADEMIC DASHBOARD - {datetime.now().strftime('%Y-%m-%d')}")
+        print(f"   📚 ACADEMIC DASHBOARD - {today}")
         print("=" * 60)
         
         # Today's tasks
-        today = datetime.now().strftime("%Y-%m-%d")
-        urgent_tasks = [t for t in self.tasks if t["due_date"] == today and t["status"] != "completed"]
+        urgent_tasks = index.due_on(today)
         
         if urgent_tasks:
             print(f"\n🔥 DUE TODAY ({len(urgent_tasks)} tasks):")
@@ -285,23 +911,38 @@ $aux_dir = '.latexmk/aux';
                 print(f"   • {task['title']}{course_info}")
         
         # This week's tasks
-        week_end = (datetime.now() + timedelta(days=7)).strftime("%Y-%m-%d")
-        week_tasks = [t for t in self.tasks 
-                     if t["due_date"] and today <= t["due_date"] <= week_end and t["status"] != "completed"]
+        week_end = (now + timedelta(days=7)).strftime("%Y-%m-%d")
+        week_tasks = list(index.due_between(today, week_end))
         
         if week_tasks:
             print(f"\n📅 THIS WEEK ({len(week_tasks)} tasks):")
-            for task in sorted(week_tasks, key=lambda x: x["due_date"]):
+            for task in week_tasks:
                 course_info = f" [{task['course']}]" if task['course'] else ""
                 print(f"   • {task['due_date']}: {task['title']}{course_info}")
         
         # Course overview
-        print(f"\n📚 COURSES ({len(self.courses)}):")
-        for course_id, course in self.courses.items():
-            print(f"   • {course['name']} ({course['code']})")
+        profiles = self.course_profiles()
+        print(f"\n📚 COURSES ({len(profiles)}):")
+        for record in profiles.values():
+            course = record["profile"]
+            lectures = f" — {len(record['files']['lectures'])} lectures" if "files" in record else ""
+            print(f"   • {course['name']} ({course['code']}){lectures}")
+        
+        # Grade standings, with the average needed on the remaining work to keep an A
+        standings = self.gradebook.standings()
+        if standings:
+            courses, rows = self.gradebook.what_if((90.0,))
+            needed = {course: row[0] for course, row in zip(courses, rows)}
+            print(f"\n🎓 GRADES:")
+            for course, (percentage, graded_weight) in sorted(standings.items()):
+                final_info = ""
+                if course in needed and 0 < needed[course] <= 100:
+                    final_info = (f" — need {needed[course]:.1f}% on {FINAL_CATEGORY}"
+                                  f" and other ungraded work for 90%")
+                print(f"   • {course}: {percentage:.1f}% ({graded_weight:g}% graded){final_info}")
         
         # Recent activity
-        recent_tasks = [t for t in self.tasks if t["status"] == "completed"][-3:]
+        recent_tasks = index.completed[-3:]
         if recent_tasks:
             print(f"\n✅ RECENTLY COMPLETED:")
             for task in reversed(recent_tasks):
@@ -315,12 +956,10 @@ $aux_dir = '.latexmk/aux';
         """Create lecture and associated tasks"""
         # Use existing alec system
         try:
-            result = subprocess.run([
-                "alec", "new-lecture", 
-                "--course", course, 
-                "--number", str(lecture_num),
-                "--title", topic
-            ], capture_output=True, text=True)
+            command = ["alec", "new-lecture", "--course", course, "--number", str(lecture_num), "--title", topic]
+            with span("alec", "subprocess", command=command) as trace:
+                result = subprocess.run(command, capture_output=True, text=True)
+                trace["returncode"] = result.returncode
             
             if result.returncode == 0:
                 print(f"✓ Created lecture {lecture_num}: {topic}")
@@ -336,13 +975,11 @@ $aux_dir = '.latexmk/aux';
     
     def export_weekly_report(self):
         """Generate weekly LaTeX report"""
-        week_start = datetime.now() - timedelta(days=7)
-        completed_tasks = [
-            t for t in self.tasks 
-            if t["completed"] and datetime.fromisoformat(t["completed"]) >= week_start
-        ]
+        now = datetime.now()
+        index = self.task_index
+        completed_tasks = index.completed_since((now - timedelta(days=7)).isoformat())
         
-        latex_report = f"""\\section{{Weekly Report - {datetime.now().strftime('%Y-%m-%d')}}}
+        latex_report = f"""\\section{{Weekly Report - {now.strftime('%Y-%m-%d')}}}
 
 \\subsection{{Completed This Week}}
 \\begin{{itemize}}
@@ -354,18 +991,20 @@ $aux_dir = '.latexmk/aux';
         latex_report += "\\end{itemize}\n"
         
         # Upcoming deadlines
-        upcoming = [t for t in self.tasks if t["due_date"] and t["status"] != "completed"]
+        upcoming = list(itertools.islice(index.due_between(), 5))
         if upcoming:
             latex_report += "\n\\subsection{Upcoming Deadlines}\n\\begin{itemize}\n"
-            for task in sorted(upcoming, key=lambda x: x["due_date"])[:5]:
+            for task in upcoming:
                 course_info = f" ({task['course']})" if task['course'] else ""
                 latex_report += f"    \\item {task['due_date']}: {task['title']}{course_info}\n"
             latex_report += "\\end{itemize}\n"
         
         return latex_report
 
-def main():
-    parser = argparse.ArgumentParser(description="Unified Academic Management System")
+def build_parser(prog: Optional[str] = None) -> argparse.ArgumentParser:
+    """Build the command-line parser for all subcommands"""
+    parser = argparse.ArgumentParser(prog=prog, description="Unified Academic Management System")
+    parser.add_argument("--root", default="~/university", help="Root directory")
     
     subparsers = parser.add_subparsers(dest='command', help='Available commands')
     
@@ -391,15 +1030,32 @@ def main():
     add_task.add_argument('--course', default='', help='Related course')
     add_task.add_argument('--due', default='', help='Due date (YYYY-MM-DD)')
     add_task.add_argument('--priority', choices=['low', 'medium', 'high', 'urgent'], default='medium')
-    add_task.add_argument('--type', choices=['assignment', 'study', 'exam', 'project', 'reading'], default='assignment')
+    add_task.add_argument('--type', choices=TASK_TYPES, default='assignment')
     
     list_tasks = task_subparsers.add_parser('list', help='List tasks')
     list_tasks.add_argument('--status', choices=['pending', 'in_progress', 'completed'], default='pending')
     list_tasks.add_argument('--course', default='', help='Filter by course')
+    list_tasks.add_argument('--archived', action='store_true', help='Also search archived tasks')
     
     complete_task = task_subparsers.add_parser('complete', help='Complete task')
     complete_task.add_argument('--id', type=int, required=True, help='Task ID')
     
+    status_task = task_subparsers.add_parser('status', help='Update task status')
+    status_task.add_argument('--id', type=int, required=True, help='Task ID')
+    status_task.add_argument('--status', choices=['pending', 'in_progress', 'completed'], required=True)
+    
+    task_subparsers.add_parser('compact', help='Fold the task journal into tasks.json')
+    
+    import_tasks = task_subparsers.add_parser('import', help='Import tasks from a CSV or .ics file')
+    import_tasks.add_argument('file', help='CSV (title,course,due,priority,type) or .ics file')
+    import_tasks.add_argument('--course', default='', help='Course for rows that do not name one')
+    import_tasks.add_argument('--format', choices=['csv', 'ics'], default='', help='Override format detection')
+    import_tasks.add_argument('--dry-run', action='store_true', help='Report counts without saving')
+    
+    archive_tasks = task_subparsers.add_parser('archive', help='Archive old completed tasks')
+    archive_tasks.add_argument('--days', type=int, default=ARCHIVE_AFTER_DAYS,
+                               help='Archive tasks completed more than this many days ago')
+    
     # Schedule commands
     schedule_parser = subparsers.add_parser('schedule', help='Schedule management')
     schedule_subparsers = schedule_parser.add_subparsers(dest='schedule_action')
@@ -417,14 +1073,30 @@ def main():
     add_exam.add_argument('--time', default='', help='Time')
     add_exam.add_argument('--location', default='', help='Location')
     
-    schedule_subparsers.add_parser('show', help='Show schedule')
+    show_schedule = schedule_subparsers.add_parser('show', help='Show schedule')
+    show_schedule.add_argument('--days', type=int, default=7, help='Days ahead to show')
+    
+    conflicts = schedule_subparsers.add_parser('conflicts', help='Find overlapping classes/exams')
+    conflicts.add_argument('--days', type=int, default=120, help='Days ahead to check')
+    
+    export_ics = schedule_subparsers.add_parser('export', help='Export schedule to iCalendar')
+    export_ics.add_argument('--output', default='schedule.ics', help='Output .ics file')
+    export_ics.add_argument('--days', type=int, default=120, help='Days ahead to export')
+    
+    # Note search
+    search = subparsers.add_parser('search', help='Search lecture notes and problem sets')
+    search.add_argument('query', help="Words and/or math commands (e.g. 'dihedral group', '\\otimes')")
+    search.add_argument('--course', default='', help='Only search this course')
+    search.add_argument('--limit', type=int, default=10, help='Maximum number of hits')
+    search.add_argument('--rebuild', action='store_true', help='Re-index every file')
     
     # Dashboard
     subparsers.add_parser('dashboard', help='Show dashboard')
     
-    args = parser.parse_args()
-    system = UnifiedAcademicSystem()
-    
+    return parser
+
+def run_command(system: UnifiedAcademicSystem, args: argparse.Namespace):
+    """Dispatch parsed arguments to the matching UnifiedAcademicSystem method"""
     if args.command == 'course':
         if args.course_action == 'add':
             system.add_course(args.name, args.code, args.credits, args.instructor, args.schedule)
@@ -435,9 +1107,19 @@ def main():
         if args.task_action == 'add':
             system.add_task(args.title, args.course, args.due, args.priority, args.type)
         elif args.task_action == 'list':
-            system.list_tasks(args.status, args.course)
+            system.list_tasks(args.status, args.course, args.archived)
         elif args.task_action == 'complete':
             system.complete_task(args.id)
+        elif args.task_action == 'status':
+            system.update_task_status(args.id, args.status)
+        elif args.task_action == 'import':
+            system.import_tasks(args.file, args.course, args.format, args.dry_run)
+        elif args.task_action == 'compact':
+            system.compact_tasks()
+            print("✓ Compacted task journal")
+        elif args.task_action == 'archive':
+            count = system.archive_tasks(args.days)
+            print(f"✓ Archived {count} completed tasks")
     
     elif args.command == 'schedule':
         if args.schedule_action == 'add-class':
@@ -445,7 +1127,14 @@ def main():
         elif args.schedule_action == 'add-exam':
             system.add_exam(args.course, args.type, args.date, args.time, args.location)
         elif args.schedule_action == 'show':
-            system.show_schedule()
+            system.show_schedule(args.days)
+        elif args.schedule_action == 'conflicts':
+            system.show_conflicts(args.days)
+        elif args.schedule_action == 'export':
+            system.export_ical(args.output, args.days)
+    
+    elif args.command == 'search':
+        system.search_notes(args.query, args.course, args.limit, args.rebuild)
     
     elif args.command == 'dashboard':
         system.show_dashboard()
@@ -453,5 +1142,9 @@ def main():
     else:
         system.show_dashboard()  # Default action
 
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    run_command(UnifiedAcademicSystem(args.root), args)
+
 if __name__ == "__main__":
     main()
@@ -0,0 +1,61 @@
+#!/usr/bin/env python3
+"""
+Thin client for the academic CLI
+Takes the same arguments as academic_cli.py. If academic_daemon.py is
+running, the command is answered by the daemon; otherwise this falls back
+to running academic_cli.py directly. Imports are kept to a minimum so
+shell prompts and statuslines can call it cheaply.
+
+Usage:
+  python3 academic_client.py dashboard
+  python3 academic_client.py task list --course math55
+  python3 academic_client.py --root ~/other-university dashboard
+"""
+
+import os
+import sys
+import json
+import socket
+
+DEFAULT_ROOT = "~/university"
+# Same layout as academic_daemon.data_dir() / SOCKET_NAME
+SOCKET_PATH = os.path.join(".academic_data", "academicd.sock")
+CLI = os.path.join(os.path.dirname(os.path.abspath(__file__)), "academic_cli.py")
+
+def root_option(argv):
+    """Value of a leading --root option (academic_cli.py's), without importing argparse"""
+    for i, arg in enumerate(argv):
+        if arg == "--root" and i + 1 < len(argv):
+            return argv[i + 1]
+        if arg.startswith("--root="):
+            return arg[len("--root="):]
+        if not arg.startswith("-"):
+            break  # the subcommand; options after it aren't ours
+    return DEFAULT_ROOT
+
+def main():
+    argv = sys.argv[1:]
+    socket_path = os.path.join(os.path.expanduser(root_option(argv)), SOCKET_PATH)
+    sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    try:
+        sock.connect(socket_path)
+    except OSError:
+        sock.close()
+        os.execv(sys.executable, [sys.executable, CLI, *argv])
+
+    with sock:
+        request = json.dumps({"argv": argv, "cwd": os.getcwd()}) + "\n"
+        sock.sendall(request.encode())
+        with sock.makefile('rb') as reply_file:
+            line = reply_file.readline()
+    try:
+        reply = json.loads(line)
+    except ValueError:
+        sys.stderr.write(f"❌ No reply from the daemon on {socket_path}\n")
+        sys.exit(1)
+
+    sys.stdout.write(reply["output"])
+    sys.exit(reply["status"])
+
+if __name__ == "__main__":
+    main()
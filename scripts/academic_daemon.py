@@ -0,0 +1,204 @@
+#!/usr/bin/env python3
+"""
+Resident server for the academic CLI
+Keeps UnifiedAcademicSystem loaded in memory and answers academic_cli.py
+commands sent by academic_client.py over a local Unix socket
+
+Usage:
+  python3 academic_daemon.py start
+  python3 academic_daemon.py status
+  python3 academic_daemon.py stop
+  python3 academic_daemon.py serve        # run in the foreground
+"""
+
+import io
+import os
+import sys
+import json
+import time
+import signal
+import socket
+import argparse
+import contextlib
+import socketserver
+import subprocess
+from pathlib import Path
+
+import tracing
+from academic_cli import UnifiedAcademicSystem, build_parser, run_command
+
+SOCKET_NAME = "academicd.sock"
+PID_NAME = "academicd.pid"
+LOG_NAME = "academicd.log"
+
+# How long stop waits for the old process to exit
+STOP_TIMEOUT = 5.0
+
+def data_dir(root_dir="~/university") -> Path:
+    return Path(root_dir).expanduser() / ".academic_data"
+
+class AcademicRequestHandler(socketserver.StreamRequestHandler):
+    """Run one CLI command per connection: a JSON request line in, a JSON reply line out"""
+
+    def handle(self):
+        line = self.rfile.readline()
+        if not line:
+            return  # liveness probe from is_running()
+        output = io.StringIO()
+        status = 0
+
+        original_cwd = os.getcwd()
+        try:
+            request = json.loads(line)
+            argv = request["argv"]
+            cwd = request.get("cwd", original_cwd)
+        except (ValueError, KeyError, TypeError, AttributeError) as e:
+            # Malformed or truncated request line: still answer, so the client doesn't hang on ""
+            self.reply(2, f"❌ Bad request: {e}\n")
+            return
+
+        try:
+            # Relative paths (task import, schedule export) are the client's
+            os.chdir(cwd)
+            with contextlib.redirect_stdout(output), contextlib.redirect_stderr(output):
+                try:
+                    args = self.server.parser.parse_args(argv)
+                    self.server.system.refresh()
+                    run_command(self.server.system, args)
+                except SystemExit as e:  # argparse errors and --help
+                    status = e.code if isinstance(e.code, int) else 1
+        except Exception as e:
+            output.write(f"❌ Daemon error: {e}\n")
+            status = 1
+            # Don't keep serving possibly half-applied in-memory state
+            self.server.system.load_data()
+        finally:
+            os.chdir(original_cwd)
+
+        self.reply(status, output.getvalue())
+        # The daemon never exits normally, so write each request's spans right away
+        tracing.flush()
+
+    def reply(self, status, output):
+        self.wfile.write((json.dumps({"status": status, "output": output}) + "\n").encode())
+
+class AcademicServer(socketserver.UnixStreamServer):
+    """Single-threaded, so commands (and therefore writes) are serialized"""
+
+    def __init__(self, socket_path: Path, system: UnifiedAcademicSystem):
+        self.system = system
+        self.parser = build_parser(prog="academic_cli.py")
+        super().__init__(str(socket_path), AcademicRequestHandler)
+
+def is_running(socket_path: Path) -> bool:
+    """True if a daemon is accepting connections on socket_path"""
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+        try:
+            sock.connect(str(socket_path))
+            return True
+        except OSError:
+            return False
+
+def serve(root_dir="~/university"):
+    """Run the server in the foreground until SIGTERM/SIGINT"""
+    # Absolute, since each request runs in the client's working directory
+    root_dir = Path(root_dir).expanduser().resolve()
+    directory = data_dir(root_dir)
+    directory.mkdir(parents=True, exist_ok=True)
+    socket_path = directory / SOCKET_NAME
+    pid_file = directory / PID_NAME
+
+    if socket_path.exists():
+        if is_running(socket_path):
+            print(f"Daemon already running on {socket_path}")
+            return
+        socket_path.unlink()  # stale socket from a crashed daemon
+
+    system = UnifiedAcademicSystem(root_dir)
+    # Created owner-only by bind itself, so it's never briefly open to other users
+    old_umask = os.umask(0o177)
+    try:
+        server = AcademicServer(socket_path, system)
+    finally:
+        os.umask(old_umask)
+    pid_file.write_text(str(os.getpid()))
+    signal.signal(signal.SIGTERM, lambda *_: sys.exit(0))
+
+    print(f"✓ Serving academic data on {socket_path}")
+    try:
+        server.serve_forever()
+    except (KeyboardInterrupt, SystemExit):
+        pass
+    finally:
+        server.server_close()
+        socket_path.unlink(missing_ok=True)
+        pid_file.unlink(missing_ok=True)
+
+def start(root_dir="~/university"):
+    """Start the server as a detached background process"""
+    root_dir = Path(root_dir).expanduser().resolve()
+    directory = data_dir(root_dir)
+    socket_path = directory / SOCKET_NAME
+    if is_running(socket_path):
+        print("Daemon already running")
+        return
+
+    directory.mkdir(parents=True, exist_ok=True)
+    with open(directory / LOG_NAME, 'a') as log:
+        subprocess.Popen(
+            [sys.executable, str(Path(__file__).resolve()), "serve", "--root", str(root_dir)],
+            stdin=subprocess.DEVNULL, stdout=log, stderr=log, start_new_session=True
+        )
+
+    for _ in range(50):
+        if is_running(socket_path):
+            print(f"✓ Daemon started ({socket_path})")
+            return
+        time.sleep(0.1)
+    print(f"❌ Daemon did not start; see {directory / LOG_NAME}")
+
+def stop(root_dir="~/university"):
+    """Stop a running server, waiting until it has exited and released its socket"""
+    directory = data_dir(root_dir)
+    pid_file = directory / PID_NAME
+    if not pid_file.exists():
+        print("Daemon not running")
+        return
+    try:
+        pid = int(pid_file.read_text())
+        os.kill(pid, signal.SIGTERM)
+    except (ProcessLookupError, ValueError):
+        pid_file.unlink()
+        print("Daemon not running (removed stale pid file)")
+        return
+
+    deadline = time.monotonic() + STOP_TIMEOUT
+    while time.monotonic() < deadline:
+        try:
+            os.kill(pid, 0)
+        except ProcessLookupError:
+            break
+        time.sleep(0.1)
+    else:
+        print(f"❌ Daemon (pid {pid}) still running after {STOP_TIMEOUT:g}s")
+        return
+    print("✓ Daemon stopped")
+
+def main():
+    parser = argparse.ArgumentParser(description="Resident academic data server")
+    parser.add_argument("action", choices=["start", "stop", "status", "serve"])
+    parser.add_argument("--root", default="~/university", help="Root directory")
+    args = parser.parse_args()
+
+    if args.action == "serve":
+        serve(args.root)
+    elif args.action == "start":
+        start(args.root)
+    elif args.action == "stop":
+        stop(args.root)
+    elif args.action == "status":
+        socket_path = data_dir(args.root) / SOCKET_NAME
+        print("Daemon running" if is_running(socket_path) else "Daemon not running")
+
+if __name__ == "__main__":
+    main()
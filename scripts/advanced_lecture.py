@@ -1,31 +1,186 @@
 #!/usr/bin/env python3
 
 import os
+import re
 import json
 import sys
+import bisect
 import argparse
+import tempfile
 import subprocess
 from pathlib import Path
 from datetime import datetime, timedelta
 
+from catalog import get_catalog
+from file_lock import FileLock
+from course_layout import HOMEWORK_FILE_RE, LECTURE_FILE_RE, scan_sources
+from tracing import span
+
+# \lecture{n}{topic}; the topic may span lines and contain one level of braces
+LECTURE_CMD_RE = re.compile(r"\\lecture\{\s*(\d+)\s*\}\{((?:[^{}]|\{[^{}]*\})*)\}")
+
+def next_file_number(directory, pattern):
+    """One more than the highest number among files matching pattern in directory"""
+    numbers = []
+    if directory.exists():
+        with span("scan", "scan", path=str(directory)), os.scandir(directory) as entries:
+            for entry in entries:
+                match = pattern.match(entry.name)
+                if match:
+                    numbers.append(int(match.group(1)))
+    return max(numbers, default=0) + 1
+
+def parse_lecture_header(path):
+    """Return (number, topic) from a lecture's \\lecture{n}{topic} line, or None"""
+    try:
+        with open(path, 'r', errors='replace') as f:
+            match = LECTURE_CMD_RE.search(f.read())
+    except OSError:
+        return None
+    if not match:
+        return None
+    return int(match.group(1)), " ".join(match.group(2).split())
+
+def merge_course_metadata(theirs, ours):
+    """Merge two versions of a course entry, keeping every lecture/homework record
+
+    Records are matched by filename; ours wins when both have the same file.
+    """
+    merged = dict(theirs)
+    merged.update({k: v for k, v in ours.items() if k not in ("lectures", "homework")})
+    for field in ("lectures", "homework"):
+        if field not in theirs and field not in ours:
+            continue
+        records = {rec["filename"]: rec for rec in theirs.get(field, [])}
+        records.update((rec["filename"], rec) for rec in ours.get(field, []))
+        merged[field] = sorted(records.values(), key=lambda rec: rec["number"])
+    return merged
+
 class AdvancedLectureManager:
     def __init__(self, root_dir="~/university"):
         self.root_dir = Path(root_dir).expanduser()
         self.metadata_file = self.root_dir / ".course_metadata.json"
-        self.load_metadata()
+        self.lock = FileLock(self.root_dir / ".course_metadata.lock")
+        self.changed_courses = set()
+        # Date-sorted (date, kind, course, number, title) entries, kept in a sidecar file
+        self.index_file = self.root_dir / ".course_metadata.index.json"
+        # (mtime, size) of every lecture/pset file seen by the last sync
+        self.sync_cache_file = self.root_dir / ".course_sync_cache.json"
+        self._date_index = None
+        self.pending_index = []
+        # The full metadata file is only parsed by commands that need it
+        self._metadata = None
+        self.loaded_stamp = self.metadata_stamp()
         
+    def metadata_stamp(self):
+        """(mtime, size) of the metadata file, or None if it doesn't exist"""
+        try:
+            st = self.metadata_file.stat()
+            return (st.st_mtime_ns, st.st_size)
+        except FileNotFoundError:
+            return None
+    
+    def read_metadata_file(self):
+        if self.metadata_file.exists():
+            with span("json.load", "io", path=str(self.metadata_file)), open(self.metadata_file, 'r') as f:
+                return json.load(f)
+        return {}
+    
     def load_metadata(self):
         """Load course metadata with attendance, topics, etc."""
-        if self.metadata_file.exists():
-            with open(self.metadata_file, 'r') as f:
-                self.metadata = json.load(f)
-        else:
-            self.metadata = {}
+        self.loaded_stamp = self.metadata_stamp()
+        self.metadata = self.read_metadata_file()
+    
+    @property
+    def metadata(self):
+        if self._metadata is None:
+            self.load_metadata()
+        return self._metadata
+    
+    @metadata.setter
+    def metadata(self, value):
+        self._metadata = value
+    
+    @property
+    def date_index(self):
+        """Lecture/homework entries sorted by date, loaded or rebuilt on first use"""
+        if self._date_index is None:
+            self._date_index = self.load_date_index()
+        return self._date_index
+    
+    def load_date_index(self):
+        """Read the sidecar index if it matches the metadata file, else rebuild it"""
+        try:
+            with span("json.load", "io", path=str(self.index_file)), open(self.index_file, 'r') as f:
+                data = json.load(f)
+            if data["stamp"] == (list(self.loaded_stamp) if self.loaded_stamp else None):
+                return [tuple(entry) for entry in data["entries"]]
+        except (OSError, ValueError, KeyError, TypeError):
+            pass
+        
+        entries = []
+        for course, data in self.metadata.items():
+            for lecture in data.get("lectures", []):
+                entries.append((lecture["date"], "lecture", course, lecture["number"], lecture["topic"]))
+            for hw in data.get("homework", []):
+                entries.append((hw["date"], "homework", course, hw["number"], hw["title"]))
+        entries.sort()
+        self.save_date_index(entries)
+        return entries
+    
+    def save_date_index(self, entries):
+        """Write the sidecar index, stamped with the metadata file it describes"""
+        data = {
+            "stamp": list(self.loaded_stamp) if self.loaded_stamp else None,
+            "entries": entries
+        }
+        try:
+            with span("json.save", "io", path=str(self.index_file)), open(self.index_file, 'w') as f:
+                json.dump(data, f, separators=(",", ":"))
+        except OSError:
+            pass  # the index is only a cache
+    
+    def index_entry(self, entry):
+        """Queue an index entry for the next save_metadata"""
+        self.pending_index.append(entry)
     
     def save_metadata(self):
-        """Save course metadata"""
-        with open(self.metadata_file, 'w') as f:
-            json.dump(self.metadata, f, indent=2)
+        """Save course metadata, merging in courses another process changed meanwhile"""
+        with self.lock:
+            changed_elsewhere = self.metadata_stamp() != self.loaded_stamp
+            if changed_elsewhere:
+                # Another writer's entries aren't in our index; rebuild it on next use
+                self._date_index = None
+            elif self.pending_index:
+                index = self.date_index
+                for entry in self.pending_index:
+                    pos = bisect.bisect_left(index, entry)
+                    if pos == len(index) or index[pos] != entry:
+                        index.insert(pos, entry)
+            self.pending_index.clear()
+            
+            if changed_elsewhere:
+                merged = self.read_metadata_file()
+                for course in self.changed_courses:
+                    if course in merged:
+                        merged[course] = merge_course_metadata(merged[course], self.metadata[course])
+                    else:
+                        merged[course] = self.metadata[course]
+                self.metadata = merged
+            
+            fd, tmp_path = tempfile.mkstemp(dir=self.root_dir, prefix=".course_metadata.", suffix=".tmp")
+            try:
+                with span("json.save", "io", path=str(self.metadata_file)), os.fdopen(fd, 'w') as f:
+                    json.dump(self.metadata, f, indent=2)
+                os.chmod(tmp_path, 0o644)
+                os.replace(tmp_path, self.metadata_file)
+            except BaseException:
+                os.unlink(tmp_path)
+                raise
+            self.loaded_stamp = self.metadata_stamp()
+            self.changed_courses.clear()
+            if self._date_index is not None:
+                self.save_date_index(self._date_index)
     
     def get_current_course(self):
         """Get current course from the symlink we set up"""
@@ -44,9 +199,8 @@ class AdvancedLectureManager:
         
         course_path = self.root_dir / course_name
         
-        # Find existing lectures and determine next number
-        lectures = list(course_path.glob("lecture_*.tex"))
-        next_num = len(lectures) + 1
+        # Number after the highest existing lecture, so gaps can't cause collisions
+        next_num = next_file_number(course_path, LECTURE_FILE_RE)
         
         if not topic:
             topic = input(f"Lecture {next_num} topic: ").strip()
@@ -87,6 +241,8 @@ class AdvancedLectureManager:
         }
         
         self.metadata[course_name]["lectures"].append(lecture_meta)
+        self.changed_courses.add(course_name)
+        self.index_entry((lecture_meta["date"], "lecture", course_name, next_num, topic))
         self.save_metadata()
         
         print(f"Created {course_name}/lecture_{next_num:02d}.tex: {topic}")
@@ -108,8 +264,7 @@ class AdvancedLectureManager:
         
         # Find existing homework files and determine next number
         if hw_num is None:
-            hw_files = list(psets_dir.glob("hw_*.tex"))
-            hw_num = len(hw_files) + 1
+            hw_num = next_file_number(psets_dir, HOMEWORK_FILE_RE)
         
         if not title:
             title = input(f"Homework {hw_num} title (or press enter): ").strip()
@@ -165,37 +320,120 @@ class AdvancedLectureManager:
         }
         
         self.metadata[course_name]["homework"].append(hw_meta)
+        self.changed_courses.add(course_name)
+        self.index_entry((hw_meta["date"], "homework", course_name, hw_num, title))
         self.save_metadata()
         
         print(f"Created {course_name}/psets/hw_{hw_num:02d}.tex: {title}")
         return hw_file
+    def sync(self):
+        """Reconcile metadata with the lecture/pset files on disk, re-reading only changed files"""
+        try:
+            with span("json.load", "io", path=str(self.sync_cache_file)), open(self.sync_cache_file, 'r') as f:
+                cache = json.load(f)
+        except (OSError, ValueError):
+            cache = {}
+        
+        scanned = scan_sources(self.root_dir)
+        counts = {"added": 0, "updated": 0, "removed": 0}
+        
+        for course, files in scanned.items():
+            previous = cache.get(course, {})
+            # Created only once there is a record to add, so courses without one stay out of the metadata
+            data = self.metadata.get(course)
+            course_changed = course not in cache
+            
+            for rel, stamp in files.items():
+                if previous.get(rel) == list(stamp) and not course_changed:
+                    continue
+                name = rel.split("/")[-1]
+                lecture_match = LECTURE_FILE_RE.match(name)
+                field = "lectures" if lecture_match else "homework"
+                records = data.get(field, []) if data else []
+                # The newest record wins when numbering collisions left duplicates
+                record = next((r for r in reversed(records) if r["filename"] == name), None)
+                
+                if lecture_match:
+                    number, topic = parse_lecture_header(self.root_dir / course / rel) or \
+                        (int(lecture_match.group(1)), f"Lecture {int(lecture_match.group(1))}")
+                    fields = {"number": number, "topic": topic}
+                else:
+                    number = int(HOMEWORK_FILE_RE.match(name).group(1))
+                    fields = {"number": number}
+                    if record is None:
+                        fields["title"] = f"Problem Set {number}"
+                
+                if record is None:
+                    if data is None:
+                        data = self.metadata[course] = {"lectures": [], "created": datetime.now().isoformat()}
+                    records = data.setdefault(field, [])
+                    mtime = datetime.fromtimestamp(stamp[0] / 1e9).isoformat()
+                    records.append({"number": fields["number"], "date": mtime, **fields, "filename": name})
+                    counts["added"] += 1
+                elif any(record.get(k) != v for k, v in fields.items()):
+                    record.update(fields)
+                    counts["updated"] += 1
+                else:
+                    continue
+                records.sort(key=lambda r: r["number"])
+                self.changed_courses.add(course)
+            
+            if data is None:
+                continue
+            # Drop records whose file disappeared, and duplicates left by numbering collisions
+            # (keeping the last, newest record for each file)
+            present = {rel.split("/")[-1] for rel in files}
+            for field in ("lectures", "homework"):
+                records = data.get(field, [])
+                latest = {record["filename"]: record for record in records if record["filename"] in present}
+                if len(latest) != len(records):
+                    counts["removed"] += len(records) - len(latest)
+                    data[field] = sorted(latest.values(), key=lambda r: r["number"])
+                    self.changed_courses.add(course)
+        
+        # The sync cache describes the metadata, so both are written under its lock
+        with self.lock:
+            if self.changed_courses:
+                self._date_index = None  # rebuilt from the reconciled metadata on next use
+                self.save_metadata()
+            self.save_sync_cache(scanned)
+        
+        print(f"Synced {len(scanned)} courses: {counts['added']} added, "
+              f"{counts['updated']} updated, {counts['removed']} removed")
+        return counts
+    
+    def save_sync_cache(self, scanned):
+        """Atomically record the (mtime, size) of every scanned file for the next sync"""
+        fd, tmp_path = tempfile.mkstemp(dir=self.root_dir, prefix=".course_sync_cache.", suffix=".tmp")
+        try:
+            with span("json.save", "io", path=str(self.sync_cache_file)), os.fdopen(fd, 'w') as f:
+                json.dump({course: {rel: list(stamp) for rel, stamp in files.items()}
+                           for course, files in scanned.items()}, f)
+            os.chmod(tmp_path, 0o644)
+            os.replace(tmp_path, self.sync_cache_file)
+        except BaseException:
+            os.unlink(tmp_path)
+            raise
+    
     def list_recent(self, days=7):
         """List recent lectures across all courses"""
-        cutoff = datetime.now() - timedelta(days=days)
-        recent = []
+        cutoff = (datetime.now() - timedelta(days=days)).isoformat()
+        index = self.date_index
         
-        for course, data in self.metadata.items():
-            for lecture in data.get("lectures", []):
-                lecture_date = datetime.fromisoformat(lecture["date"])
-                if lecture_date > cutoff:
-                    recent.append({
-                        "course": course,
-                        "lecture": lecture,
-                        "date": lecture_date
-                    })
-        
-        recent.sort(key=lambda x: x["date"], reverse=True)
+        # ISO timestamps sort chronologically as strings, so the window is a bisect away
+        start = bisect.bisect_right(index, (cutoff, "\uffff"))
+        recent = [entry for entry in reversed(index[start:]) if entry[1] == "lecture"]
         
         if recent:
             print(f"Recent lectures (last {days} days):")
-            for item in recent:
-                date_str = item["date"].strftime("%Y-%m-%d %H:%M")
-                print(f"  {item['course']}: {item['lecture']['topic']} ({date_str})")
+            for date, _, course, _, topic in recent:
+                date_str = datetime.fromisoformat(date).strftime("%Y-%m-%d %H:%M")
+                print(f"  {course}: {topic} ({date_str})")
         else:
             print(f"No lectures in the last {days} days")
 def main():
     parser = argparse.ArgumentParser(description="Advanced lecture management")
-    parser.add_argument("action", choices=["new", "psets", "recent", "info"])
+    parser.add_argument("action", choices=["new", "psets", "recent", "info", "sync"])
     parser.add_argument("--course", "-c", help="Course name")
     parser.add_argument("--topic", "-t", help="Lecture topic")
     parser.add_argument("--title", help="Problem set title")
@@ -209,30 +447,36 @@ def main():
         filepath = manager.new_lecture(args.course, args.topic)
         if filepath:
             # Open in nvim automatically
-            subprocess.run(["nvim", str(filepath)])
+            with span("nvim", "subprocess", path=str(filepath)):
+                subprocess.run(["nvim", str(filepath)])
     
     elif args.action == "psets":
         filepath = manager.new_homework(args.course, args.number, args.title)
         if filepath:
             # Open in nvim automatically
-            subprocess.run(["nvim", str(filepath)])
+            with span("nvim", "subprocess", path=str(filepath)):
+                subprocess.run(["nvim", str(filepath)])
     
     elif args.action == "recent":
         manager.list_recent(args.days)
     
+    elif args.action == "sync":
+        manager.sync()
+    
     elif args.action == "info":
         course = args.course or manager.get_current_course()
-        if course and course in manager.metadata:
-            data = manager.metadata[course]
+        record = get_catalog(manager.root_dir).course(course, ("notes",)) if course else None
+        if record and "notes" in record:
+            notes = record["notes"]
             print(f"Course: {course}")
-            print(f"Total lectures: {len(data.get('lectures', []))}")
-            print(f"Total problem sets: {len(data.get('homework', []))}")
-            if data.get('lectures'):
-                latest = data['lectures'][-1]
-                print(f"Latest lecture: {latest['topic']} ({latest['date'][:10]})")
-            if data.get('homework'):
-                latest_pset = data['homework'][-1]
-                print(f"Latest pset: {latest_pset['title']} ({latest_pset['date'][:10]})")
+            print(f"Total lectures: {notes['lectures']}")
+            print(f"Total problem sets: {notes['psets']}")
+            if notes["latest_lecture"]:
+                topic, date = notes["latest_lecture"]
+                print(f"Latest lecture: {topic} ({date[:10]})")
+            if notes["latest_pset"]:
+                title, date = notes["latest_pset"]
+                print(f"Latest pset: {title} ({date[:10]})")
         else:
             print("No course information found")
 if __name__ == "__main__":
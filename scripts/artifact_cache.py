@@ -0,0 +1,406 @@
+#!/usr/bin/env python3
+"""
+Content-addressed cache of LaTeX build artifacts
+Build outputs (pdf, aux, toc, out, fmt) are stored once under
+.build_cache/ at the root, keyed by a hash of every input the build reads:
+the .tex source, what it \\input's (preamble included) and the figures it
+includes. compile_master.py and the lecture/pset builds below share one
+store, so an unchanged document is restored instead of recompiled, and a
+changed one starts from its previous aux/toc. The store is kept under a
+disk budget by evicting least recently used builds.
+
+Usage:
+  python3 artifact_cache.py build math55/lecture_03.tex
+  python3 artifact_cache.py stats
+  python3 artifact_cache.py budget 256M
+  python3 artifact_cache.py gc --dry-run
+"""
+
+import os
+import re
+import json
+import time
+import shutil
+import fnmatch
+import hashlib
+import argparse
+from pathlib import Path
+from collections import Counter
+
+from course_layout import scan_sources
+from file_lock import FileLock
+from pdf_manifest import record_pdf
+from tex_runner import run_supervised
+
+CACHE_DIR_NAME = ".build_cache"
+INDEX_VERSION = 1
+DEFAULT_BUDGET = 512 * 1024 * 1024
+
+# Outputs kept per build; aux/toc/out also seed the next build of the same job
+ARTIFACT_SUFFIXES = (".pdf", ".aux", ".toc", ".out", ".fmt")
+SEED_SUFFIXES = (".aux", ".toc", ".out")
+
+# Leftovers from interrupted editor/latexmk saves, removed by gc
+STRAY_PATTERNS = ("*-SAVE-ERROR",)
+
+INPUT_RE = re.compile(r"\\(input|include|includegraphics|incfig)\s*(?:\[[^\]]*\])?\s*\{([^{}]*)\}(?:\s*\{([^{}]*)\})?")
+COMMENT_RE = re.compile(r"(?<!\\)%.*")
+
+def file_hash(path) -> str:
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+def parse_size(text: str) -> int:
+    """'512M', '2G', '100000' -> bytes"""
+    units = {"K": 1 << 10, "M": 1 << 20, "G": 1 << 30}
+    text = text.strip().upper().rstrip("B")
+    if text and text[-1] in units:
+        return int(float(text[:-1]) * units[text[-1]])
+    return int(text)
+
+def format_size(size: int) -> str:
+    for unit in ("B", "KB", "MB"):
+        if size < 1024:
+            return f"{size:.0f} {unit}"
+        size /= 1024
+    return f"{size:.1f} GB"
+
+def resolve_input(name: str, base_dir: Path, kind: str):
+    """Files a \\input/\\includegraphics/\\incfig argument may refer to"""
+    name = os.path.expanduser(name.strip())
+    if not name:
+        return []
+    if kind == "incfig":
+        figure = base_dir / "figures" / name
+        return [p for p in (figure.with_name(name + ".pdf_tex"), figure.with_name(name + ".pdf")) if p.exists()]
+
+    path = Path(name) if os.path.isabs(name) else base_dir / name
+    suffixes = (".tex",) if kind in ("input", "include") else (".pdf", ".png", ".jpg", ".eps")
+    candidates = [path] + [path.with_name(path.name + suffix) for suffix in suffixes]
+    if kind == "includegraphics":
+        candidates += [base_dir / "figures" / c.name for c in candidates]  # \graphicspath{{./figures/}}
+    for candidate in candidates:
+        if candidate.is_file():
+            return [candidate]
+    return []
+
+def tex_inputs(tex_file) -> list:
+    """The document and every file it (transitively) inputs or includes, in a stable order"""
+    tex_file = Path(tex_file).resolve()
+    base_dir = tex_file.parent
+    seen = {tex_file}
+    pending = [tex_file]
+    while pending:
+        current = pending.pop()
+        if current.suffix not in (".tex", ".pdf_tex"):
+            continue
+        with open(current, 'r', errors='replace') as f:
+            text = COMMENT_RE.sub("", f.read())
+        for match in INPUT_RE.finditer(text):
+            kind, arg, second = match.groups()
+            name = second if kind == "incfig" else arg
+            # Inputs resolve against the compiled document's directory, as in TeX
+            for path in resolve_input(name or "", base_dir, kind):
+                path = path.resolve()
+                if path not in seen:
+                    seen.add(path)
+                    pending.append(path)
+    return sorted(seen)
+
+class ArtifactCache:
+    """Blob store plus an index of builds, under CACHE_DIR_NAME in the root"""
+
+    def __init__(self, root_dir="~/university"):
+        self.root_dir = Path(root_dir).expanduser()
+        self.cache_dir = self.root_dir / CACHE_DIR_NAME
+        self.blob_dir = self.cache_dir / "blobs"
+        self.index_file = self.cache_dir / "index.json"
+        self.lock = FileLock(self.cache_dir / ".lock")
+        self.budget = DEFAULT_BUDGET
+        self.entries = {}   # build key -> {"job", "outputs": {name: blob}, "size", "last_used"}
+        self.blobs = {}     # blob hash -> size
+
+    # Index I/O; callers hold self.lock around load..save
+    def load(self):
+        try:
+            with open(self.index_file, 'r') as f:
+                data = json.load(f)
+            if data.get("version") == INDEX_VERSION:
+                self.budget = data.get("budget", DEFAULT_BUDGET)
+                self.entries = data["entries"]
+                self.blobs = data["blobs"]
+        except (OSError, ValueError, KeyError):
+            self.entries, self.blobs = {}, {}
+
+    def save(self):
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        tmp_path = self.index_file.with_suffix(".tmp")
+        with open(tmp_path, 'w') as f:
+            json.dump({"version": INDEX_VERSION, "budget": self.budget,
+                       "entries": self.entries, "blobs": self.blobs}, f, indent=1)
+        os.replace(tmp_path, self.index_file)
+
+    def blob_path(self, blob: str) -> Path:
+        return self.blob_dir / blob[:2] / blob
+
+    def build_key(self, job: str, inputs, command) -> str:
+        """Hash of the command and the content of every input, independent of mtimes"""
+        digest = hashlib.sha256()
+        digest.update(json.dumps([job, list(command)]).encode())
+        for path in inputs:
+            path = Path(path)
+            try:
+                name = path.resolve().relative_to(self.root_dir.resolve()).as_posix()
+            except ValueError:
+                name = str(path)
+            digest.update(f"{name}\0{file_hash(path)}\n".encode())
+        return digest.hexdigest()
+
+    # Restoring and storing builds
+    def restore(self, key: str, dest_dir: Path) -> bool:
+        """Copy a cached build's outputs into dest_dir; False on a miss"""
+        with self.lock:
+            self.load()
+            entry = self.entries.get(key)
+            if not entry or not all(self.blob_path(b).exists() for b in entry["outputs"].values()):
+                return False
+            for name, blob in entry["outputs"].items():
+                # Copy rather than link: TeX rewrites its outputs in place
+                shutil.copyfile(self.blob_path(blob), dest_dir / name)
+            entry["last_used"] = time.time()
+            self.save()
+        return True
+
+    def seed(self, job: str, dest_dir: Path, jobname: str) -> bool:
+        """Restore aux/toc/out of the job's most recent build so fewer passes are needed"""
+        with self.lock:
+            self.load()
+            builds = [e for e in self.entries.values() if e["job"] == job]
+        if not builds:
+            return False
+        latest = max(builds, key=lambda e: e["last_used"])
+        restored = False
+        for suffix in SEED_SUFFIXES:
+            blob = latest["outputs"].get(jobname + suffix)
+            if blob and self.blob_path(blob).exists():
+                shutil.copyfile(self.blob_path(blob), dest_dir / (jobname + suffix))
+                restored = True
+        return restored
+
+    def store(self, key: str, job: str, src_dir: Path, jobname: str):
+        """Add a finished build's outputs, then evict old builds over the budget"""
+        outputs = {}
+        for suffix in ARTIFACT_SUFFIXES:
+            path = src_dir / (jobname + suffix)
+            if path.exists():
+                outputs[path.name] = path
+        if not outputs:
+            return
+
+        with self.lock:
+            self.load()
+            blobs = {}
+            for name, path in outputs.items():
+                blob = file_hash(path)
+                target = self.blob_path(blob)
+                if not target.exists():
+                    target.parent.mkdir(parents=True, exist_ok=True)
+                    tmp_path = target.with_suffix(".tmp")
+                    shutil.copyfile(path, tmp_path)
+                    os.replace(tmp_path, target)
+                self.blobs[blob] = target.stat().st_size
+                blobs[name] = blob
+            self.entries[key] = {
+                "job": job,
+                "outputs": blobs,
+                "size": sum(self.blobs[b] for b in blobs.values()),
+                "last_used": time.time(),
+            }
+            self.evict(keep=key)
+            self.save()
+
+    # Space management
+    def total_size(self) -> int:
+        return sum(self.blobs.values())
+
+    def evict(self, keep=None):
+        """Drop least recently used builds until the blobs fit the budget
+
+        One sort by last use, then blob reference counts and a running total,
+        so each eviction costs only its own outputs.
+        """
+        total = self.total_size()
+        if total <= self.budget:
+            return []
+        refs = Counter(blob for entry in self.entries.values() for blob in set(entry["outputs"].values()))
+        evicted = []
+        for key in sorted(self.entries, key=lambda k: self.entries[k]["last_used"]):
+            if total <= self.budget:
+                break
+            if key == keep:
+                continue
+            entry = self.entries.pop(key)
+            evicted.append(key)
+            for blob in set(entry["outputs"].values()):
+                refs[blob] -= 1
+                if refs[blob] == 0 and blob in self.blobs:
+                    total -= self.blobs.pop(blob)
+                    self.blob_path(blob).unlink(missing_ok=True)
+        return evicted
+
+    def referenced_blobs(self):
+        return {blob for entry in self.entries.values() for blob in entry["outputs"].values()}
+
+    def drop_unreferenced(self, dry_run=False):
+        """Delete blobs no build refers to; returns bytes freed"""
+        referenced = self.referenced_blobs()
+        freed = 0
+        for blob in [b for b in self.blobs if b not in referenced]:
+            freed += self.blobs[blob]
+            if not dry_run:
+                del self.blobs[blob]
+                self.blob_path(blob).unlink(missing_ok=True)
+        return freed
+
+    def gc(self, dry_run=False):
+        """Prune unreachable artifacts: builds with missing blobs, unreferenced or
+        untracked blob files, and stray *-SAVE-ERROR files in the course directories
+
+        Returns (builds removed, bytes freed, stray files removed).
+        """
+        with self.lock:
+            self.load()
+            broken = [key for key, entry in self.entries.items()
+                      if not all(self.blob_path(b).exists() for b in entry["outputs"].values())]
+            if not dry_run:
+                for key in broken:
+                    del self.entries[key]
+            freed = self.drop_unreferenced(dry_run)
+
+            # Blob files the index doesn't know about (e.g. from an interrupted store)
+            if self.blob_dir.exists():
+                for path in self.blob_dir.glob("*/*"):
+                    if path.name not in self.blobs:
+                        freed += path.stat().st_size
+                        if not dry_run:
+                            path.unlink()
+
+            strays = self.stray_files()
+            for path in strays:
+                freed += path.stat().st_size
+                if not dry_run:
+                    path.unlink()
+            if not dry_run:
+                self.save()
+        return len(broken), freed, strays
+
+    def stray_files(self):
+        """STRAY_PATTERNS matches inside the course directories, skipping hidden ones (.git, caches)"""
+        strays = []
+        for course in scan_sources(self.root_dir):
+            for dirpath, dirnames, filenames in os.walk(self.root_dir / course):
+                dirnames[:] = [d for d in dirnames if not d.startswith('.')]
+                strays.extend(Path(dirpath) / name for name in filenames
+                              if any(fnmatch.fnmatch(name, pattern) for pattern in STRAY_PATTERNS))
+        return strays
+
+def cached_build(tex_file, run_latex, root_dir="~/university", inputs=None, command=()):
+    """Build tex_file through the cache: restore on a hit, else seed, run and store
+
+    run_latex(seeded) compiles in tex_file's directory and returns True on
+    success; seeded says whether a previous aux/toc was restored first.
+    Returns (success, restored from the cache).
+    """
+    tex_file = Path(tex_file).resolve()
+    cache = ArtifactCache(root_dir)
+    try:
+        job = tex_file.relative_to(cache.root_dir.resolve()).as_posix()
+    except ValueError:
+        job = str(tex_file)
+    jobname = tex_file.stem
+
+    key = cache.build_key(job, inputs or tex_inputs(tex_file), command)
+    if cache.restore(key, tex_file.parent):
+        return True, True
+
+    seeded = cache.seed(job, tex_file.parent, jobname)
+    if not run_latex(seeded):
+        return False, False
+    cache.store(key, job, tex_file.parent, jobname)
+    return True, False
+
+def build_document(tex_file, root_dir="~/university", runs=2):
+    """Compile a lecture or pset with pdflatex through the cache"""
+    tex_file = Path(tex_file).resolve()
+    command = ["pdflatex", "-interaction=nonstopmode", tex_file.name]
+
+    def run_latex(seeded):
+        for i in range(runs):
+            result = run_supervised(command, cwd=tex_file.parent)
+            if not result.ok:
+                print(f"❌ pdflatex {result.describe()} (run {i+1}/{runs})")
+                return False
+        return True
+
+    success, restored = cached_build(tex_file, run_latex, root_dir, command=command)
+    if success:
+        record_pdf(tex_file.with_suffix(".pdf"), root_dir)
+    return success, restored
+
+def main():
+    parser = argparse.ArgumentParser(description="Shared cache of LaTeX build artifacts")
+    parser.add_argument("--root", default="~/university", help="Root directory")
+    subparsers = parser.add_subparsers(dest="action")
+
+    build = subparsers.add_parser("build", help="Compile a lecture or problem set through the cache")
+    build.add_argument("file", help="The .tex file")
+    build.add_argument("--runs", type=int, default=2, help="pdflatex passes on a miss")
+
+    subparsers.add_parser("stats", help="Show cache size and builds")
+
+    budget = subparsers.add_parser("budget", help="Set the disk budget (e.g. 256M, 2G)")
+    budget.add_argument("size")
+
+    gc = subparsers.add_parser("gc", help="Prune unreachable artifacts and stray save-error files")
+    gc.add_argument("--dry-run", action="store_true", help="Only report what would be removed")
+
+    args = parser.parse_args()
+    cache = ArtifactCache(args.root)
+
+    if args.action == "build":
+        try:
+            success, restored = build_document(args.file, args.root, args.runs)
+        except FileNotFoundError:
+            print("❌ pdflatex not found. Make sure LaTeX is installed.")
+            return
+        if restored:
+            print(f"✓ {args.file}: unchanged, restored from cache")
+        elif success:
+            print(f"✓ Built {args.file}")
+    elif args.action == "budget":
+        with cache.lock:
+            cache.load()
+            cache.budget = parse_size(args.size)
+            evicted = cache.evict()
+            cache.save()
+        print(f"✓ Budget set to {format_size(cache.budget)}; evicted {len(evicted)} builds")
+    elif args.action == "gc":
+        removed, freed, strays = cache.gc(args.dry_run)
+        verb = "Would remove" if args.dry_run else "Removed"
+        for path in strays:
+            print(f"  {path.relative_to(cache.root_dir)}")
+        print(f"{verb} {removed} broken builds, {len(strays)} stray files, {format_size(freed)}")
+    else:
+        with cache.lock:
+            cache.load()
+        print(f"Cache: {format_size(cache.total_size())} of {format_size(cache.budget)} "
+              f"in {len(cache.entries)} builds")
+        for key, entry in sorted(cache.entries.items(), key=lambda item: -item[1]["last_used"]):
+            used = time.strftime("%Y-%m-%d %H:%M", time.localtime(entry["last_used"]))
+            print(f"  {entry['job']:<40} {format_size(entry['size']):>9}  {used}  {key[:10]}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,152 @@
+#!/usr/bin/env python3
+"""
+Benchmarks for academic_cli.py
+Times each read-only subcommand against a synthetic data set, or
+(with --aggregation) the in-process dashboard/report/list queries
+
+Usage:
+  python3 bench_academic_cli.py
+  python3 bench_academic_cli.py --tasks 50000 --runs 10
+  python3 bench_academic_cli.py --aggregation --tasks 100000
+"""
+
+import os
+import sys
+import json
+import time
+import random
+import argparse
+import tempfile
+import statistics
+import subprocess
+import contextlib
+from pathlib import Path
+from datetime import datetime, timedelta
+
+CLI = Path(__file__).resolve().parent / "academic_cli.py"
+
+# Subcommands that only read data, so they can be repeated safely
+COMMANDS = [
+    ["course", "list"],
+    ["task", "list"],
+    ["task", "list", "--status", "completed"],
+    ["schedule", "show"],
+    ["dashboard"],
+]
+
+def make_dataset(data_dir, n_tasks, n_courses=8):
+    """Write synthetic courses/tasks/schedule files into data_dir"""
+    data_dir.mkdir(parents=True, exist_ok=True)
+    rng = random.Random(0)
+    today = datetime.now()
+
+    courses = {}
+    schedule = {}
+    for i in range(n_courses):
+        name = f"Course {i}"
+        courses[f"course_{i}"] = {
+            "name": name,
+            "code": f"C{i:03d}",
+            "credits": 3.0,
+            "instructor": "",
+            "schedule": "",
+            "created": today.isoformat(),
+            "assignments": {},
+            "notes_path": "",
+        }
+        schedule[name] = {
+            "classes": [{"day": "Monday", "time": "10:00 AM", "location": "", "type": "class"}],
+            "exams": [{"type": "Midterm", "date": (today + timedelta(days=rng.randint(1, 60))).strftime("%Y-%m-%d"),
+                       "time": "", "location": ""}],
+        }
+
+    tasks = []
+    for i in range(n_tasks):
+        due = today + timedelta(days=rng.randint(-120, 120))
+        completed = rng.random() < 0.6
+        tasks.append({
+            "id": i + 1,
+            "title": f"Task {i}",
+            "course": f"Course {rng.randrange(n_courses)}",
+            "due_date": due.strftime("%Y-%m-%d"),
+            "priority": rng.choice(["low", "medium", "high", "urgent"]),
+            "type": "assignment",
+            "status": "completed" if completed else rng.choice(["pending", "in_progress"]),
+            "created": (due - timedelta(days=14)).isoformat(),
+            "completed": due.isoformat() if completed else None,
+            "notes": "",
+        })
+
+    for name, data in [("courses", courses), ("tasks", tasks), ("schedule", schedule)]:
+        with open(data_dir / f"{name}.json", 'w') as f:
+            json.dump(data, f)
+
+def time_command(args, home, runs):
+    """Return the wall-clock times (ms) of running the CLI with args"""
+    env = os.environ.copy()
+    env["HOME"] = str(home)
+    samples = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        subprocess.run([sys.executable, str(CLI), *args], env=env,
+                       stdout=subprocess.DEVNULL, check=True)
+        samples.append((time.perf_counter() - start) * 1000)
+    return samples
+
+def bench_aggregation(root, runs):
+    """Time index construction and the queries served from it, in-process"""
+    from academic_cli import UnifiedAcademicSystem
+
+    system = UnifiedAcademicSystem(root)
+    start = time.perf_counter()
+    n_tasks = len(system.tasks)
+    print(f"  {'load tasks.json':<34} {(time.perf_counter() - start) * 1000:8.1f} ms ({n_tasks} tasks)")
+
+    queries = [
+        ("build task index", lambda: system.task_index),
+        ("show_dashboard", system.show_dashboard),
+        ("export_weekly_report", system.export_weekly_report),
+        ("list_tasks pending", lambda: system.list_tasks("pending")),
+        ("list_tasks completed", lambda: system.list_tasks("completed")),
+    ]
+    with open(os.devnull, 'w') as devnull:
+        for label, query in queries:
+            samples = []
+            for _ in range(runs):
+                if label == "build task index":
+                    system._task_index = None
+                start = time.perf_counter()
+                with contextlib.redirect_stdout(devnull):
+                    query()
+                samples.append((time.perf_counter() - start) * 1000)
+            print(f"  {label:<34} median {statistics.median(samples):8.1f} ms"
+                  f"   first {samples[0]:8.1f} ms")
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark academic_cli.py")
+    parser.add_argument("--tasks", type=int, default=20000, help="Number of synthetic tasks")
+    parser.add_argument("--runs", type=int, default=5, help="Runs per subcommand")
+    parser.add_argument("--aggregation", action="store_true",
+                        help="Benchmark in-process dashboard aggregation instead of CLI startup")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        home = Path(tmp)
+        make_dataset(home / "university" / ".academic_data", args.tasks)
+
+        if args.aggregation:
+            print(f"Synthetic data: {args.tasks} tasks, {args.runs} runs per query")
+            bench_aggregation(home / "university", args.runs)
+            return
+
+        baseline = time_command(["--help"], home, args.runs)
+        print(f"Synthetic data: {args.tasks} tasks, {args.runs} runs per command")
+        print(f"  {'(interpreter + argparse)':<34} median {statistics.median(baseline):8.1f} ms")
+        for command in COMMANDS:
+            samples = time_command(command, home, args.runs)
+            label = " ".join(command)
+            print(f"  {label:<34} median {statistics.median(samples):8.1f} ms"
+                  f"   min {min(samples):8.1f} ms")
+
+if __name__ == "__main__":
+    main()
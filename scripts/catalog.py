@@ -0,0 +1,301 @@
+#!/usr/bin/env python3
+"""
+Course catalog shared by the academic scripts
+One on-disk index (.catalog.json under the root) summarizing every course
+from the four places its state lives:
+
+  profile  .academic_data/courses.json   (academic_cli.py)
+  notes    .course_metadata.json         (advanced_lecture.py)
+  grades   .grades.json                  (grades.py)
+  files    lecture/pset sources          (compile_master.py)
+
+Each section is re-derived only when its source changed (file (mtime, size),
+or directory mtimes for the sources), and only for the sections a caller
+asks for. Parsed JSON and Catalog objects are cached per process, so the
+daemon and repeated calls in one script share them.
+
+Usage:
+  python3 catalog.py
+  python3 catalog.py math55
+"""
+
+import os
+import json
+import argparse
+import tempfile
+from pathlib import Path
+
+from course_layout import HOMEWORK_FILE_RE, LECTURE_FILE_RE
+from grades import course_aggregates, course_standing
+from tracing import span, traced
+
+CATALOG_NAME = ".catalog.json"
+CATALOG_VERSION = 2
+
+# Section -> JSON file it is derived from, relative to the root
+SOURCE_FILES = {
+    "profile": ".academic_data/courses.json",
+    "notes": ".course_metadata.json",
+    "grades": ".grades.json",
+}
+SECTIONS = ("profile", "notes", "grades", "files")
+
+# Parsed JSON files of this process: path -> (stamp, data). Treat as read-only.
+_json_cache = {}
+# Catalog per root directory
+_catalogs = {}
+
+def file_stamp(path):
+    """(mtime, size) of a file, or None if it doesn't exist"""
+    try:
+        st = os.stat(path)
+        return (st.st_mtime_ns, st.st_size)
+    except OSError:
+        return None
+
+def load_json_cached(path, default=None):
+    """Parse a JSON file, reusing this process's copy while its stamp is unchanged"""
+    path = str(path)
+    stamp = file_stamp(path)
+    cached = _json_cache.get(path)
+    if cached and cached[0] == stamp:
+        return cached[1]
+    try:
+        with span("json.load", "io", path=path), open(path, 'r') as f:
+            data = json.load(f)
+    except (OSError, ValueError):
+        data = default
+    _json_cache[path] = (stamp, data)
+    return data
+
+def course_key(name: str) -> str:
+    """Catalog key of a course: its directory name (spaces become underscores, as add_course does)"""
+    return name.replace(" ", "_")
+
+def list_sources(course_path: Path, subdir: str, pattern):
+    directory = course_path / subdir if subdir else course_path
+    try:
+        with os.scandir(directory) as entries:
+            names = sorted(entry.name for entry in entries if pattern.match(entry.name))
+    except OSError:
+        return []
+    return [f"{subdir}/{name}" if subdir else name for name in names]
+
+def dir_stamp(course_path: Path):
+    """mtimes of a course directory and its lectures/psets subdirectories (changed by adds/removes)"""
+    stamp = []
+    for directory in (course_path, course_path / "lectures", course_path / "psets"):
+        try:
+            stamp.append(os.stat(directory).st_mtime_ns)
+        except OSError:
+            stamp.append(None)
+    return stamp
+
+class Catalog:
+    """Per-course summaries, persisted in CATALOG_NAME under the root"""
+
+    def __init__(self, root_dir="~/university"):
+        self.root_dir = Path(root_dir).expanduser()
+        self.index_path = self.root_dir / CATALOG_NAME
+        self.stamps = {}     # section -> stamp of what it was derived from
+        self.records = {}    # course key -> {section: summary}
+        self._loaded = False
+        self._changed = False
+
+    def load(self):
+        try:
+            with span("json.load", "io", path=str(self.index_path)), open(self.index_path, 'r') as f:
+                data = json.load(f)
+            if data.get("version") == CATALOG_VERSION:
+                self.stamps = data["stamps"]
+                self.records = data["courses"]
+        except (OSError, ValueError, KeyError):
+            self.stamps, self.records = {}, {}
+        self._loaded = True
+
+    def save(self):
+        # A temp file of our own: the daemon, the CLI and parallel builds may all save at once
+        try:
+            fd, tmp_path = tempfile.mkstemp(dir=self.index_path.parent, prefix=f"{self.index_path.name}.",
+                                            suffix=".tmp")
+        except OSError:
+            return  # the catalog is only a cache of the sources
+        try:
+            with span("json.save", "io", path=str(self.index_path)), os.fdopen(fd, 'w') as f:
+                json.dump({"version": CATALOG_VERSION, "stamps": self.stamps, "courses": self.records},
+                          f, separators=(",", ":"))
+            os.chmod(tmp_path, 0o644)
+            os.replace(tmp_path, self.index_path)
+        except OSError:
+            os.unlink(tmp_path)
+
+    def refresh(self, sections=SECTIONS):
+        """Bring the given sections up to date, re-deriving only those whose sources changed"""
+        if not self._loaded:
+            self.load()
+        for section in sections:
+            if section == "files":
+                self._refresh_files()
+                continue
+            path = self.root_dir / SOURCE_FILES[section]
+            stamp = file_stamp(path)
+            if section in self.stamps and self.stamps[section] == (list(stamp) if stamp else None):
+                continue
+            derive = getattr(self, f"_derive_{section}")
+            summaries = derive(load_json_cached(path, {}) or {})
+            self._replace_section(section, summaries)
+            self.stamps[section] = list(stamp) if stamp else None
+        if self._changed:
+            self._changed = False
+            self.save()
+
+    def _replace_section(self, section, summaries):
+        for key, record in list(self.records.items()):
+            if section in record and key not in summaries:
+                del record[section]
+                if not record:
+                    del self.records[key]
+        for key, summary in summaries.items():
+            self.records.setdefault(key, {})[section] = summary
+        self._changed = True
+
+    def _derive_profile(self, courses):
+        summaries = {}
+        for order, (course_id, course) in enumerate(courses.items()):
+            notes_path = course.get("notes_path", "")
+            key = Path(notes_path).name if notes_path else course_key(course.get("name", course_id))
+            if key in summaries:
+                # Notes directories with the same name elsewhere: the first course keeps the
+                # directory key, the others go under their course id rather than overwriting it
+                key = course_id if course_id not in summaries else f"{course_id}:{notes_path}"
+            summaries[key] = {
+                "order": order,  # position in courses.json, the order courses are listed in
+                "id": course_id,
+                "name": course.get("name", course_id),
+                "code": course.get("code", ""),
+                "credits": course.get("credits", 0.0),
+                "instructor": course.get("instructor", ""),
+                "schedule": course.get("schedule", ""),
+            }
+        return summaries
+
+    def _derive_notes(self, metadata):
+        summaries = {}
+        for course, data in metadata.items():
+            lectures = data.get("lectures", [])
+            homework = data.get("homework", [])
+            latest_lecture = lectures[-1] if lectures else None
+            latest_pset = homework[-1] if homework else None
+            summaries[course_key(course)] = {
+                "lectures": len(lectures),
+                "psets": len(homework),
+                "latest_lecture": [latest_lecture["topic"], latest_lecture["date"]] if latest_lecture else None,
+                "latest_pset": [latest_pset["title"], latest_pset["date"]] if latest_pset else None,
+            }
+        return summaries
+
+    def _derive_grades(self, grades):
+        summaries = {}
+        for course, record in grades.items():
+            standing, graded_weight = course_standing(course_aggregates(record))
+            summaries[course_key(course)] = {
+                "credit_hours": record.get("credit_hours", 0.0),
+                "standing": standing,
+                "graded_weight": graded_weight,
+            }
+        return summaries
+
+    @traced("catalog.refresh_files", "scan")
+    def _refresh_files(self):
+        """Re-list the sources of courses whose directories changed; one scandir of the root"""
+        seen = set()
+        try:
+            top = os.scandir(self.root_dir)
+        except OSError:
+            return
+        with top:
+            for entry in top:
+                if entry.name.startswith('.') or not entry.is_dir():
+                    continue
+                course_path = Path(entry.path)
+                stamp = dir_stamp(course_path)
+                record = self.records.get(entry.name, {})
+                files = record.get("files")
+                if files and files["stamp"] == stamp:
+                    seen.add(entry.name)
+                    continue
+
+                flat = list_sources(course_path, "", LECTURE_FILE_RE)
+                lectures = flat or list_sources(course_path, "lectures", LECTURE_FILE_RE)
+                if not lectures:
+                    continue
+                seen.add(entry.name)
+                self.records.setdefault(entry.name, {})["files"] = {
+                    "stamp": stamp,
+                    "lectures": lectures,
+                    "psets": list_sources(course_path, "psets", HOMEWORK_FILE_RE),
+                }
+                self._changed = True
+
+        for key, record in list(self.records.items()):
+            if "files" in record and key not in seen:
+                del record["files"]
+                if not record:
+                    del self.records[key]
+                self._changed = True
+
+    # Queries: each refreshes only the sections it reads
+    def courses(self, sections=SECTIONS):
+        """{course key: record} of every known course, with only the given sections refreshed"""
+        self.refresh(sections)
+        return self.records
+
+    def course(self, name, sections=SECTIONS):
+        """One course's record (by directory or display name), or None"""
+        self.refresh(sections)
+        return self.records.get(name) or self.records.get(course_key(name))
+
+    def lecture_files(self, name):
+        """Paths of a course's lecture sources: flat lecture_*.tex, else lectures/lecture_*.tex"""
+        self.refresh(("files",))
+        # Paths go under the key that matched: a display name isn't a directory
+        for key in (name, course_key(name)):
+            record = self.records.get(key)
+            if record and "files" in record:
+                return [self.root_dir / key / rel for rel in record["files"]["lectures"]]
+        return []
+
+def get_catalog(root_dir="~/university") -> Catalog:
+    """The process-wide Catalog for a root directory"""
+    root = Path(root_dir).expanduser()
+    if root not in _catalogs:
+        _catalogs[root] = Catalog(root)
+    return _catalogs[root]
+
+def main():
+    parser = argparse.ArgumentParser(description="Show the course catalog")
+    parser.add_argument("course", nargs="?", help="Show one course in full")
+    parser.add_argument("--root", default="~/university", help="Root directory")
+    args = parser.parse_args()
+
+    catalog = get_catalog(args.root)
+    if args.course:
+        record = catalog.course(args.course)
+        if not record:
+            print(f"❌ Course not found: {args.course}")
+            return
+        print(json.dumps(record, indent=2))
+        return
+
+    for key, record in sorted(catalog.courses().items()):
+        parts = []
+        if "files" in record:
+            parts.append(f"{len(record['files']['lectures'])} lectures")
+        if "grades" in record and record["grades"]["standing"] is not None:
+            parts.append(f"{record['grades']['standing']:.1f}%")
+        code = record.get("profile", {}).get("code")
+        name = f"{key} ({code})" if code else key
+        print(f"  • {name}" + (f" — {', '.join(parts)}" if parts else ""))
+
+if __name__ == "__main__":
+    main()
@@ -6,15 +6,43 @@ Auto-cleans empty theorem brackets and compiles to master.pdf
 Usage:
   python3 compile_master.py math55
   python3 compile_master.py math55 --open
+  python3 compile_master.py math55 --glossary
+  python3 compile_master.py math55 --reproducible
+  python3 compile_master.py math55 --optimize
+  python3 compile_master.py math55 --volumes 8 --jobs 4
+  python3 compile_master.py math55 --prune-preamble
+  python3 compile_master.py math55 --html
   python3 compile_master.py --list
 """
 
 import os
 import sys
+import shutil
 import subprocess
 import argparse
 import re
 from pathlib import Path
+from datetime import datetime, timezone
+
+from artifact_cache import cached_build, tex_inputs
+from catalog import get_catalog
+from env_index import THEOREM_ENVS, EnvIndex
+from master_volumes import VOLUME_DIR, VolumeBuild, partition, state_input, volume_hooks, volume_name
+from pdf_manifest import record_pdf
+from pdf_size import OPTIMIZE_ERRORS, attribute_sizes, optimize_pdf, print_report, record_sizes
+from tex_runner import TEX_TIMEOUT, run_supervised
+from tracing import span, traced
+
+# Placed after \documentclass in reproducible builds: no timestamps or random
+# trailer /ID in the PDF, so identical inputs give byte-identical output
+REPRODUCIBLE_HEADER = r"""
+% Reproducible output
+\ifdefined\pdftrailerid
+\pdfinfoomitdate=1
+\pdftrailerid{}
+\pdfsuppressptexinfo=-1
+\fi
+"""
 
 def clean_empty_optional_args(file_path):
     """Remove empty optional arguments from theorem environments"""
@@ -22,7 +50,7 @@ def clean_empty_optional_args(file_path):
         content = f.read()
     
     # Pattern matches: \begin{theorem}[], \begin{lemma}[], etc.
-    pattern = r'\\begin\{(theorem|lemma|corollary|proposition|definition|example|remark|proof|problem)\}\[\s*\]'
+    pattern = r'\\begin\{(%s)\}\[\s*\]' % '|'.join(THEOREM_ENVS)
     cleaned = re.sub(pattern, r'\\begin{\1}', content)
     
     with open(file_path, 'w') as f:
@@ -31,8 +59,9 @@ def clean_empty_optional_args(file_path):
     return content != cleaned  # Return True if changes were made
 
 class MasterCompiler:
-    def __init__(self, root_dir="~/university"):
+    def __init__(self, root_dir="~/university", timeout=TEX_TIMEOUT):
         self.root_dir = Path(root_dir).expanduser()
+        self.timeout = timeout  # wall-clock limit per pdflatex pass
     
     def find_preamble(self):
         """Find preamble.tex location"""
@@ -49,7 +78,7 @@ class MasterCompiler:
     
     def extract_content(self, lecture_file):
         """Extract content from standalone lecture file"""
-        with open(lecture_file, 'r') as f:
+        with span("extract", "extract", path=str(lecture_file)), open(lecture_file, 'r') as f:
             lines = f.readlines()
         
         content_start = 0
@@ -67,8 +96,16 @@ class MasterCompiler:
         content = ''.join(lines[content_start:content_end])
         return content.strip()
     
-    def compile_course(self, course_name, open_pdf=False, preamble_path="../preamble.tex", strip_mode=True):
-        """Compile all lectures in a course into master.pdf"""
+    @traced("compile_course", "build")
+    def compile_course(self, course_name, open_pdf=False, preamble_path="../preamble.tex", strip_mode=True,
+                       glossary=False, reproducible=False, optimize=False, volume_size=0, jobs=None,
+                       prune_preamble=False):
+        """Compile all lectures in a course into master.pdf
+        
+        With volume_size, the course is built as volumes of that many lectures
+        compiled in parallel (see master_volumes.py). With prune_preamble, the
+        master loads the course's pruned preamble (see preamble_prune.py).
+        """
         course_path = self.root_dir / course_name
         
         if not course_path.exists():
@@ -82,26 +119,64 @@ class MasterCompiler:
             print(f"⚠️  Warning: preamble.tex not found")
             print(f"   The master.tex will assume ../preamble.tex")
         
-        # Find lecture files
-        lecture_files = []
-        flat_lectures = sorted(course_path.glob("lecture_*.tex"))
-        lectures_dir = course_path / "lectures"
-        subdir_lectures = []
-        if lectures_dir.exists():
-            subdir_lectures = sorted(lectures_dir.glob("lecture_*.tex"))
-        
-        if flat_lectures:
-            lecture_files = flat_lectures
-            lectures_relative = ""
-        elif subdir_lectures:
-            lecture_files = subdir_lectures
-            lectures_relative = "lectures/"
-        else:
+        # Find lecture files (flat lecture_*.tex, else lectures/), via the shared catalog
+        lecture_files = get_catalog(self.root_dir).lecture_files(course_name)
+        if not lecture_files:
             print(f"❌ No lecture files found in {course_path}")
             return False
+        lectures_relative = "" if lecture_files[0].parent == course_path else "lectures/"
         
         print(f"📚 Found {len(lecture_files)} lectures in {course_name}")
         
+        if prune_preamble and preamble_path:
+            # Imported here: preamble_prune uses MasterCompiler itself
+            from preamble_prune import PrunedPreamble, describe
+            pruned = PrunedPreamble(self.root_dir, course_name, preamble_path)
+            preamble_path = pruned.ensure()
+            print(f"✂️  Pruned preamble: {describe(pruned.summary)}")
+        
+        appendix = ""
+        if glossary:
+            appendix = self.glossary_appendix(course_name, course_path, lecture_files)
+        
+        # Reproducible builds date the notes by their newest input, not \today
+        date, header, source_date_epoch = "\\today", "", None
+        if reproducible:
+            source_date_epoch = self.newest_input_mtime(lecture_files)
+            day = datetime.fromtimestamp(source_date_epoch, timezone.utc)
+            date = f"{day:%B} {day.day}, {day.year}"
+            header = REPRODUCIBLE_HEADER
+            print(f"📌 Reproducible build dated {date}")
+        
+        if volume_size:
+            success = self.compile_volumes(course_name, course_path, lecture_files, lectures_relative,
+                                           preamble_path, strip_mode, appendix, date, header,
+                                           source_date_epoch, volume_size, jobs)
+            if success and optimize:
+                self.optimize_pdf(course_path / "master.pdf")
+        else:
+            # Single builds optimize before the build cache stores master.pdf
+            success = self.compile_single(course_name, course_path, lecture_files, lectures_relative,
+                                          preamble_path, strip_mode, appendix, date, header,
+                                          source_date_epoch, optimize)
+        
+        if success:
+            print(f"✅ Successfully created master.pdf")
+            record_pdf(course_path / "master.pdf", self.root_dir)
+            
+            if open_pdf:
+                pdf_file = course_path / "master.pdf"
+                if pdf_file.exists():
+                    self.open_pdf(pdf_file)
+            
+            return True
+        else:
+            print(f"❌ Compilation failed. Check master.log for errors.")
+            return False
+    
+    def compile_single(self, course_name, course_path, lecture_files, lectures_relative, preamble_path,
+                       strip_mode, appendix, date, header, source_date_epoch, optimize=False):
+        """Generate master.tex with every lecture and compile it"""
         if strip_mode:
             print(f"📝 Extracting content from standalone lecture files...")
             extracted_lectures = []
@@ -115,14 +190,20 @@ class MasterCompiler:
             master_content = self.generate_master_tex_embedded(
                 course_name,
                 extracted_lectures,
-                preamble_path
+                preamble_path,
+                appendix,
+                date,
+                header
             )
         else:
             master_content = self.generate_master_tex(
                 course_name, 
                 lecture_files, 
                 lectures_relative,
-                preamble_path
+                preamble_path,
+                appendix,
+                date,
+                header
             )
         
         # Write master.tex
@@ -133,22 +214,85 @@ class MasterCompiler:
         
         # Compile to PDF
         print(f"🔨 Compiling master.pdf...")
-        success = self.compile_latex(course_path)
-        
-        if success:
-            print(f"✅ Successfully created master.pdf")
-            
-            if open_pdf:
-                pdf_file = course_path / "master.pdf"
-                if pdf_file.exists():
-                    self.open_pdf(pdf_file)
-            
-            return True
+        return self.compile_latex(course_path, source_date_epoch, optimize)
+    
+    def compile_volumes(self, course_name, course_path, lecture_files, lectures_relative, preamble_path,
+                        strip_mode, appendix, date, header, source_date_epoch, volume_size, jobs):
+        """Build the course as volumes of volume_size lectures in parallel, then assemble master.pdf"""
+        if strip_mode:
+            print(f"📝 Extracting content from standalone lecture files...")
+            blocks = [self.embedded_section(lecture.stem, self.extract_content(lecture))
+                      for lecture in lecture_files]
         else:
-            print(f"❌ Compilation failed. Check master.log for errors.")
+            blocks = [f"\\input{{{lectures_relative}{lecture.stem}.tex}}" for lecture in lecture_files]
+        
+        volumes = partition(blocks, volume_size)
+        env = None
+        if source_date_epoch is not None:
+            env = dict(os.environ, SOURCE_DATE_EPOCH=str(source_date_epoch), FORCE_SOURCE_DATE="1")
+        build = VolumeBuild(course_path, jobs, self.timeout, env)
+        build.write_volumes([
+            self.generate_volume_tex(course_name, volume_name(number), "\n\n".join(volume),
+                                     preamble_path, header)
+            for number, volume in enumerate(volumes, 1)
+        ])
+        for name in build.names:
+            if clean_empty_optional_args(course_path / f"{name}.tex"):
+                print(f"✨ Auto-fixed empty theorem brackets in {name}.tex")
+        
+        print(f"🔨 Compiling {len(volumes)} volumes of up to {volume_size} lectures ({build.jobs} jobs)...")
+        try:
+            success, rounds, failures = build.compile()
+        except FileNotFoundError:
+            print("❌ pdflatex not found. Make sure LaTeX is installed.")
             return False
+        for name, result in failures:
+            print(f"❌ {name}: pdflatex {result.describe()} (see {VOLUME_DIR}/{name}.log)")
+        if not success:
+            return False
+        print(f"✓ Volumes settled after {rounds} round(s), {build.compiled} volume passes")
+        
+        # Every volume's labels, for the glossary's \pageref
+        with open(course_path / VOLUME_DIR / "labels.tex", 'w') as f:
+            f.write(build.all_labels())
+        master_file = course_path / "master.tex"
+        with open(master_file, 'w') as f:
+            f.write(self.generate_combined_tex(course_name, build.includes(), preamble_path,
+                                               appendix, date, header))
+        print(f"✓ Generated {master_file}")
+        
+        # Title page and TOC around the volume PDFs: two passes for the TOC
+        print(f"🔨 Assembling master.pdf...")
+        command = ["pdflatex", "-interaction=nonstopmode", "master.tex"]
+        for i in range(2):
+            result = run_supervised(command, cwd=course_path, env=env, timeout=self.timeout)
+            if not result.ok:
+                print(f"❌ pdflatex {result.describe()} (assembly run {i+1}/2)")
+                return False
+        return True
     
-    def generate_master_tex(self, course_name, lecture_files, lectures_relative, preamble_path="../preamble.tex"):
+    def glossary_appendix(self, course_name, course_path, lecture_files):
+        """Glossary of the course's definitions, from the (incrementally refreshed) environment index"""
+        index = EnvIndex(self.root_dir)
+        index.load()
+        index.refresh(courses={course_name})
+        files = {f"{course_name}/{lecture.relative_to(course_path).as_posix()}" for lecture in lecture_files}
+        appendix = index.glossary_tex(course_name, files)
+        if appendix:
+            print(f"📖 Added glossary appendix")
+        else:
+            print(f"⚠️  No titled definitions found; skipping glossary")
+        return appendix
+    
+    def newest_input_mtime(self, lecture_files):
+        """Whole-second mtime of the newest lecture, preamble or figure the master reads"""
+        inputs = set()
+        for lecture in lecture_files:
+            inputs.update(tex_inputs(lecture))
+        return max(int(path.stat().st_mtime) for path in inputs)
+    
+    def generate_master_tex(self, course_name, lecture_files, lectures_relative, preamble_path="../preamble.tex",
+                            appendix="", date="\\today", header=""):
         """Generate master.tex content"""
         input_lines = []
         for lecture in lecture_files:
@@ -158,7 +302,7 @@ class MasterCompiler:
         inputs = "\n".join(input_lines)
         
         template = f"""\\documentclass{{report}}
-
+{header}
 % Load preamble
 \\input{{{preamble_path}}}
 
@@ -168,7 +312,7 @@ class MasterCompiler:
 
 \\title{{\\Huge{{{course_name}}}\\\\XXXX -- Harvard University}}
 \\author{{\\huge{{S. D. V. Stephens}}}}
-\\date{{\\today}}
+\\date{{{date}}}
 
 \\begin{{document}}
 
@@ -181,22 +325,28 @@ class MasterCompiler:
 % All lectures
 {inputs}
 
+{appendix}
+
 \\end{{document}}
 """
         return template
     
-    def generate_master_tex_embedded(self, course_name, extracted_lectures, preamble_path="../preamble.tex"):
+    def embedded_section(self, name, content):
+        """One lecture's extracted content under a comment banner"""
+        separator = "% " + "="*60
+        return f"{separator}\n% {name}\n{separator}\n\n{content}"
+    
+    def generate_master_tex_embedded(self, course_name, extracted_lectures, preamble_path="../preamble.tex",
+                                     appendix="", date="\\today", header=""):
         """Generate master.tex with embedded lecture content"""
         lecture_sections = []
         for lec in extracted_lectures:
-            separator = "% " + "="*60
-            section = f"{separator}\n% {lec['name']}\n{separator}\n\n{lec['content']}"
-            lecture_sections.append(section)
+            lecture_sections.append(self.embedded_section(lec['name'], lec['content']))
         
         all_content = "\n\n".join(lecture_sections)
         
         template = f"""\\documentclass{{report}}
-
+{header}
 % Load preamble
 \\input{{{preamble_path}}}
 
@@ -206,7 +356,7 @@ class MasterCompiler:
 
 \\title{{\\Huge{{{course_name.replace('_', ' ')}}}\\\\XXXX -- Harvard University}}
 \\author{{\\huge{{S. D. V. Stephens}}}}
-\\date{{\\today}}
+\\date{{{date}}}
 
 \\begin{{document}}
 
@@ -222,12 +372,81 @@ class MasterCompiler:
 
 {all_content}
 
+{appendix}
+
+\\end{{document}}
+"""
+        return template
+    
+    def generate_volume_tex(self, course_name, name, lectures, preamble_path="../preamble.tex", header=""):
+        """Generate one volume: its lectures only, starting where the previous volume ended"""
+        template = f"""\\documentclass{{report}}
+{header}
+% Load preamble
+\\input{{{preamble_path}}}
+{volume_hooks()}
+\\course{{{course_name.replace('_', ' ')}}}
+\\me{{Your Name}}
+
+\\begin{{document}}
+{state_input(name)}
+
+{lectures}
+
+\\end{{document}}
+"""
+        return template
+    
+    def generate_combined_tex(self, course_name, includes, preamble_path="../preamble.tex",
+                              appendix="", date="\\today", header=""):
+        """Generate master.tex around the volume PDFs, with the global TOC
+        
+        Front matter is numbered in roman so the lectures keep the page
+        numbers printed in the volumes.
+        """
+        template = f"""\\documentclass{{report}}
+{header}
+% Load preamble
+\\input{{{preamble_path}}}
+
+% Optional: Customize these
+\\course{{{course_name.replace('_', ' ')}}}
+\\me{{Your Name}}
+
+\\title{{\\Huge{{{course_name.replace('_', ' ')}}}\\\\XXXX -- Harvard University}}
+\\author{{\\huge{{S. D. V. Stephens}}}}
+\\date{{{date}}}
+
+\\begin{{document}}
+\\input{{{VOLUME_DIR}/labels.tex}}
+
+\\pagenumbering{{roman}}
+\\maketitle
+\\newpage
+\\pdfbookmark[section]{{\\contentsname}}{{toc}}
+\\tableofcontents
+\\clearpage
+\\pagenumbering{{arabic}}
+
+% ============================================
+% VOLUMES (built in {VOLUME_DIR}/ by master_volumes.py)
+% ============================================
+
+{includes}
+
+{appendix}
+
 \\end{{document}}
 """
         return template
     
-    def compile_latex(self, course_path):
-        """Compile master.tex to PDF with auto-cleanup"""
+    def compile_latex(self, course_path, source_date_epoch=None, optimize=False):
+        """Compile master.tex to PDF with auto-cleanup
+        
+        With source_date_epoch, pdfTeX takes its timestamps from it instead of the clock.
+        With optimize, the PDF is optimized before it is stored in the build cache,
+        so a restored master.pdf is already optimized.
+        """
         original_dir = os.getcwd()
         os.chdir(course_path)
         
@@ -237,18 +456,34 @@ class MasterCompiler:
             if clean_empty_optional_args(master_file):
                 print("✨ Auto-fixed empty theorem brackets")
             
-            # Run pdflatex 3 times for TOC
-            for i in range(3):
-                result = subprocess.run(
-                    ["pdflatex", "-interaction=nonstopmode", "master.tex"],
-                    capture_output=True,
-                    text=True
-                )
-                if result.returncode != 0:
-                    print(f"❌ pdflatex error (run {i+1}/3)")
-                    return False
+            command = ["pdflatex", "-interaction=nonstopmode", "master.tex"]
+            env = None
+            cache_command = command
+            if source_date_epoch is not None:
+                env = dict(os.environ, SOURCE_DATE_EPOCH=str(source_date_epoch), FORCE_SOURCE_DATE="1")
+                cache_command = command + [f"SOURCE_DATE_EPOCH={source_date_epoch}"]
+            if optimize:
+                cache_command = cache_command + ["--optimize"]
             
-            return True
+            def run_latex(seeded):
+                # Run pdflatex 3 times for TOC (2 when the previous aux/toc was restored)
+                runs = 2 if seeded else 3
+                for i in range(runs):
+                    result = run_supervised(command, cwd=course_path, env=env, timeout=self.timeout)
+                    if not result.ok:
+                        print(f"❌ pdflatex {result.describe()} (run {i+1}/{runs})")
+                        return False
+                if optimize:
+                    self.optimize_pdf(course_path / "master.pdf")
+                return True
+            
+            # Unchanged inputs are restored from the shared artifact cache
+            success, restored = cached_build(master_file, run_latex, self.root_dir, command=cache_command)
+            if restored:
+                print("♻️  Inputs unchanged; restored master.pdf from the build cache")
+                if optimize:
+                    self.report_sizes(course_path / "master.pdf")
+            return success
             
         except FileNotFoundError:
             print("❌ pdflatex not found. Make sure LaTeX is installed.")
@@ -259,15 +494,36 @@ class MasterCompiler:
         finally:
             os.chdir(original_dir)
     
+    def optimize_pdf(self, pdf_file):
+        """Losslessly shrink the built PDF, record its before/after size and report what it's made of"""
+        try:
+            before, after, duplicates = optimize_pdf(pdf_file)
+            record_sizes(pdf_file, before, after, self.root_dir)
+        except OPTIMIZE_ERRORS as e:
+            # The build itself succeeded, so keep the unoptimized PDF
+            print(f"⚠️  Skipping optimization: {e}")
+        else:
+            print(f"✨ Optimized {pdf_file.name}: {before // 1024} KB → {after // 1024} KB"
+                  f" ({duplicates} duplicate figures merged)")
+        self.report_sizes(pdf_file)
+    
+    def report_sizes(self, pdf_file):
+        """Print the bytes each lecture, figure and font contributes to the PDF"""
+        try:
+            print_report(attribute_sizes(pdf_file), top=5)
+        except (OSError, ValueError) as e:
+            print(f"⚠️  Could not attribute {pdf_file.name}: {e}")
+    
     def open_pdf(self, pdf_file):
         """Open PDF in default viewer"""
         try:
-            if sys.platform == "darwin":
-                subprocess.run(["open", str(pdf_file)])
-            elif sys.platform == "linux":
-                subprocess.run(["xdg-open", str(pdf_file)])
-            elif sys.platform == "win32":
-                os.startfile(str(pdf_file))
+            with span("open", "subprocess", path=str(pdf_file)):
+                if sys.platform == "darwin":
+                    subprocess.run(["open", str(pdf_file)])
+                elif sys.platform == "linux":
+                    subprocess.run(["xdg-open", str(pdf_file)])
+                elif sys.platform == "win32":
+                    os.startfile(str(pdf_file))
         except Exception as e:
             print(f"Could not open PDF: {e}")
     
@@ -278,14 +534,9 @@ class MasterCompiler:
             return
         
         courses = []
-        for item in self.root_dir.iterdir():
-            if item.is_dir() and not item.name.startswith('.'):
-                has_flat = list(item.glob("lecture_*.tex"))
-                has_subdir = list((item / "lectures").glob("lecture_*.tex")) if (item / "lectures").exists() else []
-                
-                if has_flat or has_subdir:
-                    lecture_count = len(has_flat or has_subdir)
-                    courses.append((item.name, lecture_count))
+        for name, record in get_catalog(self.root_dir).courses(("files",)).items():
+            if "files" in record:
+                courses.append((name, len(record["files"]["lectures"])))
         
         if courses:
             print("\nAvailable courses:")
@@ -309,6 +560,11 @@ class MasterCompiler:
                 file.unlink()
                 print(f"🗑️  Deleted {file.name}")
         
+        volume_dir = course_path / VOLUME_DIR
+        if volume_dir.exists():
+            shutil.rmtree(volume_dir)
+            print(f"🗑️  Deleted {VOLUME_DIR}/")
+        
         print("✓ Cleaned auxiliary files")
 
 def main():
@@ -324,9 +580,23 @@ def main():
     parser.add_argument("--root", default="~/university", help="Root directory")
     parser.add_argument("--preamble", "-p", default="../preamble.tex", help="Path to preamble")
     parser.add_argument("--no-strip", action="store_true", help="Don't strip documentclass/preamble")
+    parser.add_argument("--glossary", "-g", action="store_true", help="Append a glossary of definitions")
+    parser.add_argument("--reproducible", "-r", action="store_true",
+                        help="Byte-identical PDF for identical inputs (dated by the newest input)")
+    parser.add_argument("--optimize", action="store_true",
+                        help="Losslessly shrink master.pdf (object streams, duplicate figures) and report its size by lecture, figure and font")
+    parser.add_argument("--timeout", type=float, default=TEX_TIMEOUT,
+                        help="Seconds a pdflatex pass may run before it is killed")
+    parser.add_argument("--volumes", type=int, default=0, metavar="N",
+                        help="Build in parallel volumes of N lectures each")
+    parser.add_argument("--jobs", "-j", type=int, help="Volumes compiled at once (default: all cores)")
+    parser.add_argument("--prune-preamble", action="store_true",
+                        help="Load only the packages and definitions this course uses")
+    parser.add_argument("--html", action="store_true",
+                        help="Build the TeX-free HTML preview instead of master.pdf")
     
     args = parser.parse_args()
-    compiler = MasterCompiler(args.root)
+    compiler = MasterCompiler(args.root, args.timeout)
     
     if args.list:
         compiler.list_courses()
@@ -344,8 +614,17 @@ def main():
         compiler.list_courses()
         return
     
+    if args.html:
+        # Imported here: html_preview uses MasterCompiler itself
+        from html_preview import HtmlPreview
+        index = HtmlPreview(args.root, args.course).report()
+        if index and args.open:
+            compiler.open_pdf(index)
+        return
+    
     strip_mode = not args.no_strip
-    compiler.compile_course(args.course, args.open, args.preamble, strip_mode)
+    compiler.compile_course(args.course, args.open, args.preamble, strip_mode, args.glossary,
+                            args.reproducible, args.optimize, args.volumes, args.jobs, args.prune_preamble)
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,51 @@
+#!/usr/bin/env python3
+"""
+Course directory layout shared by the note scripts
+A course is a top-level directory of the root holding lecture_NN.tex files
+(flat, or under lectures/ as compile_master.py also accepts), with problem
+sets in psets/hw_NN.tex
+"""
+
+import os
+import re
+from pathlib import Path
+
+from tracing import span
+
+LECTURE_FILE_RE = re.compile(r"lecture_(\d+)\.tex$")
+HOMEWORK_FILE_RE = re.compile(r"hw_(\d+)\.tex$")
+
+# Subdirectory of a course -> pattern of the sources kept there
+SOURCE_DIRS = (("", LECTURE_FILE_RE), ("lectures", LECTURE_FILE_RE), ("psets", HOMEWORK_FILE_RE))
+
+def source_kind(rel_path: str) -> str:
+    """'lecture' or 'pset' for a source path relative to its course"""
+    return "pset" if rel_path.startswith("psets/") else "lecture"
+
+def scan_sources(root_dir):
+    """Sweep the root once for lecture and pset sources
+
+    Returns {course: {relative path: (mtime_ns, size)}} for every top-level
+    directory holding lecture_*.tex files (flat or under lectures/).
+    """
+    courses = {}
+    with span("scan_sources", "scan", root=str(root_dir)), os.scandir(Path(root_dir).expanduser()) as top:
+        for course_entry in top:
+            if course_entry.name.startswith('.') or not course_entry.is_dir():
+                continue
+            files = {}
+            for subdir, pattern in SOURCE_DIRS:
+                directory = os.path.join(course_entry.path, subdir)
+                try:
+                    entries = os.scandir(directory)
+                except OSError:
+                    continue
+                with entries:
+                    for entry in entries:
+                        if pattern.match(entry.name) and entry.is_file():
+                            st = entry.stat()
+                            rel = f"{subdir}/{entry.name}" if subdir else entry.name
+                            files[rel] = (st.st_mtime_ns, st.st_size)
+            if any(source_kind(rel) == "lecture" for rel in files):
+                courses[course_entry.name] = files
+    return courses
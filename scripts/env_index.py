@@ -0,0 +1,276 @@
+#!/usr/bin/env python3
+"""
+Index of theorem-like environments across courses
+Records every definition/theorem/lemma/... block (kind, optional title,
+label, course, lecture, line and a short excerpt) in one streaming pass
+per source, re-reading only files whose mtime or size changed. Also
+renders the glossary appendix compile_master.py --glossary adds to master.tex
+
+Usage:
+  python3 env_index.py --kind definition --course math55
+  python3 env_index.py --grep group
+  python3 env_index.py --kind theorem --lecture 3 --labels
+"""
+
+import os
+import re
+import json
+import argparse
+import tempfile
+from pathlib import Path
+
+from course_layout import HOMEWORK_FILE_RE, LECTURE_FILE_RE, scan_sources, source_kind
+
+INDEX_NAME = ".env_index.json"
+INDEX_VERSION = 1
+
+# Environments whose empty [] compile_master.py strips, plus the preamble's
+# tcolorbox theorem names (Prop, Exercise, claim...); matched case-insensitively
+THEOREM_ENVS = ("theorem", "lemma", "corollary", "proposition", "definition",
+                "example", "remark", "proof", "problem")
+PREAMBLE_ENVS = ("prop", "exercise", "claim")
+ENV_ALIASES = {"prop": "proposition"}
+
+BEGIN_RE = re.compile(r"\\begin\{(%s)\}" % "|".join(THEOREM_ENVS + PREAMBLE_ENVS), re.IGNORECASE)
+END_RE = re.compile(r"\\end\{([A-Za-z]+)\}")
+LABEL_RE = re.compile(r"\\label\{([^{}]*)\}")
+COMMENT_RE = re.compile(r"(?<!\\)%.*")
+
+EXCERPT_CHARS = 160
+
+# \newtcbtheorem label prefixes in preamble.tex: {title}{key} is labelled prefix:key
+TCB_LABEL_PREFIX = {"definition": "def"}
+TCB_DEFAULT_PREFIX = "th"
+
+def canonical_kind(name: str) -> str:
+    name = name.lower()
+    return ENV_ALIASES.get(name, name)
+
+def read_group(text: str, pos: int, open_char: str, close_char: str):
+    """Balanced group starting at text[pos] (after spaces): (content, end) or None"""
+    while pos < len(text) and text[pos] in " \t":
+        pos += 1
+    if pos >= len(text) or text[pos] != open_char:
+        return None
+    depth = 0
+    for i in range(pos, len(text)):
+        if text[i] == open_char and text[i - 1] != "\\":
+            depth += 1
+        elif text[i] == close_char and text[i - 1] != "\\":
+            depth -= 1
+            if depth == 0:
+                return text[pos + 1:i], i + 1
+    return None
+
+def parse_begin_args(text: str, kind: str):
+    """Title and label from '[Title]' or the tcolorbox '{Title}{key}' form
+
+    Returns (title, label, rest of the line after the arguments).
+    """
+    optional = read_group(text, 0, "[", "]")
+    if optional:
+        return optional[0].strip(), "", text[optional[1]:]
+
+    title = read_group(text, 0, "{", "}")
+    key = read_group(text, title[1], "{", "}") if title else None
+    if title and key:
+        label = key[0].strip()
+        if label:
+            label = f"{TCB_LABEL_PREFIX.get(kind, TCB_DEFAULT_PREFIX)}:{label}"
+        return title[0].strip(), label, text[key[1]:]
+    return "", "", text
+
+def source_number(rel_path: str):
+    match = LECTURE_FILE_RE.search(rel_path) or HOMEWORK_FILE_RE.search(rel_path)
+    return int(match.group(1)) if match else None
+
+def scan_environments(path: Path):
+    """Stream one source and return its environments in document order"""
+    found = []
+    open_envs = []    # stack of (environment name, record) for nesting
+    with open(path, 'r', errors='replace') as f:
+        for line_no, line in enumerate(f, start=1):
+            line = COMMENT_RE.sub("", line)
+            pos = 0
+            while True:
+                begin = BEGIN_RE.search(line, pos)
+                end = END_RE.search(line, pos)
+                # Text up to the next \begin/\end belongs to every open environment
+                stop = min(m.start() for m in (begin, end) if m) if (begin or end) else len(line)
+                for _, record in open_envs:
+                    record["body"].append(line[pos:stop])
+
+                if begin and (not end or begin.start() < end.start()):
+                    kind = canonical_kind(begin.group(1))
+                    rest = line[begin.end():]
+                    title, label, remainder = parse_begin_args(rest, kind)
+                    record = {"kind": kind, "title": " ".join(title.split()),
+                              "label": label, "line": line_no, "body": []}
+                    found.append(record)
+                    open_envs.append((begin.group(1), record))
+                    pos = len(line) - len(remainder)
+                elif end:
+                    if open_envs and open_envs[-1][0] == end.group(1):
+                        open_envs.pop()
+                    else:
+                        for _, record in open_envs:
+                            record["body"].append(end.group(0))
+                    pos = end.end()
+                else:
+                    break
+
+    for record in found:
+        body = "".join(record.pop("body"))
+        if not record["label"]:
+            label = LABEL_RE.search(body)
+            record["label"] = label.group(1).strip() if label else ""
+        excerpt = " ".join(LABEL_RE.sub("", body).split())
+        if len(excerpt) > EXCERPT_CHARS:
+            excerpt = excerpt[:EXCERPT_CHARS].rsplit(" ", 1)[0] + " ..."
+        record["excerpt"] = excerpt
+    return found
+
+class EnvIndex:
+    """Environment index over all course sources, persisted in INDEX_NAME under the root"""
+
+    def __init__(self, root_dir="~/university"):
+        self.root_dir = Path(root_dir).expanduser()
+        self.index_path = self.root_dir / INDEX_NAME
+        self.files = {}    # "course/rel" -> {"stamp", "course", "source", "number", "envs"}
+
+    def load(self):
+        try:
+            with open(self.index_path, 'r') as f:
+                data = json.load(f)
+            if data.get("version") == INDEX_VERSION:
+                self.files = data["files"]
+        except (OSError, ValueError, KeyError):
+            self.files = {}
+
+    def save(self):
+        # Builds of different courses refresh the same index, each through its own temp file
+        fd, tmp_path = tempfile.mkstemp(dir=self.root_dir, prefix=f"{INDEX_NAME}.", suffix=".tmp")
+        try:
+            with os.fdopen(fd, 'w') as f:
+                json.dump({"version": INDEX_VERSION, "files": self.files}, f, separators=(",", ":"))
+            os.chmod(tmp_path, 0o644)
+            os.replace(tmp_path, self.index_path)
+        except BaseException:
+            os.unlink(tmp_path)
+            raise
+
+    def refresh(self, courses=None, rebuild=False):
+        """Re-scan only new or changed sources (of the given courses); returns how many changed"""
+        if rebuild:
+            self.files = {}
+        seen = set()
+        updated = 0
+        for course, sources in scan_sources(self.root_dir).items():
+            if courses and course not in courses:
+                continue
+            for rel, stamp in sources.items():
+                key = f"{course}/{rel}"
+                seen.add(key)
+                entry = self.files.get(key)
+                if entry and entry["stamp"] == list(stamp):
+                    continue
+                self.files[key] = {
+                    "stamp": list(stamp),
+                    "course": course,
+                    "source": source_kind(rel),
+                    "number": source_number(rel),
+                    "envs": scan_environments(self.root_dir / course / rel),
+                }
+                updated += 1
+
+        removed = [key for key, entry in self.files.items()
+                   if key not in seen and (not courses or entry["course"] in courses)]
+        for key in removed:
+            del self.files[key]
+        if updated or removed:
+            self.save()
+        return updated + len(removed)
+
+    def query(self, kind="", course="", lecture=None, text="", files=None):
+        """Environments matching every given filter, in course/file/line order
+
+        text matches the title or excerpt case-insensitively; files restricts
+        to the given "course/rel" keys (e.g. the lectures of one master.tex).
+        """
+        kind = canonical_kind(kind) if kind else ""
+        text = text.lower()
+        results = []
+        for key in sorted(self.files):
+            entry = self.files[key]
+            if course and entry["course"] != course:
+                continue
+            if files is not None and key not in files:
+                continue
+            if lecture is not None and (entry["source"] != "lecture" or entry["number"] != lecture):
+                continue
+            for env in entry["envs"]:
+                if kind and env["kind"] != kind:
+                    continue
+                if text and text not in env["title"].lower() and text not in env["excerpt"].lower():
+                    continue
+                results.append(dict(env, file=key, course=entry["course"],
+                                    source=entry["source"], number=entry["number"]))
+        return results
+
+    def glossary_tex(self, course, files=None):
+        """Glossary appendix of the course's titled definitions, sorted by term"""
+        terms = [env for env in self.query("definition", course, files=files)
+                 if env["title"] and env["source"] == "lecture"]
+        if not terms:
+            return ""
+        terms.sort(key=lambda env: (env["title"].lower(), env["number"] or 0))
+
+        items = []
+        for env in terms:
+            where = f"Lecture {env['number']}"
+            if env["label"]:
+                where += f", p.~\\pageref{{{env['label']}}}"
+            # Braced, so a ] in the title can't end \item's optional argument
+            items.append(f"  \\item[{{{env['title']}}}] {where}")
+        return "\n".join([
+            "\\appendix",
+            "\\chapter{Glossary}",
+            "\\begin{description}",
+            *items,
+            "\\end{description}",
+        ])
+
+def main():
+    parser = argparse.ArgumentParser(description="Query definitions, theorems and other environments")
+    parser.add_argument("--kind", "-k", default="", help="Environment kind (definition, theorem, lemma, ...)")
+    parser.add_argument("--course", "-c", default="", help="Only this course")
+    parser.add_argument("--lecture", "-l", type=int, help="Only this lecture number")
+    parser.add_argument("--grep", "-g", default="", help="Substring of the title or excerpt")
+    parser.add_argument("--labels", action="store_true", help="Only print kind, title and label")
+    parser.add_argument("--json", action="store_true", help="Print the matches as JSON")
+    parser.add_argument("--root", default="~/university", help="Root directory")
+    parser.add_argument("--rebuild", action="store_true", help="Re-scan every file")
+    args = parser.parse_args()
+
+    index = EnvIndex(args.root)
+    index.load()
+    index.refresh(rebuild=args.rebuild)
+
+    matches = index.query(args.kind, args.course, args.lecture, args.grep)
+    if args.json:
+        print(json.dumps(matches, indent=2))
+        return
+    if not matches:
+        print("No matching environments")
+        return
+
+    for env in matches:
+        title = f" [{env['title']}]" if env["title"] else ""
+        label = f" ({env['label']})" if env["label"] else ""
+        print(f"  {env['kind'].capitalize()}{title}{label}  {env['file']}:{env['line']}")
+        if not args.labels and env["excerpt"]:
+            print(f"      {env['excerpt']}")
+    print(f"\n{len(matches)} environments")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,64 @@
+#!/usr/bin/env python3
+"""
+Advisory file locking shared by the academic scripts
+Serializes read-merge-write cycles on the JSON data files between
+concurrent academic_cli.py / advanced_lecture.py processes
+"""
+
+import os
+import time
+from pathlib import Path
+
+try:
+    import fcntl
+except ImportError:  # Windows: locking degrades to a no-op
+    fcntl = None
+
+# How long to wait for another process to finish its save
+LOCK_TIMEOUT = 10.0
+LOCK_POLL_INTERVAL = 0.02
+
+class FileLock:
+    """Reentrant exclusive lock on a lock file, usable as a context manager"""
+
+    def __init__(self, lock_path, timeout: float = LOCK_TIMEOUT):
+        self.lock_path = Path(lock_path)
+        self.timeout = timeout
+        self._fd = None
+        self._depth = 0
+
+    def acquire(self):
+        self._depth += 1
+        if self._depth > 1 or fcntl is None:
+            return
+
+        self.lock_path.parent.mkdir(parents=True, exist_ok=True)
+        fd = os.open(self.lock_path, os.O_RDWR | os.O_CREAT, 0o644)
+        deadline = time.monotonic() + self.timeout
+        while True:
+            try:
+                fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                break
+            except BlockingIOError:
+                if time.monotonic() >= deadline:
+                    os.close(fd)
+                    self._depth -= 1
+                    raise TimeoutError(f"Timed out waiting for lock {self.lock_path}")
+                time.sleep(LOCK_POLL_INTERVAL)
+        self._fd = fd
+
+    def release(self):
+        self._depth -= 1
+        if self._depth > 0 or self._fd is None:
+            return
+        fcntl.flock(self._fd, fcntl.LOCK_UN)
+        os.close(self._fd)
+        self._fd = None
+
+    def __enter__(self):
+        self.acquire()
+        return self
+
+    def __exit__(self, *exc):
+        self.release()
+        return False
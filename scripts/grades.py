@@ -0,0 +1,309 @@
+#!/usr/bin/env python3
+"""
+Grade standings from .grades.json
+Keeps per-category aggregates (weight, count, sum of percentages) for every
+course in a sidecar cache stamped with the grades file, so standings are
+computed from a handful of numbers per course and recording an assignment
+updates them in O(1) instead of re-walking every assignment
+
+Usage:
+  python3 grades.py standings
+  python3 grades.py add "Linear Algebra" PS2 45 --max 50 --category PSets
+  python3 grades.py whatif --target 93 90 80
+"""
+
+import os
+import json
+import argparse
+import tempfile
+from pathlib import Path
+from datetime import datetime
+
+from file_lock import FileLock
+
+GRADES_NAME = ".grades.json"
+CACHE_NAME = ".grades.cache.json"
+LOCK_NAME = ".grades.lock"
+
+FINAL_CATEGORY = "Final"
+DEFAULT_TARGETS = (90.0, 80.0, 70.0)
+
+class CategoryAggregate:
+    """Running weight/count/total of one category's assignment percentages"""
+    __slots__ = ("weight", "count", "total")
+
+    def __init__(self, weight=0.0, count=0, total=0.0):
+        self.weight = weight
+        self.count = count
+        self.total = total
+
+    @property
+    def mean(self):
+        return self.total / self.count if self.count else None
+
+    def add(self, percentage):
+        self.count += 1
+        self.total += percentage
+
+    def remove(self, percentage):
+        self.count -= 1
+        self.total = self.total - percentage if self.count else 0.0
+
+    def to_list(self):
+        return [self.weight, self.count, self.total]
+
+def course_aggregates(record):
+    """Build {category: CategoryAggregate} for one course with a single pass over its assignments"""
+    aggregates = {name: CategoryAggregate(float(category.get("weight", 0.0)))
+                  for name, category in record.get("categories", {}).items()}
+    for assignment in record.get("assignments", {}).values():
+        percentage = assignment.get("percentage")
+        if percentage is not None:
+            aggregates.setdefault(assignment.get("category", ""), CategoryAggregate()).add(percentage)
+    return aggregates
+
+def course_standing(aggregates):
+    """(weighted percentage, graded weight) over categories with grades; percentage None if none"""
+    earned = 0.0
+    graded_weight = 0.0
+    for aggregate in aggregates.values():
+        if aggregate.count and aggregate.weight:
+            earned += aggregate.weight * aggregate.mean
+            graded_weight += aggregate.weight
+    return (earned / graded_weight if graded_weight else None), graded_weight
+
+def write_json(path, data, **dump_args):
+    """Write data to path through a temp file and os.replace, so readers never see a partial file"""
+    fd, tmp_path = tempfile.mkstemp(dir=path.parent, prefix=f"{path.name}.", suffix=".tmp")
+    try:
+        # mkstemp creates 0600 files; keep the permissions a plain open() would give
+        umask = os.umask(0)
+        os.umask(umask)
+        os.chmod(tmp_path, 0o666 & ~umask)
+        with os.fdopen(fd, 'w') as f:
+            json.dump(data, f, **dump_args)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+    except BaseException:
+        os.unlink(tmp_path)
+        raise
+
+class GradeBook:
+    """Grades file plus its aggregate cache, both under the root"""
+
+    def __init__(self, root_dir="~/university"):
+        self.root_dir = Path(root_dir).expanduser()
+        self.grades_file = self.root_dir / GRADES_NAME
+        self.cache_file = self.root_dir / CACHE_NAME
+        self.lock = FileLock(self.root_dir / LOCK_NAME)
+        self._grades = None
+        self._aggregates = None
+        self._stamp = None
+
+    def grades_stamp(self):
+        """(mtime, size) of the grades file, or None if it doesn't exist"""
+        try:
+            st = self.grades_file.stat()
+            return (st.st_mtime_ns, st.st_size)
+        except FileNotFoundError:
+            return None
+
+    def refresh(self):
+        """Drop cached state if another process changed the grades file"""
+        if self._stamp is not None and self.grades_stamp() != self._stamp:
+            self._grades = None
+            self._aggregates = None
+            self._stamp = None
+
+    @property
+    def grades(self):
+        """The full grades file, parsed on first use"""
+        if self._grades is None:
+            self._stamp = self.grades_stamp()
+            try:
+                with open(self.grades_file, 'r') as f:
+                    self._grades = json.load(f)
+            except (OSError, ValueError):
+                self._grades = {}
+        return self._grades
+
+    @property
+    def aggregates(self):
+        """{course: {category: CategoryAggregate}}, from the cache when it matches the grades file"""
+        if self._aggregates is None:
+            self._aggregates = self.load_cache()
+            if self._aggregates is None:
+                self._aggregates = {course: course_aggregates(record)
+                                    for course, record in self.grades.items()}
+                self.save_cache()
+        return self._aggregates
+
+    def load_cache(self):
+        stamp = self.grades_stamp()
+        try:
+            with open(self.cache_file, 'r') as f:
+                data = json.load(f)
+            if data["stamp"] != (list(stamp) if stamp else None):
+                return None
+            self._stamp = stamp
+            return {course: {name: CategoryAggregate(*values) for name, values in categories.items()}
+                    for course, categories in data["courses"].items()}
+        except (OSError, ValueError, KeyError, TypeError):
+            return None
+
+    def save_cache(self):
+        """Atomically write the aggregates, stamped with the grades file they describe"""
+        data = {
+            "stamp": list(self._stamp) if self._stamp else None,
+            "courses": {course: {name: aggregate.to_list() for name, aggregate in categories.items()}
+                        for course, categories in self._aggregates.items()},
+        }
+        try:
+            write_json(self.cache_file, data, separators=(",", ":"))
+        except OSError:
+            pass  # the cache is only an optimization
+
+    def standings(self):
+        """{course: (percentage, graded weight)} for courses with at least one graded category"""
+        standings = {}
+        for course, aggregates in self.aggregates.items():
+            percentage, graded_weight = course_standing(aggregates)
+            if percentage is not None:
+                standings[course] = (percentage, graded_weight)
+        return standings
+
+    def record_assignment(self, course, name, grade, max_points=100.0, category=""):
+        """Add or change one assignment, updating its category aggregate in place"""
+        with self.lock:
+            self.refresh()
+            grades = self.grades
+            aggregates = self.aggregates
+            if course not in grades:
+                raise KeyError(f"Unknown course: {course}")
+            record = grades[course]
+            record.setdefault("assignments", {})
+            record.setdefault("categories", {})
+            course_aggs = aggregates.setdefault(course, {})
+
+            percentage = grade / max_points * 100 if max_points else 0.0
+            old = record["assignments"].get(name)
+            if old:
+                category = category or old.get("category", "")
+                old_category = old.get("category", "")
+                if old.get("percentage") is not None and old_category in course_aggs:
+                    course_aggs[old_category].remove(old["percentage"])
+                if old_category != category and old_category in record["categories"]:
+                    members = record["categories"][old_category]["assignments"]
+                    if name in members:
+                        members.remove(name)
+
+            record["assignments"][name] = {
+                "grade": grade,
+                "max_points": max_points,
+                "percentage": percentage,
+                "date": datetime.now().isoformat(),
+                "category": category,
+            }
+            if category:
+                members = record["categories"].setdefault(category, {"weight": 0.0, "assignments": []})["assignments"]
+                if name not in members:
+                    members.append(name)
+            course_aggs.setdefault(category, CategoryAggregate(
+                float(record["categories"].get(category, {}).get("weight", 0.0)))).add(percentage)
+
+            self.save_grades()
+            self.save_cache()
+        return percentage
+
+    def save_grades(self):
+        """Atomically rewrite the grades file and remember its new stamp"""
+        write_json(self.grades_file, self._grades, indent=2)
+        self._stamp = self.grades_stamp()
+
+    def what_if(self, targets=DEFAULT_TARGETS, final=FINAL_CATEGORY):
+        """Average needed on the remaining work to reach each target, for every course
+
+        The target is over the course's whole weight: weighted categories
+        without grades yet are assumed to score the same as the final, so
+        the result is the average needed on the final and everything else
+        still ungraded. Courses without a weighted final category are
+        skipped. Returns (courses, rows) with rows[i][j] the score course i
+        needs for targets[j].
+        """
+        # Per-course quantities, gathered in a single pass over the courses
+        courses, earned, total_weights, remaining_weights = [], [], [], []
+        for course, aggregates in self.aggregates.items():
+            final_agg = aggregates.get(final)
+            if not final_agg or not final_agg.weight:
+                continue
+            others = {name: agg for name, agg in aggregates.items() if name != final}
+            percentage, graded_weight = course_standing(others)
+            total_weight = final_agg.weight + sum(agg.weight for agg in others.values())
+            courses.append(course)
+            earned.append((percentage or 0.0) * graded_weight)
+            total_weights.append(total_weight)
+            remaining_weights.append(total_weight - graded_weight)
+
+        # required = (target * W_total - earned) / W_remaining
+        rows = [[(target * w - e) / wr for target in targets]
+                for e, w, wr in zip(earned, total_weights, remaining_weights)]
+        return courses, rows
+
+def format_needed(score):
+    if score > 100:
+        return "out of reach"
+    if score <= 0:
+        return "secured"
+    return f"{score:.1f}%"
+
+def main():
+    parser = argparse.ArgumentParser(description="Grade standings and what-if analysis")
+    parser.add_argument("--root", default="~/university", help="Root directory")
+    subparsers = parser.add_subparsers(dest="action")
+
+    subparsers.add_parser("standings", help="Current weighted standing per course")
+
+    add = subparsers.add_parser("add", help="Record or update an assignment grade")
+    add.add_argument("course")
+    add.add_argument("name", help="Assignment name")
+    add.add_argument("grade", type=float)
+    add.add_argument("--max", type=float, default=100.0, help="Maximum points")
+    add.add_argument("--category", default="", help="Grade category (e.g. PSets)")
+
+    whatif = subparsers.add_parser("whatif", help="Score needed on the final and other ungraded work for each target")
+    whatif.add_argument("--target", type=float, nargs="+", default=list(DEFAULT_TARGETS))
+    whatif.add_argument("--category", default=FINAL_CATEGORY, help="Final exam category")
+
+    args = parser.parse_args()
+    book = GradeBook(args.root)
+
+    if args.action == "add":
+        try:
+            percentage = book.record_assignment(args.course, args.name, args.grade, args.max, args.category)
+        except KeyError as e:
+            print(f"❌ {e.args[0]}")
+            return
+        print(f"✓ {args.course}: {args.name} = {percentage:.1f}%")
+        percentage, graded_weight = course_standing(book.aggregates[args.course])
+        if percentage is not None:
+            print(f"  Standing: {percentage:.1f}% ({graded_weight:g}% of the grade so far)")
+    elif args.action == "whatif":
+        courses, rows = book.what_if(args.target, args.category)
+        if not courses:
+            print(f"No courses with a weighted '{args.category}' category")
+            return
+        header = "".join(f"{target:>14g}%" for target in args.target)
+        print(f"{'Course':<30}{header}")
+        for course, row in zip(courses, rows):
+            print(f"{course:<30}" + "".join(f"{format_needed(score):>15}" for score in row))
+    else:
+        standings = book.standings()
+        if not standings:
+            print("No graded assignments yet")
+            return
+        for course, (percentage, graded_weight) in sorted(standings.items()):
+            print(f"  {course:<30} {percentage:6.1f}%  ({graded_weight:g}% graded)")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,683 @@
+#!/usr/bin/env python3
+"""
+TeX-free HTML preview of a course's lecture notes
+Translates each lecture's body (as MasterCompiler.extract_content gives it)
+into a static HTML page: \\lecture and sections become headings, the
+theorem/definition/problem environments and the preamble's boxes become
+numbered blocks, lists and text formatting carry over, and math is passed
+through untouched for MathJax to render in the browser. Simple math macros
+from preamble.tex are handed to MathJax, so \\mcP or \\ran still work.
+
+Pages are rebuilt per lecture, only for lectures whose file changed, so a
+preview after an edit takes milliseconds; figures and TikZ drawings show as
+placeholders. Output goes to the course's .preview/ directory.
+
+Usage:
+  python3 html_preview.py math55
+  python3 html_preview.py math55 --open
+  python3 html_preview.py math55 --watch
+  python3 compile_master.py math55 --html
+"""
+
+import os
+import re
+import sys
+import json
+import html
+import time
+import argparse
+import tempfile
+from pathlib import Path
+
+from catalog import file_stamp, get_catalog
+from compile_master import MasterCompiler
+from env_index import COMMENT_RE, PREAMBLE_ENVS, THEOREM_ENVS, canonical_kind, parse_begin_args, read_group
+
+PREVIEW_DIR = ".preview"
+STATE_NAME = "preview.json"
+STATE_VERSION = 2  # bump when the translation changes, to re-render every page
+CONFIG_NAME = "mathjax-config.js"
+STYLE_NAME = "preview.css"
+INDEX_NAME = "index.html"
+WATCH_INTERVAL = 0.5
+
+MATHJAX_URL = "https://cdn.jsdelivr.net/npm/mathjax@3/es5/tex-chtml-full.js"
+
+# Boxed environments beyond env_index's theorem kinds: {name: heading}
+BOX_ENVS = {"question": "Question", "qstion": "Question", "solution": "Solution", "note": "Note",
+            "wconc": "Wrong Concept", "myproof": "Proof", "subproof": "Proof", "mybox": ""}
+UNNUMBERED = {"proof", "solution", "note", "myproof", "subproof", "mybox"}
+# mybox takes {color}{title}
+TITLE_ARGS = {"mybox": 2}
+
+# Preamble shorthands for boxes: \dfn{title}{body} and friends, {name: (environment, arguments)}
+SHORTHANDS = {"dfn": ("definition", 2), "ex": ("example", 2), "qs": ("question", 2),
+              "pf": ("proof", 2), "nt": ("note", 1)}
+
+# Environments MathJax typesets itself, and the ones it needs rewritten
+MATH_ENVS = {"equation", "equation*", "align", "align*", "gather", "gather*", "multline", "multline*",
+             "eqnarray", "eqnarray*", "alignat", "alignat*", "flalign", "flalign*"}
+MATH_ENV_DELIMITERS = {"displaymath": ("\\[", "\\]"), "math": ("\\(", "\\)")}
+# Drawn by TeX only: shown as a placeholder
+OMITTED_ENVS = {"tikzpicture", "tikzcd", "pgfpicture", "algorithm", "algorithmic", "lstlisting"}
+LIST_TAGS = {"itemize": "ul", "enumerate": "ol", "description": "dl"}
+
+HEADINGS = {"chapter": 1, "section": 2, "subsection": 3, "subsubsection": 4, "paragraph": 5}
+INLINE_TAGS = {"textbf": "strong", "textit": "em", "emph": "em", "textsl": "em", "underline": "u",
+               "texttt": "code", "textsc": "span"}
+# Commands dropped along with their arguments
+DROPPED = {"label": 1, "vspace": 1, "hspace": 1, "vspace*": 1, "hspace*": 1, "setlength": 2,
+           "addtocounter": 2, "setcounter": 2, "course": 1, "index": 1, "caption*": 1, "input": 1}
+LITERALS = {"\\": "<br>", "newline": "<br>", ",": "&thinsp;", " ": " ", "\n": " ", "%": "%", "&": "&amp;",
+            "#": "#", "_": "_", "$": "$", "{": "{", "}": "}", "ldots": "…", "dots": "…", "LaTeX": "LaTeX",
+            "TeX": "TeX", "sol": "<strong><em>Solution:</em></strong>", "qquad": "&emsp;&emsp;",
+            "quad": "&emsp;", "textbackslash": "\\"}
+ACCENTS = {'"': "\u0308", "'": "\u0301", "`": "\u0300", "^": "\u0302", "~": "\u0303", "c": "\u0327"}
+FIGURE_COMMANDS = {"includegraphics", "incfig"}
+
+TOKEN_RE = re.compile(r"\\(?:[A-Za-z@]+\*?|.)|\$\$?|[{}~&]|\n[ \t]*\n\s*|---?|``|''", re.S)
+DOLLAR_RE = re.compile(r"(?<!\\)\$")
+BEGIN_NAME_RE = re.compile(r"\s*\{([^{}]+)\}")
+
+# Preamble macros handed to MathJax: \newcommand{\name}[n][default]{body}, \DeclareMathOperator
+MACRO_RE = re.compile(r"\\(?:re)?newcommand\*?\s*\{?\\([A-Za-z]+)\}?\s*(?:\[(\d)\])?\s*(?:\[([^\]]*)\])?")
+OPERATOR_RE = re.compile(r"\\DeclareMathOperator(\*?)\s*\{\\([A-Za-z]+)\}\s*\{([^{}]*)\}")
+# Bodies that only make sense to TeX itself
+NOT_MATH_RE = re.compile(r"\\(?:begin|end|[egx]?def|let|if\w*|set\w*|par|color|textcolor|footnotesize|"
+                         r"ttfamily|import|input|include\w*|chapter|section|vspace|newcommand|"
+                         r"renewcommand|ensuremath|label|tikz\w*|\w*@\w*|begingroup|sbox|usebox|pdf\w*|"
+                         r"mathpalette|mathchoice|rotatebox|href|item|refstepcounter|hfill|getcurrentref)\b|[@$\n]")
+
+STYLE = """body { max-width: 48em; margin: 2em auto; padding: 0 1em; font: 17px/1.55 Georgia, serif; color: #222; }
+nav { font-size: 0.85em; margin-bottom: 1.5em; }
+h1 { border-bottom: 1px solid #ccc; padding-bottom: 0.2em; }
+.box { border-left: 4px solid #888; background: #f6f6f6; padding: 0.4em 0.9em; margin: 1em 0; }
+.box > .box-title { font-weight: bold; margin-bottom: 0.3em; }
+.box-definition { border-color: #b22; background: #fbeeee; }
+.box-theorem, .box-lemma, .box-corollary, .box-proposition { border-color: #26a; background: #eef3fb; }
+.box-example, .box-exercise, .box-problem, .box-question { border-color: #2a6; background: #eef8f1; }
+.box-proof, .box-myproof, .box-subproof, .box-solution { border-color: #bbb; background: none; }
+.qed { float: right; }
+.omitted { border: 1px dashed #aaa; color: #777; padding: 0.5em; margin: 1em 0; font-size: 0.9em; }
+.ref { color: #26a; }
+.math-display { overflow-x: auto; }
+.center { text-align: center; }
+"""
+
+PAGE = """<!DOCTYPE html>
+<html lang="en">
+<head>
+<meta charset="utf-8">
+<title>{title}</title>
+<link rel="stylesheet" href="{style}">
+<script src="{config}"></script>
+<script id="MathJax-script" async src="{mathjax}"></script>
+</head>
+<body>
+<nav><a href="{index}">{course}</a></nav>
+<main>
+{body}
+</main>
+</body>
+</html>
+"""
+
+def math_macros(preamble_text: str) -> dict:
+    """MathJax tex.macros for the preamble's definitions that are plain math"""
+    text = "\n".join(COMMENT_RE.sub("", line) for line in preamble_text.splitlines())
+    macros = {}
+    for match in MACRO_RE.finditer(text):
+        name, count, default = match.groups()
+        body = read_group(text, match.end(), "{", "}")
+        if not body or NOT_MATH_RE.search(body[0]) or ("#" in body[0] and not count):
+            continue
+        if count:
+            macros[name] = [body[0], int(count)] + ([default] if default is not None else [])
+        else:
+            macros[name] = body[0]
+    for star, name, body in OPERATOR_RE.findall(text):
+        macros[name] = f"\\operatorname{star}{{{body}}}"
+    return macros
+
+def mathjax_config(macros: dict) -> str:
+    # Pages only contain \\( \\) and display math; dollar signs left in the text are literal
+    config = {"tex": {"macros": macros, "packages": {"[+]": ["mathtools"]}}}
+    return ("// Generated by html_preview.py from preamble.tex\n"
+            f"window.MathJax = {json.dumps(config, indent=1)};\n")
+
+class LectureRenderer:
+    """Translation of one lecture body to HTML
+
+    Text is scanned token by token; paragraphs are opened lazily by inline
+    output and closed by blank lines and block elements, so the HTML stays
+    well-formed around boxes and lists. `number` is the lecture number used
+    for section and box numbering until \\lecture sets it.
+    """
+
+    def __init__(self, number=0, figures_href="../"):
+        self.number = number
+        self.figures_href = figures_href
+        self.title = ""
+        self.sections = []            # [(anchor, heading text)]
+        self.anchors = 0              # headings so far, numbering their ids
+        self.counters = {}
+        self.out = []
+        self.in_paragraph = False
+        self.inline = False           # rendering into a heading or title: no paragraphs
+        self.envs = []                # open environments: (name, closing html)
+        self.items = []               # per open list: whether it has an \item yet
+
+    # Output
+    def emit(self, text):
+        if not self.inline and not self.in_paragraph:
+            self.out.append("<p>")
+            self.in_paragraph = True
+        self.out.append(text)
+
+    def block(self, text):
+        self.close_paragraph()
+        self.out.append(text + "\n")
+
+    def close_paragraph(self):
+        if self.in_paragraph and not self.inline:
+            self.out.append("</p>\n")
+        self.in_paragraph = False
+
+    def capture(self, tex) -> str:
+        """HTML of a fragment rendered inline, e.g. a heading"""
+        saved = self.out, self.in_paragraph, self.inline
+        self.out, self.in_paragraph, self.inline = [], False, True
+        self.render(tex)
+        result = "".join(self.out).strip()
+        self.out, self.in_paragraph, self.inline = saved
+        return result
+
+    def next_number(self, counter):
+        self.counters[counter] = self.counters.get(counter, 0) + 1
+        return f"{self.number}.{self.counters[counter]}" if self.number else str(self.counters[counter])
+
+    # Argument parsing
+    def skip_spaces(self, text, pos):
+        while pos < len(text) and text[pos] in " \t\n":
+            pos += 1
+        return pos
+
+    def group(self, text, pos, open_char="{", close_char="}"):
+        """(content, end) of a group after optional whitespace, else (None, pos)"""
+        found = read_group(text, self.skip_spaces(text, pos) if open_char == "{" else pos, open_char, close_char)
+        return found if found else (None, pos)
+
+    def argument(self, text, pos):
+        """Mandatory argument: a braced group, or the next single token"""
+        content, end = self.group(text, pos)
+        if content is not None:
+            return content, end
+        pos = self.skip_spaces(text, pos)
+        match = TOKEN_RE.match(text, pos)
+        if match and match.group().startswith("\\"):
+            return match.group(), match.end()
+        return text[pos:pos + 1], pos + 1
+
+    def arguments(self, text, pos, count):
+        values = []
+        for _ in range(count):
+            value, pos = self.argument(text, pos)
+            values.append(value)
+        return values, pos
+
+    # Math
+    def math(self, body, display, pos):
+        escaped = html.escape(body, quote=False)
+        if display:
+            self.block(f'<div class="math-display">{escaped}</div>')
+        else:
+            self.emit(f'<span class="math">{escaped}</span>')
+        return pos
+
+    def delimited_math(self, text, pos, opener, closer, display):
+        end = text.find(closer, pos)
+        if end < 0:
+            end = len(text)
+        return self.math(f"{opener}{text[pos:end]}{closer}", display, end + len(closer))
+
+    def dollar_math(self, text, pos, double):
+        if double:
+            end = text.find("$$", pos)
+            end = len(text) if end < 0 else end
+            return self.math(f"\\[{text[pos:end]}\\]", True, end + 2)
+        match = DOLLAR_RE.search(text, pos)
+        end = match.start() if match else len(text)
+        return self.math(f"\\({text[pos:end]}\\)", False, end + 1)
+
+    # Environments
+    def environment_end(self, text, pos, name):
+        """Position of the \\end{name} closing an environment whose body starts at pos"""
+        begin, end = f"\\begin{{{name}}}", f"\\end{{{name}}}"
+        depth = 1
+        while True:
+            next_end = text.find(end, pos)
+            if next_end < 0:
+                return len(text), len(text)
+            next_begin = text.find(begin, pos)
+            if 0 <= next_begin < next_end:
+                depth += 1
+                pos = next_begin + len(begin)
+                continue
+            depth -= 1
+            if depth == 0:
+                return next_end, next_end + len(end)
+            pos = next_end + len(end)
+
+    def box(self, name, title="", label=""):
+        """Open a boxed environment; returns its closing HTML"""
+        kind = canonical_kind(name)
+        heading = BOX_ENVS.get(name, kind.capitalize())
+        if name not in UNNUMBERED and kind not in UNNUMBERED:
+            heading = f"{heading} {self.next_number(kind)}"
+        if title:
+            heading = f"{heading} ({self.capture(title)})" if heading else self.capture(title)
+        anchor = f' id="{html.escape(label)}"' if label else ""
+        self.block(f'<div class="box box-{kind}"{anchor}>')
+        if heading:
+            self.block(f'<div class="box-title">{heading}</div>')
+        qed = '<span class="qed">∎</span>' if kind in ("proof", "myproof", "subproof") else ""
+        return f"{qed}</div>"
+
+    def begin(self, text, pos):
+        match = BEGIN_NAME_RE.match(text, pos)
+        if not match:
+            return pos
+        name, pos = match.group(1).strip(), match.end()
+
+        if name in MATH_ENVS:
+            body_end, end = self.environment_end(text, pos, name)
+            return self.math(f"\\begin{{{name}}}{text[pos:body_end]}\\end{{{name}}}", True, end)
+        if name in MATH_ENV_DELIMITERS:
+            opener, closer = MATH_ENV_DELIMITERS[name]
+            body_end, end = self.environment_end(text, pos, name)
+            return self.math(f"{opener}{text[pos:body_end]}{closer}", name == "displaymath", end)
+        if name in OMITTED_ENVS:
+            _, end = self.environment_end(text, pos, name)
+            self.block(f'<div class="omitted">[{html.escape(name)} — see the PDF]</div>')
+            return end
+
+        kind = canonical_kind(name)
+        if kind in THEOREM_ENVS or kind in PREAMBLE_ENVS or name in BOX_ENVS:
+            if name in TITLE_ARGS:
+                _, pos = self.group(text, pos, "[", "]")
+                values, pos = self.arguments(text, pos, TITLE_ARGS[name])
+                title, label = values[-1], ""
+            else:
+                line_end = text.find("\n", pos)
+                line_end = len(text) if line_end < 0 else line_end
+                title, label, rest = parse_begin_args(text[pos:line_end], kind)
+                pos = line_end - len(rest)
+            self.envs.append((name, self.box(name, title, label)))
+            return pos
+        if name in LIST_TAGS:
+            _, pos = self.group(text, pos, "[", "]")
+            tag = LIST_TAGS[name]
+            self.block(f"<{tag}>")
+            self.envs.append((name, ("</li>" if tag != "dl" else "") + f"</{tag}>"))
+            self.items.append(False)
+            return pos
+        if name == "figure":
+            _, pos = self.group(text, pos, "[", "]")
+            self.block("<figure>")
+            self.envs.append((name, "</figure>"))
+            return pos
+        if name == "center":
+            self.block('<div class="center">')
+            self.envs.append((name, "</div>"))
+            return pos
+        # Anything else: keep the content, drop the wrapper
+        self.envs.append((name, ""))
+        return pos
+
+    def end(self, text, pos):
+        match = BEGIN_NAME_RE.match(text, pos)
+        if not match:
+            return pos
+        self.close_environments(match.group(1).strip())
+        return match.end()
+
+    def close_environments(self, name=None):
+        """Close open environments up to `name` (all of them with None); tolerates a missing \\end"""
+        while self.envs:
+            open_name, closing = self.envs.pop()
+            if open_name in LIST_TAGS:
+                started = self.items.pop()
+                if not started and closing.startswith("</li>"):
+                    closing = closing[len("</li>"):]
+            if closing:
+                self.block(closing)
+            if open_name == name:
+                break
+
+    def item(self, text, pos):
+        label, pos = self.group(text, pos, "[", "]")
+        list_name = next((name for name, _ in reversed(self.envs) if name in LIST_TAGS), None)
+        if list_name is None:
+            return pos
+        started = self.items[-1]
+        self.items[-1] = True
+        if list_name == "description":
+            self.block(f"<dt>{self.capture(label or '')}</dt><dd>")
+            return pos
+        self.block(("</li>" if started else "") + "<li>")
+        if label is not None:
+            self.emit(f"<strong>{self.capture(label)}</strong> ")
+        return pos
+
+    # Commands
+    def lecture(self, text, pos):
+        (number, title), pos = self.arguments(text, pos, 2)
+        date, date_end = self.group(text, pos)
+        if date is not None and "\n\n" not in text[pos:date_end]:
+            pos = date_end
+        try:
+            self.number = int(number.strip())
+        except ValueError:
+            pass
+        self.counters = {}
+        self.title = self.capture(title)
+        anchor = f"lecture-{self.number}"
+        self.sections.append((anchor, f"Lecture {self.number}: {self.title}"))
+        self.block(f'<h1 id="{anchor}">Lecture {self.number}: {self.title}</h1>')
+        return pos
+
+    def heading(self, command, text, pos):
+        starred = command.endswith("*")
+        name = command.rstrip("*")
+        _, pos = self.group(text, pos, "[", "]")
+        title, pos = self.argument(text, pos)
+        level = HEADINGS[name]
+        content = self.capture(title)
+        if name in ("section", "subsection") and not starred:
+            number = self.next_number(name)
+            if name == "section":
+                self.counters.pop("subsection", None)
+            else:
+                number = f"{self.number}.{self.counters.get('section', 0)}.{self.counters[name]}"
+            content = f"{number} {content}"
+        # Every heading gets its own id, including the levels left out of the index
+        self.anchors += 1
+        anchor = f"s-{self.anchors}"
+        if level <= 3:
+            self.sections.append((anchor, content))
+        self.block(f'<h{level} id="{anchor}">{content}</h{level}>')
+        return pos
+
+    def figure(self, command, text, pos):
+        _, pos = self.group(text, pos, "[", "]")
+        if command == "incfig":
+            (_, name), pos = self.arguments(text, pos, 2)
+            target = f"figures/{name.strip()}.pdf"
+        else:
+            name, pos = self.argument(text, pos)
+            target = name.strip().removeprefix("./")
+            if not Path(target).suffix:
+                target += ".pdf"
+        href = html.escape(self.figures_href + target)
+        self.block(f'<div class="omitted">[figure: <a href="{href}">{html.escape(target)}</a>]</div>')
+        return pos
+
+    def command(self, token, text, pos):
+        name = token[1:]
+        if name == "(":
+            return self.delimited_math(text, pos, "\\(", "\\)", False)
+        if name == "[":
+            return self.delimited_math(text, pos, "\\[", "\\]", True)
+        if name == "begin":
+            return self.begin(text, pos)
+        if name == "end":
+            return self.end(text, pos)
+        if name == "item":
+            return self.item(text, pos)
+        if name == "lecture":
+            return self.lecture(text, pos)
+        if name.rstrip("*") in HEADINGS:
+            return self.heading(name, text, pos)
+        if name in SHORTHANDS:
+            kind, count = SHORTHANDS[name]
+            values, pos = self.arguments(text, pos, count)
+            title = values[0] if count == 2 else ""
+            closing = self.box(kind, title)
+            self.render(values[-1])
+            self.block(closing)
+            return pos
+        if name in INLINE_TAGS:
+            content, pos = self.argument(text, pos)
+            tag = INLINE_TAGS[name]
+            self.emit(f"<{tag}>{self.capture(content)}</{tag}>")
+            return pos
+        if name in FIGURE_COMMANDS:
+            return self.figure(name, text, pos)
+        if name == "caption":
+            content, pos = self.argument(text, pos)
+            caption = self.capture(content)
+            if caption:
+                self.block(f"<figcaption>{caption}</figcaption>")
+            return pos
+        if name in ("ref", "eqref", "pageref", "cref", "Cref", "autoref"):
+            key, pos = self.argument(text, pos)
+            self.emit(f'<a class="ref" href="#{html.escape(key)}">{html.escape(key)}</a>')
+            return pos
+        if name in DROPPED:
+            _, pos = self.arguments(text, pos, DROPPED[name])
+            return pos
+        if name == "par":
+            self.close_paragraph()
+            return pos
+        if name in LITERALS:
+            self.emit(LITERALS[name])
+            return pos
+        if name in ACCENTS:
+            letter, pos = self.argument(text, pos)
+            self.emit(html.escape(letter.replace("\\i", "i")) + ACCENTS[name])
+            return pos
+        # Unknown command: drop it and keep whatever follows as text
+        return pos
+
+    def render(self, text):
+        pos = 0
+        while pos < len(text):
+            match = TOKEN_RE.search(text, pos)
+            if not match:
+                self.emit(html.escape(text[pos:], quote=False))
+                break
+            if match.start() > pos:
+                chunk = text[pos:match.start()]
+                if chunk.strip() or self.in_paragraph or self.inline:
+                    self.emit(html.escape(chunk, quote=False))
+            token, pos = match.group(), match.end()
+            if token.startswith("\\"):
+                pos = self.command(token, text, pos)
+            elif token == "$$":
+                pos = self.dollar_math(text, pos, True)
+            elif token == "$":
+                pos = self.dollar_math(text, pos, False)
+            elif token == "{":
+                content, end = read_group(text, match.start(), "{", "}") or (text[pos:], len(text))
+                self.render(content)
+                pos = end
+            elif token == "}":
+                pass
+            elif token == "~":
+                self.emit("&nbsp;")
+            elif token == "&":
+                self.emit(" ")
+            elif token == "---":
+                self.emit("—")
+            elif token == "--":
+                self.emit("–")
+            elif token == "``":
+                self.emit("“")
+            elif token == "''":
+                self.emit("”")
+            else:  # blank line
+                self.close_paragraph()
+
+    def finish(self) -> str:
+        self.close_environments()
+        self.close_paragraph()
+        return "".join(self.out)
+
+def render_lecture(content: str, number=0):
+    """(body html, lecture title, [(anchor, heading)]) of one lecture's extracted content"""
+    text = "\n".join(COMMENT_RE.sub("", line) for line in content.splitlines())
+    renderer = LectureRenderer(number)
+    renderer.render(text)
+    return renderer.finish(), renderer.title, renderer.sections
+
+class HtmlPreview:
+    """A course's .preview/ directory, rebuilt per changed lecture"""
+
+    def __init__(self, root_dir="~/university", course_name=""):
+        self.root_dir = Path(root_dir).expanduser()
+        self.course_name = course_name
+        self.course_path = self.root_dir / course_name
+        self.output_dir = self.course_path / PREVIEW_DIR
+        self.state_file = self.output_dir / STATE_NAME
+        self.extractor = MasterCompiler(self.root_dir)
+
+    def load_state(self):
+        try:
+            with open(self.state_file, 'r') as f:
+                state = json.load(f)
+        except (OSError, ValueError):
+            return {}
+        return state if state.get("version") == STATE_VERSION else {}
+
+    def save_state(self, state):
+        self.replace(self.state_file, json.dumps(state, indent=1))
+
+    def write(self, name, text):
+        self.replace(self.output_dir / name, text)
+
+    def replace(self, path, text):
+        """Write text to path through a temp file of our own, so concurrent previews can't clobber it"""
+        fd, tmp_path = tempfile.mkstemp(dir=path.parent, prefix=f"{path.name}.", suffix=".tmp")
+        try:
+            with os.fdopen(fd, 'w') as f:
+                f.write(text)
+            os.chmod(tmp_path, 0o644)
+            os.replace(tmp_path, path)
+        except BaseException:
+            os.unlink(tmp_path)
+            raise
+
+    def page(self, title, body, index=INDEX_NAME):
+        return PAGE.format(title=html.escape(title), style=STYLE_NAME, config=CONFIG_NAME,
+                           mathjax=MATHJAX_URL, index=index, course=html.escape(self.course_name), body=body)
+
+    def write_config(self, state):
+        """mathjax-config.js and preview.css, when the preamble changed"""
+        preamble = self.extractor.find_preamble()
+        stamp = file_stamp(preamble) if preamble else None
+        stamp = list(stamp) if stamp else None
+        if state.get("preamble") == stamp and (self.output_dir / CONFIG_NAME).exists():
+            return stamp
+        macros = {}
+        if preamble:
+            with open(preamble, 'r', errors='replace') as f:
+                macros = math_macros(f.read())
+        self.write(CONFIG_NAME, mathjax_config(macros))
+        self.write(STYLE_NAME, STYLE)
+        return stamp
+
+    def build(self):
+        """Render changed lectures and the index; (index path, rendered, total)"""
+        self.output_dir.mkdir(exist_ok=True)
+        state = self.load_state()
+        previous = state.get("lectures", {})
+        lectures = {}
+        rendered = 0
+        for position, lecture in enumerate(get_catalog(self.root_dir).lecture_files(self.course_name), 1):
+            rel = lecture.relative_to(self.course_path).as_posix()
+            stamp = file_stamp(lecture)
+            stamp = list(stamp) if stamp else None
+            entry = previous.get(rel)
+            if entry and entry["stamp"] == stamp and (self.output_dir / entry["page"]).exists():
+                lectures[rel] = entry
+                continue
+            try:
+                content = self.extractor.extract_content(lecture)
+            except OSError:
+                continue
+            body, title, sections = render_lecture(content, position)
+            page_name = f"{Path(rel).stem}.html"
+            self.write(page_name, self.page(f"{self.course_name}: {title or Path(rel).stem}", body))
+            lectures[rel] = {"stamp": stamp, "page": page_name, "title": title, "sections": sections}
+            rendered += 1
+
+        # Pages of lectures that are gone
+        pages = {entry["page"] for entry in lectures.values()}
+        for entry in previous.values():
+            if entry["page"] not in pages:
+                (self.output_dir / entry["page"]).unlink(missing_ok=True)
+
+        preamble = self.write_config(state)
+        if rendered or lectures.keys() != previous.keys() or not (self.output_dir / INDEX_NAME).exists():
+            self.write(INDEX_NAME, self.page(self.course_name, self.index_body(lectures)))
+        self.save_state({"version": STATE_VERSION, "preamble": preamble, "lectures": lectures})
+        return self.output_dir / INDEX_NAME, rendered, len(lectures)
+
+    def index_body(self, lectures):
+        lines = [f"<h1>{html.escape(self.course_name)}</h1>", "<ol>"]
+        for rel, entry in lectures.items():
+            title = entry["title"] or html.escape(Path(rel).stem)
+            page = html.escape(entry["page"])
+            lines.append(f'<li><a href="{page}">{title}</a>')
+            subsections = [f'<li><a href="{page}#{anchor}">{heading}</a></li>'
+                           for anchor, heading in entry["sections"] if not anchor.startswith("lecture-")]
+            if subsections:
+                lines.append("<ul>" + "".join(subsections) + "</ul>")
+            lines.append("</li>")
+        lines.append("</ol>")
+        return "\n".join(lines)
+
+    def report(self):
+        """Build once and print what was done; the index path, or None without the course"""
+        if not self.course_path.exists():
+            print(f"❌ Course directory not found: {self.course_path}")
+            return None
+        started = time.perf_counter()
+        index, rendered, total = self.build()
+        elapsed = time.perf_counter() - started
+        print(f"✨ Preview: rendered {rendered} of {total} lectures in {elapsed * 1000:.0f} ms → {index}")
+        return index
+
+    def watch(self, interval=WATCH_INTERVAL):
+        """Rebuild whenever a lecture changes, until Ctrl-C"""
+        print(f"👀 Watching {self.course_name} (Ctrl-C to stop)")
+        try:
+            while True:
+                started = time.perf_counter()
+                _, rendered, total = self.build()
+                if rendered:
+                    elapsed = time.perf_counter() - started
+                    print(f"✓ Rendered {rendered} of {total} lectures in {elapsed * 1000:.0f} ms")
+                time.sleep(interval)
+        except KeyboardInterrupt:
+            print()
+
+def main():
+    parser = argparse.ArgumentParser(description="Build a TeX-free HTML preview of a course")
+    parser.add_argument("course", help="Course name")
+    parser.add_argument("--root", default="~/university", help="Root directory")
+    parser.add_argument("--open", "-o", action="store_true", help="Open the preview in a browser")
+    parser.add_argument("--watch", "-w", action="store_true", help="Rebuild as lectures change")
+    args = parser.parse_args()
+
+    preview = HtmlPreview(args.root, args.course)
+    index = preview.report()
+    if index is None:
+        sys.exit(1)
+    if args.open:
+        preview.extractor.open_pdf(index)
+    if args.watch:
+        preview.watch()
+
+if __name__ == "__main__":
+    main()
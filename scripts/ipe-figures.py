@@ -10,6 +10,9 @@ import subprocess
 import argparse
 from pathlib import Path
 
+from tex_runner import IPE_TIMEOUT, run_supervised
+from tracing import span
+
 class IpeFigures:
     def __init__(self):
         self.ipe_template = '''<?xml version="1.0"?>
@@ -215,7 +218,8 @@ end="\end{itemize}"/>
         try:
             env = os.environ.copy()
             env['PATH'] = '/Library/TeX/texbin:' + env['PATH']
-            subprocess.run(['open', '-a', 'Ipe', str(ipe_file)], env=env)
+            with span("open", "subprocess", command=['open', '-a', 'Ipe', str(ipe_file)]):
+                subprocess.run(['open', '-a', 'Ipe', str(ipe_file)], env=env)
             print(f"Opened {clean_name}.ipe in Ipe")
             return clean_name
         except Exception as e:
@@ -232,7 +236,8 @@ end="\end{itemize}"/>
         ipe_file = figures_path / f"{clean_name}.ipe"
         
         if ipe_file.exists():
-            subprocess.run(['open', '-a', 'Ipe', str(ipe_file)])
+            with span("open", "subprocess", command=['open', '-a', 'Ipe', str(ipe_file)]):
+                subprocess.run(['open', '-a', 'Ipe', str(ipe_file)])
             print(f"Opened {clean_name}.ipe for editing")
         else:
             print(f"Figure {clean_name}.ipe not found. Use 'create' to make a new one.")
@@ -244,7 +249,8 @@ end="\end{itemize}"/>
             print("No figures directory found")
             return
         
-        ipe_files = list(figures_path.glob("*.ipe"))
+        with span("scan", "scan", path=str(figures_path)):
+            ipe_files = list(figures_path.glob("*.ipe"))
         if ipe_files:
             print("Available Ipe figures:")
             for ipe_file in sorted(ipe_files):
@@ -269,12 +275,11 @@ end="\end{itemize}"/>
         
         try:
             # Try to use ipetoipe command if available
-            result = subprocess.run(['ipetoipe', '-pdf', str(ipe_file), str(pdf_file)], 
-                                  capture_output=True, text=True)
-            if result.returncode == 0:
+            result = run_supervised(['ipetoipe', '-pdf', str(ipe_file), str(pdf_file)], timeout=IPE_TIMEOUT)
+            if result.ok:
                 print(f"Exported {clean_name}.ipe to PDF")
             else:
-                print("ipetoipe not available. Export manually from Ipe: File → Export as PDF")
+                print(f"ipetoipe {result.describe()}. Export manually from Ipe: File → Export as PDF")
         except FileNotFoundError:
             print("Manual export needed: In Ipe, go to File → Export as PDF")
 
@@ -0,0 +1,293 @@
+#!/usr/bin/env python3
+"""
+Multi-volume parallel master builds
+Splits a course into volumes of N lectures (master-vol1.tex, ...), compiles
+the volumes in parallel and assembles master.pdf from them with a global
+table of contents and bookmarks.
+
+Volumes are compiled in rounds, one pdflatex pass per volume per round, all
+in parallel. Each volume records its first and last page/chapter in its
+.aux, and the next round starts every volume where the volumes before it
+ended; the \\newlabel entries of all other volumes are fed in as well, so
+page numbers, \\ref and \\pageref across volumes come out as in a single
+document. Rounds repeat until nothing changes (usually two, or one when the
+previous build's .aux files are still there). A volume whose inputs and
+carried state match its last build isn't recompiled.
+
+Build outputs live in the course's .volumes/ directory; master.tex then
+\\includepdf's the volume PDFs (pdfpages is in the preamble). The combined
+PDF keeps printed page numbers, references and a clickable TOC, but links
+inside the lectures only work in the per-volume PDFs.
+"""
+
+import os
+import re
+import json
+import hashlib
+import tempfile
+import threading
+from pathlib import Path
+from concurrent.futures import ThreadPoolExecutor
+
+from artifact_cache import file_hash, tex_inputs
+from env_index import read_group
+from tex_runner import TEX_TIMEOUT, run_supervised
+
+VOLUME_DIR = ".volumes"
+BUILDS_NAME = "builds.json"
+MAX_ROUNDS = 5
+
+# Counters carried from one volume into the next
+VOLUME_COUNTERS = ("page", "chapter")
+FIRST_STATE = {"page": 1, "chapter": 0}
+
+# TOC levels of \contentsline entries, for pdfpages' addtotoc
+TOC_LEVELS = {"part": -1, "chapter": 0, "section": 1, "subsection": 2, "subsubsection": 3}
+
+VOLUME_COUNTER_RE = re.compile(r"\\volume(start|end)\{(\w+)\}\{(-?\d+)\}")
+CONTENTSLINE = "\\contentsline"
+
+# Preamble part of every volume: \recordvolumestart (placed after the state
+# file is read) and the end of the document write the carried counters to the .aux
+VOLUME_HOOKS = r"""
+%% Volume bookkeeping for the parallel master build
+\makeatletter
+\def\volumestart#1#2{}
+\def\volumeend#1#2{}
+\def\volume@write#1#2{\ifcsname c@#2\endcsname
+  \immediate\write\@auxout{\string#1{#2}{\the\value{#2}}}\fi}
+\def\recordvolumestart{%s}
+\AtEndDocument{\clearpage%s}
+\makeatother
+"""
+
+def volume_hooks():
+    starts = "".join(f"\\volume@write\\volumestart{{{c}}}" for c in VOLUME_COUNTERS)
+    ends = "".join(f"\\volume@write\\volumeend{{{c}}}" for c in VOLUME_COUNTERS)
+    return VOLUME_HOOKS % (starts, ends)
+
+def state_input(name):
+    """Body lines of a volume that load its carried state and record where it starts"""
+    return f"\\input{{{VOLUME_DIR}/{name}-state.tex}}\n\\recordvolumestart"
+
+def partition(items, size):
+    """Consecutive chunks of `size` items"""
+    size = max(1, size)
+    return [items[i:i + size] for i in range(0, len(items), size)]
+
+def volume_name(number: int) -> str:
+    return f"master-vol{number}"
+
+def read_aux(aux_file):
+    """({"start": {counter: n}, "end": {...}}, [\\newlabel lines]) of a volume's .aux"""
+    counters = {"start": {}, "end": {}}
+    labels = []
+    try:
+        with open(aux_file, 'r', errors='replace') as f:
+            for line in f:
+                if line.startswith("\\newlabel{"):
+                    labels.append(line.rstrip("\n"))
+                    continue
+                match = VOLUME_COUNTER_RE.match(line)
+                if match:
+                    which, counter, value = match.groups()
+                    counters[which][counter] = int(value)
+    except OSError:
+        pass
+    return counters, labels
+
+def read_toc(toc_file):
+    """[(level name, heading, printed page)] of a volume's .toc"""
+    entries = []
+    try:
+        with open(toc_file, 'r', errors='replace') as f:
+            lines = f.readlines()
+    except OSError:
+        return entries
+    for line in lines:
+        if not line.startswith(CONTENTSLINE):
+            continue
+        level = read_group(line, len(CONTENTSLINE), "{", "}")
+        heading = level and read_group(line, level[1], "{", "}")
+        page = heading and read_group(line, heading[1], "{", "}")
+        if page and level[0] in TOC_LEVELS and page[0].strip().isdigit():
+            entries.append((level[0], heading[0], int(page[0])))
+    return entries
+
+def chain_states(volumes):
+    """Start state of each volume: where the volumes before it ended
+
+    `volumes` holds each volume's aux counters from the last round; a
+    volume's length is its end minus its start, so a volume that started in
+    the wrong place still says how far the next one must be shifted.
+    """
+    states = []
+    state = dict(FIRST_STATE)
+    for counters in volumes:
+        states.append(dict(state))
+        start, end = counters["start"], counters["end"]
+        for counter in VOLUME_COUNTERS:
+            if counter in start and counter in end:
+                state[counter] += end[counter] - start[counter]
+    return states
+
+def state_tex(state, labels):
+    """Preamble-free state file a volume inputs right after \\begin{document}"""
+    lines = ["% Generated by master_volumes.py: where this volume starts, and the other volumes' labels",
+             "\\makeatletter"]
+    lines += [f"\\setcounter{{{counter}}}{{{value}}}" for counter, value in state.items()]
+    lines += labels
+    lines.append("\\makeatother")
+    return "\n".join(lines) + "\n"
+
+class VolumeBuild:
+    """One course's volumes: generation, parallel compile rounds and assembly"""
+
+    def __init__(self, course_path, jobs=None, timeout=TEX_TIMEOUT, env=None):
+        self.course_path = Path(course_path)
+        self.build_dir = self.course_path / VOLUME_DIR
+        self.jobs = jobs or os.cpu_count() or 1
+        self.timeout = timeout
+        self.env = env
+        self.names = []
+        self.builds = {}   # volume name -> digest of its inputs at its last successful pass
+        self.compiled = 0
+
+    def paths(self, name, suffix):
+        return self.build_dir / f"{name}{suffix}"
+
+    def write_volumes(self, volume_texts):
+        """Write master-volN.tex for each volume's full document text"""
+        self.build_dir.mkdir(exist_ok=True)
+        self.names = []
+        for number, text in enumerate(volume_texts, 1):
+            name = volume_name(number)
+            self.names.append(name)
+            with open(self.course_path / f"{name}.tex", 'w') as f:
+                f.write(text)
+        # Volumes left over from a build with more of them
+        for stale in self.course_path.glob("master-vol*.tex"):
+            if stale.stem not in self.names:
+                stale.unlink()
+
+    # Digests of the last successful pass per volume
+    def load_builds(self):
+        try:
+            with open(self.build_dir / BUILDS_NAME, 'r') as f:
+                self.builds = json.load(f)
+        except (OSError, ValueError):
+            self.builds = {}
+
+    def save_builds(self):
+        fd, tmp_path = tempfile.mkstemp(dir=self.build_dir, prefix=f"{BUILDS_NAME}.", suffix=".tmp")
+        try:
+            with os.fdopen(fd, 'w') as f:
+                json.dump(self.builds, f, indent=1, sort_keys=True)
+            os.chmod(tmp_path, 0o644)
+            os.replace(tmp_path, self.build_dir / BUILDS_NAME)
+        except BaseException:
+            os.unlink(tmp_path)
+            raise
+
+    def digest(self, name):
+        """Hash of everything a volume's pass reads, including its state file"""
+        digest = hashlib.sha256()
+        for path in tex_inputs(self.course_path / f"{name}.tex"):
+            digest.update(f"{path}\0{file_hash(path)}\n".encode())
+        aux = self.paths(name, ".aux")
+        digest.update((file_hash(aux) if aux.exists() else "").encode())
+        return digest.hexdigest()
+
+    def compile_volume(self, name, cancel):
+        """One pdflatex pass of one volume, unless its inputs are unchanged since the last one"""
+        digest = self.digest(name)
+        if self.builds.get(name) == digest and self.paths(name, ".pdf").exists():
+            return None
+        command = ["pdflatex", "-interaction=nonstopmode", f"-output-directory={VOLUME_DIR}", f"{name}.tex"]
+        result = run_supervised(command, cwd=self.course_path, env=self.env, timeout=self.timeout,
+                                cancel=cancel)
+        if result.ok:
+            self.builds[name] = self.digest(name)
+        else:
+            self.builds.pop(name, None)
+            cancel.set()  # one failed volume fails the build; stop the others
+        return result
+
+    def run_round(self):
+        """Compile every volume once, in parallel; the failures as [(name, JobResult)]"""
+        cancel = threading.Event()
+        with ThreadPoolExecutor(max_workers=self.jobs) as pool:
+            futures = {name: pool.submit(self.compile_volume, name, cancel) for name in self.names}
+            results = {name: future.result() for name, future in futures.items()}
+        self.compiled += sum(result is not None for result in results.values())
+        self.save_builds()
+        return [(name, result) for name, result in results.items() if result is not None and not result.ok]
+
+    def read_volumes(self):
+        """Aux counters and labels of every volume"""
+        counters, labels = [], []
+        for name in self.names:
+            volume_counters, volume_labels = read_aux(self.paths(name, ".aux"))
+            counters.append(volume_counters)
+            labels.append(volume_labels)
+        return counters, labels
+
+    def write_states(self, states, labels):
+        for i, name in enumerate(self.names):
+            others = [line for j, volume_labels in enumerate(labels) if j != i for line in volume_labels]
+            text = state_tex(states[i], others)
+            path = self.paths(name, "-state.tex")
+            # Leave unchanged state files alone so unchanged volumes can be skipped
+            try:
+                with open(path, 'r') as f:
+                    if f.read() == text:
+                        continue
+            except OSError:
+                pass
+            with open(path, 'w') as f:
+                f.write(text)
+
+    def compile(self):
+        """Run rounds until page/chapter offsets and labels settle; (success, rounds, failures)"""
+        self.load_builds()
+        counters, labels = self.read_volumes()
+        states = chain_states(counters)
+        for round_number in range(1, MAX_ROUNDS + 1):
+            self.write_states(states, labels)
+            failures = self.run_round()
+            if failures:
+                return False, round_number, failures
+            counters, new_labels = self.read_volumes()
+            new_states = chain_states(counters)
+            settled = new_states == states and new_labels == labels
+            states, labels = new_states, new_labels
+            if settled:
+                return True, round_number, []
+        # Still moving (e.g. a page break that flips with the offset): the last round is close enough
+        self.write_states(states, labels)
+        return True, MAX_ROUNDS, []
+
+    def addtotoc(self, name, first_page):
+        """pdfpages addtotoc list reproducing a volume's TOC at its pages within the volume PDF"""
+        entries = []
+        for i, (level, heading, page) in enumerate(read_toc(self.paths(name, ".toc")), 1):
+            entries.append(f"{page - first_page + 1},{level},{TOC_LEVELS[level]},{{{heading}}},{name}-toc{i}")
+        return ",\n    ".join(entries)
+
+    def includes(self):
+        """\\includepdf lines for master.tex, with the volumes' TOC entries"""
+        counters, _ = self.read_volumes()
+        lines = []
+        for name, volume_counters in zip(self.names, counters):
+            first_page = volume_counters["start"].get("page", 1)
+            options = "pages=-"
+            toc = self.addtotoc(name, first_page)
+            if toc:
+                options += f",\n  addtotoc={{\n    {toc}}}"
+            lines.append(f"\\includepdf[{options}]{{{VOLUME_DIR}/{name}.pdf}}")
+        return "\n".join(lines)
+
+    def all_labels(self):
+        """State file text giving master.tex every volume's labels (for the glossary's \\pageref)"""
+        _, labels = self.read_volumes()
+        return state_tex({}, [line for volume_labels in labels for line in volume_labels])
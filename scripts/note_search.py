@@ -0,0 +1,268 @@
+#!/usr/bin/env python3
+"""
+Full-text search over lecture notes and problem sets
+Keeps an incremental inverted index of every course's lecture_*.tex and
+psets/hw_*.tex (see course_layout.py); only files whose mtime or size
+changed are re-tokenized before each search
+
+Usage:
+  python3 note_search.py "dihedral group"
+  python3 note_search.py '\\otimes' --course math55
+  python3 note_search.py "inner product" --limit 5 --rebuild
+"""
+
+import os
+import re
+import json
+import math
+import bisect
+import argparse
+import tempfile
+from pathlib import Path
+
+from course_layout import scan_sources, source_kind
+
+INDEX_NAME = ".search_index.json"
+INDEX_VERSION = 2
+
+COMMENT_RE = re.compile(r"(?<!\\)%.*")
+# Math environments come first so \begin/\end aren't taken as plain commands,
+# and escapes such as \$ or \\ are matched whole so they never toggle math mode
+TOKEN_RE = re.compile(r"\\(begin|end)\{(?:equation|align|gather|multline|eqnarray|displaymath|math)\*?\}"
+                      r"|\\[a-zA-Z]+|\\[\[\]()]|\\.|\$\$?|[A-Za-z][A-Za-z'-]*[A-Za-z]|[A-Za-z]")
+SECTION_RE = re.compile(r"\\(lecture|chapter|section|subsection|subsubsection)\*?\s*(?:\{\s*\d+\s*\})?\{([^{}]*)")
+
+# Common words too frequent to be useful search terms
+STOP_WORDS = {"the", "of", "and", "to", "in", "is", "be", "for", "on", "as", "by", "an", "or",
+              "it", "if", "we", "at", "this", "that", "with", "are", "let", "then", "so"}
+
+def stem(word: str) -> str:
+    """Very light English stemming so 'groups' finds 'group'"""
+    if len(word) > 4 and word.endswith("ies"):
+        return word[:-3] + "y"
+    if len(word) > 3 and word.endswith("s") and not word.endswith(("ss", "us", "is")):
+        return word[:-1]
+    return word
+
+def tokenize_line(line: str, in_math: bool):
+    """Terms on one source line, and whether math mode is still open at its end
+
+    Prose words are lowercased and stemmed; inside math, command names are
+    kept as '\\name' terms (so '\\otimes' is searchable) and letters ignored.
+    Text-mode commands (\\textbf, \\begin, ...) are markup and dropped.
+    """
+    terms = []
+    line = COMMENT_RE.sub("", line)
+    for match in TOKEN_RE.finditer(line):
+        token = match.group(0)
+        if match.group(1):
+            in_math = match.group(1) == "begin"
+        elif token in ("$", "$$"):
+            in_math = not in_math
+        elif token in ("\\(", "\\["):
+            in_math = True
+        elif token in ("\\)", "\\]"):
+            in_math = False
+        elif token.startswith("\\"):
+            if in_math and token[1:].isalpha():
+                terms.append(token)
+        elif not in_math:
+            word = token.lower()
+            if len(word) > 1 and word not in STOP_WORDS:
+                terms.append(stem(word))
+    return terms, in_math
+
+def query_terms(query: str):
+    """Tokenize a query the same way as the sources (math commands pass through)"""
+    terms = []
+    for token in query.split():
+        if token.startswith("\\"):
+            terms.append(token)
+        else:
+            terms.extend(tokenize_line(token, False)[0])
+    return terms
+
+def index_file(path: Path):
+    """Tokenize one source: {term: [line numbers]} plus its section headings"""
+    postings = {}
+    sections = []
+    in_math = False
+    with open(path, 'r', errors='replace') as f:
+        for line_no, line in enumerate(f, start=1):
+            heading = SECTION_RE.search(line)
+            if heading:
+                sections.append([line_no, " ".join(heading.group(2).split())])
+            terms, in_math = tokenize_line(line, in_math)
+            for term in terms:
+                lines = postings.setdefault(term, [])
+                if not lines or lines[-1] != line_no:
+                    lines.append(line_no)
+    return postings, sections
+
+class NoteIndex:
+    """Inverted index over all course sources, persisted in INDEX_NAME under the root"""
+
+    def __init__(self, root_dir="~/university"):
+        self.root_dir = Path(root_dir).expanduser()
+        self.index_path = self.root_dir / INDEX_NAME
+        self.files = {}    # "course/rel" -> {"stamp", "course", "kind", "sections", "postings"}
+        self._terms = None
+
+    def load(self):
+        try:
+            with open(self.index_path, 'r') as f:
+                data = json.load(f)
+            if data.get("version") == INDEX_VERSION:
+                self.files = data["files"]
+        except (OSError, ValueError, KeyError):
+            self.files = {}
+
+    def save(self):
+        # Concurrent searches each write through their own temp file
+        fd, tmp_path = tempfile.mkstemp(dir=self.root_dir, prefix=f"{INDEX_NAME}.", suffix=".tmp")
+        try:
+            with os.fdopen(fd, 'w') as f:
+                json.dump({"version": INDEX_VERSION, "files": self.files}, f, separators=(",", ":"))
+            os.chmod(tmp_path, 0o644)
+            os.replace(tmp_path, self.index_path)
+        except BaseException:
+            os.unlink(tmp_path)
+            raise
+
+    def refresh(self, rebuild=False):
+        """Re-tokenize only new or changed sources; returns the number re-indexed"""
+        if rebuild:
+            self.files = {}
+        seen = set()
+        updated = 0
+        for course, sources in scan_sources(self.root_dir).items():
+            for rel, stamp in sources.items():
+                key = f"{course}/{rel}"
+                seen.add(key)
+                entry = self.files.get(key)
+                if entry and entry["stamp"] == list(stamp):
+                    continue
+                postings, sections = index_file(self.root_dir / course / rel)
+                self.files[key] = {
+                    "stamp": list(stamp),
+                    "course": course,
+                    "kind": source_kind(rel),
+                    "sections": sections,
+                    "postings": postings,
+                }
+                updated += 1
+
+        removed = [key for key in self.files if key not in seen]
+        for key in removed:
+            del self.files[key]
+        if updated or removed:
+            self._terms = None
+            self.save()
+        return updated + len(removed)
+
+    @property
+    def terms(self):
+        """term -> [(file key, line numbers)], assembled from the per-file postings"""
+        if self._terms is None:
+            terms = {}
+            for key, entry in self.files.items():
+                for term, lines in entry["postings"].items():
+                    terms.setdefault(term, []).append((key, lines))
+            self._terms = terms
+        return self._terms
+
+    def enclosing_section(self, key, line_no):
+        sections = self.files[key]["sections"]
+        pos = bisect.bisect_right(sections, [line_no, "\uffff"]) - 1
+        return sections[pos][1] if pos >= 0 else ""
+
+    def search(self, query, course="", limit=10):
+        """Rank (file, line) hits: idf-weighted matched terms, full matches in a 3-line window first"""
+        terms = list(dict.fromkeys(query_terms(query)))
+        if not terms:
+            return []
+        n_files = max(len(self.files), 1)
+
+        # (file key, line) -> {term: weight}, counting neighbouring lines at half weight
+        scores = {}
+        direct_lines = {}
+        for term in terms:
+            postings = [(key, lines) for key, lines in self.terms.get(term, [])
+                        if not course or self.files[key]["course"] == course]
+            direct_lines[term] = {key: set(lines) for key, lines in postings}
+            if not postings:
+                continue
+            idf = math.log(1 + n_files / len(postings))
+            for key, lines in postings:
+                for line_no in lines:
+                    for offset, weight in ((0, 1.0), (-1, 0.5), (1, 0.5)):
+                        hit = scores.setdefault((key, line_no + offset), {})
+                        hit[term] = max(hit.get(term, 0.0), idf * weight)
+
+        ranked = []
+        for (key, line_no), matched in scores.items():
+            # Only report lines that contain at least one term themselves
+            direct = sum(1 for term in matched if line_no in direct_lines[term].get(key, ()))
+            if not direct:
+                continue
+            coverage = len(matched) / len(terms)
+            ranked.append((coverage, direct, sum(matched.values()), key, line_no))
+        ranked.sort(key=lambda hit: (-hit[0], -hit[1], -hit[2], hit[3], hit[4]))
+
+        # Keep the best line of each cluster so one paragraph doesn't fill the list
+        results = []
+        taken = set()
+        for coverage, _, score, key, line_no in ranked:
+            if any((key, line_no + d) in taken for d in (-1, 0, 1)):
+                continue
+            taken.add((key, line_no))
+            results.append({
+                "file": key,
+                "line": line_no,
+                "section": self.enclosing_section(key, line_no),
+                "score": round(score, 3),
+                "complete": coverage == 1.0,
+            })
+            if len(results) >= limit:
+                break
+        return results
+
+def read_line(path: Path, line_no: int) -> str:
+    with open(path, 'r', errors='replace') as f:
+        for i, line in enumerate(f, start=1):
+            if i == line_no:
+                return line.strip()
+    return ""
+
+def search_notes(root, query, course="", limit=10, rebuild=False):
+    """Refresh the index under root and print the ranked hits for query"""
+    index = NoteIndex(root)
+    index.load()
+    changed = index.refresh(rebuild=rebuild)
+    if changed:
+        print(f"(indexed {changed} changed files)")
+
+    hits = index.search(query, course, limit)
+    if not hits:
+        print(f"No matches for '{query}'")
+        return
+
+    for hit in hits:
+        section = f" [{hit['section']}]" if hit["section"] else ""
+        marker = "" if hit["complete"] else " (partial)"
+        excerpt = read_line(index.root_dir / hit["file"], hit["line"])
+        print(f"  {hit['file']}:{hit['line']}{section}{marker}")
+        print(f"      {excerpt[:100]}")
+
+def main():
+    parser = argparse.ArgumentParser(description="Search lecture notes and problem sets")
+    parser.add_argument("query", help="Words and/or math commands (e.g. 'dihedral group', '\\otimes')")
+    parser.add_argument("--course", "-c", default="", help="Only search this course")
+    parser.add_argument("--limit", "-n", type=int, default=10, help="Maximum number of hits")
+    parser.add_argument("--root", default="~/university", help="Root directory")
+    parser.add_argument("--rebuild", action="store_true", help="Re-index every file")
+    args = parser.parse_args()
+    search_notes(args.root, args.query, args.course, args.limit, args.rebuild)
+
+if __name__ == "__main__":
+    main()
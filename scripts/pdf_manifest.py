@@ -0,0 +1,200 @@
+#!/usr/bin/env python3
+"""
+Manifest of built PDFs for incremental syncing
+Records the hash, size and course of every PDF under the root in
+.pdf_manifest.json (re-hashing only files whose mtime or size changed), and
+diffs two manifests into the minimal upload and delete lists. A manifest
+stored next to the synced copy is the "previous" one, so the sync only
+transfers what changed.
+
+Usage:
+  python3 pdf_manifest.py update
+  python3 pdf_manifest.py diff remote-manifest.json --upload-list up.txt --delete-list del.txt
+  python3 pdf_manifest.py apply /path/to/synced/copy      # local stand-in for the remote
+"""
+
+import os
+import json
+import shutil
+import hashlib
+import argparse
+import tempfile
+from pathlib import Path
+
+from file_lock import FileLock
+
+MANIFEST_NAME = ".pdf_manifest.json"
+MANIFEST_LOCK_NAME = ".pdf_manifest.lock"
+MANIFEST_VERSION = 1
+
+# Directories under a course that don't name a course themselves
+COURSE_SUBDIRS = {"psets", "figures", "lectures"}
+
+def file_hash(path) -> str:
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+def pdf_course(rel_path: str) -> str:
+    """Course a PDF belongs to: its directory minus trailing psets/figures/lectures"""
+    parts = list(Path(rel_path).parent.parts)
+    while parts and parts[-1] in COURSE_SUBDIRS:
+        parts.pop()
+    return "/".join(parts)
+
+def iter_pdfs(root: Path):
+    """Relative paths of all PDFs under root, skipping hidden directories (.git, caches)"""
+    for dirpath, dirnames, filenames in os.walk(root):
+        dirnames[:] = sorted(d for d in dirnames if not d.startswith('.'))
+        for name in sorted(filenames):
+            if name.endswith(".pdf"):
+                yield Path(dirpath, name).relative_to(root).as_posix()
+
+def load_manifest(path) -> dict:
+    """{relative path: {"sha256", "size", "course", "mtime_ns"}}; empty if missing"""
+    try:
+        with open(path, 'r') as f:
+            data = json.load(f)
+        if data.get("version") == MANIFEST_VERSION:
+            return data["files"]
+    except (OSError, ValueError, KeyError):
+        pass
+    return {}
+
+def save_manifest(path, files):
+    path = Path(path)
+    fd, tmp_path = tempfile.mkstemp(dir=path.parent, prefix=f"{path.name}.", suffix=".tmp")
+    try:
+        with os.fdopen(fd, 'w') as f:
+            json.dump({"version": MANIFEST_VERSION, "files": files}, f, indent=1, sort_keys=True)
+        os.chmod(tmp_path, 0o644)
+        os.replace(tmp_path, path)
+    except BaseException:
+        os.unlink(tmp_path)
+        raise
+
+def manifest_entry(path: Path, rel: str, previous=None):
+    """Entry for one PDF, reusing the previous hash while mtime and size are unchanged"""
+    st = path.stat()
+    if previous and previous.get("mtime_ns") == st.st_mtime_ns and previous.get("size") == st.st_size:
+        return previous
+    return {"sha256": file_hash(path), "size": st.st_size, "course": pdf_course(rel),
+            "mtime_ns": st.st_mtime_ns}
+
+def build_manifest(root, previous=None) -> dict:
+    """Manifest of every PDF under root; only new or modified files are hashed"""
+    root = Path(root).expanduser()
+    previous = previous or {}
+    return {rel: manifest_entry(root / rel, rel, previous.get(rel)) for rel in iter_pdfs(root)}
+
+def update_manifest(root="~/university") -> dict:
+    root = Path(root).expanduser()
+    with FileLock(root / MANIFEST_LOCK_NAME):
+        files = build_manifest(root, load_manifest(root / MANIFEST_NAME))
+        save_manifest(root / MANIFEST_NAME, files)
+    return files
+
+def record_pdf(pdf_file, root="~/university"):
+    """Update the root manifest for one freshly built PDF (called after builds)"""
+    root = Path(root).expanduser()
+    pdf_file = Path(pdf_file)
+    if not pdf_file.exists():
+        return None
+    try:
+        rel = pdf_file.resolve().relative_to(root.resolve()).as_posix()
+    except ValueError:
+        return None  # built outside the root (e.g. another clone): not part of its manifest
+    # Parallel builds record their PDFs at once: read-modify-write under the lock
+    with FileLock(root / MANIFEST_LOCK_NAME):
+        files = load_manifest(root / MANIFEST_NAME)
+        files[rel] = manifest_entry(pdf_file, rel, files.get(rel))
+        save_manifest(root / MANIFEST_NAME, files)
+    return files[rel]
+
+def diff_manifests(old: dict, new: dict):
+    """(upload, delete): paths new or changed in `new`, and paths only in `old`"""
+    upload = sorted(rel for rel, entry in new.items()
+                    if rel not in old or old[rel]["sha256"] != entry["sha256"])
+    delete = sorted(rel for rel in old if rel not in new)
+    return upload, delete
+
+def manifest_for(source) -> dict:
+    """A manifest file, or the manifest of a directory (its stored one, refreshed by scanning)"""
+    source = Path(source).expanduser()
+    if source.is_dir():
+        return build_manifest(source, load_manifest(source / MANIFEST_NAME))
+    return load_manifest(source)
+
+def apply_sync(root, dest) -> tuple:
+    """Mirror root's PDFs into the directory dest, copying and deleting only the differences"""
+    root = Path(root).expanduser()
+    dest = Path(dest).expanduser()
+    if dest.resolve().is_relative_to(root.resolve()):
+        raise ValueError("The sync destination must be outside the root")
+    dest.mkdir(parents=True, exist_ok=True)
+    new = update_manifest(root)
+    upload, delete = diff_manifests(manifest_for(dest), new)
+    for rel in upload:
+        target = dest / rel
+        target.parent.mkdir(parents=True, exist_ok=True)
+        shutil.copy2(root / rel, target)
+    for rel in delete:
+        (dest / rel).unlink(missing_ok=True)
+    # The copy's manifest describes the copy (its own mtimes), for the next diff
+    save_manifest(dest / MANIFEST_NAME, build_manifest(dest, {
+        rel: dict(entry, mtime_ns=(dest / rel).stat().st_mtime_ns) for rel, entry in new.items()
+    }))
+    return upload, delete
+
+def write_list(path, items):
+    with open(path, 'w') as f:
+        f.writelines(f"{item}\n" for item in items)
+
+def main():
+    parser = argparse.ArgumentParser(description="PDF manifest for incremental syncing")
+    parser.add_argument("--root", default="~/university", help="Root directory")
+    subparsers = parser.add_subparsers(dest="action")
+
+    subparsers.add_parser("update", help="Refresh the manifest of all PDFs under the root")
+
+    diff = subparsers.add_parser("diff", help="Upload/delete lists against a previous manifest")
+    diff.add_argument("previous", help="Previous manifest file, or a directory holding the synced copy")
+    diff.add_argument("--upload-list", help="Write paths to upload to this file (one per line)")
+    diff.add_argument("--delete-list", help="Write paths to delete to this file (one per line)")
+
+    apply = subparsers.add_parser("apply", help="Sync PDFs into a local directory standing in for the remote")
+    apply.add_argument("dest")
+
+    args = parser.parse_args()
+
+    if args.action == "diff":
+        new = update_manifest(args.root)
+        upload, delete = diff_manifests(manifest_for(args.previous), new)
+        if args.upload_list:
+            write_list(args.upload_list, upload)
+        if args.delete_list:
+            write_list(args.delete_list, delete)
+        for rel in upload:
+            print(f"+ {rel}")
+        for rel in delete:
+            print(f"- {rel}")
+        size = sum(new[rel]["size"] for rel in upload)
+        print(f"{len(upload)} to upload ({size / 1024:.0f} KB), {len(delete)} to delete, "
+              f"{len(new) - len(upload)} unchanged")
+    elif args.action == "apply":
+        try:
+            upload, delete = apply_sync(args.root, args.dest)
+        except ValueError as e:
+            print(f"❌ {e}")
+            return
+        print(f"✓ Copied {len(upload)}, deleted {len(delete)}")
+    else:
+        files = update_manifest(args.root)
+        courses = {entry["course"] for entry in files.values()}
+        total = sum(entry["size"] for entry in files.values())
+        print(f"✓ {len(files)} PDFs in {len(courses)} courses ({total / 1024 / 1024:.1f} MB)")
+
+if __name__ == "__main__":
+    main()
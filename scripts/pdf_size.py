@@ -0,0 +1,414 @@
+#!/usr/bin/env python3
+"""
+Size attribution and lossless optimization for built PDFs
+Reports how many bytes of a PDF (e.g. master.pdf) each lecture's pages,
+each embedded figure and each font account for, by walking the PDF's
+objects (including compressed object streams) with only the standard
+library. Optionally rewrites the file losslessly, deduplicating identical
+embedded figures and packing objects into compressed object streams, and
+records the before/after sizes in .pdf_sizes.json under the root.
+
+Optimizing needs pikepdf (pip install pikepdf); without it, qpdf is used
+if installed (object streams only, no figure deduplication).
+
+Usage:
+  python3 pdf_size.py math55/master.pdf
+  python3 pdf_size.py math55/master.pdf --top 5
+  python3 pdf_size.py math55/master.pdf --optimize
+"""
+
+import os
+import re
+import json
+import zlib
+import shutil
+import hashlib
+import argparse
+import tempfile
+import subprocess
+from pathlib import Path
+from datetime import datetime
+
+from file_lock import FileLock
+
+try:
+    import pikepdf
+except ImportError:  # optimization falls back to qpdf, attribution still works
+    pikepdf = None
+
+# What optimize_pdf can raise on a malformed PDF, a missing tool or disk trouble
+OPTIMIZE_ERRORS = (RuntimeError, OSError) + ((pikepdf.PdfError,) if pikepdf is not None else ())
+
+SIZES_NAME = ".pdf_sizes.json"
+SIZES_LOCK_NAME = ".pdf_sizes.lock"
+
+OBJ_RE = re.compile(rb"(\d+)\s+(\d+)\s+obj\b")
+REF_RE = re.compile(rb"(\d+)\s+0\s+R\b")
+LENGTH_RE = re.compile(rb"/Length\s+(\d+)(?!\s+\d+\s+R)")
+TYPE_RE = re.compile(rb"/Type\s*/(\w+)")
+SUBTYPE_RE = re.compile(rb"/Subtype\s*/(\w+)")
+BASEFONT_RE = re.compile(rb"/BaseFont\s*/([^\s/<>\[\]()]+)")
+FILENAME_RE = re.compile(rb"/PTEX\.FileName\s*\(([^)]*)\)")
+KIDS_RE = re.compile(rb"/Kids\s*\[([^\]]*)\]")
+NAMED_DEST_RE = re.compile(rb"\(((?:[^()\\]|\\.)*)\)\s*(?:\[\s*(\d+)\s+0\s+R|(\d+)\s+0\s+R)")
+TITLE_RE = re.compile(rb"/Title\s*(?:(\d+)\s+0\s+R|(\(.*?\)(?=\s*/)|<[0-9A-Fa-f\s]*>))", re.S)
+ACTION_RE = re.compile(rb"/A\s*(\d+)\s+0\s+R")
+GOTO_RE = re.compile(rb"/D\s*\(((?:[^()\\]|\\.)*)\)")
+CHAPTER_DEST_RE = re.compile(r"chapter\*?\.(\d+)$")
+
+class PdfObject:
+    __slots__ = ("num", "dict", "stream", "size")
+
+    def __init__(self, num, dict_bytes, stream, size):
+        self.num = num
+        self.dict = dict_bytes    # dictionary (or whole body for non-stream objects)
+        self.stream = stream      # raw stream bytes, or None
+        self.size = size          # bytes of the file this object accounts for
+
+    @property
+    def type(self):
+        match = TYPE_RE.search(self.dict)
+        return match.group(1).decode() if match else ""
+
+    def refs(self):
+        return [int(n) for n in REF_RE.findall(self.dict)]
+
+def pdf_string(raw: bytes) -> str:
+    """Decode a PDF string body: literal (escapes) or <hex>, PDFDocEncoding or UTF-16BE with BOM"""
+    raw = raw.strip()
+    if raw.startswith(b"<"):
+        raw = bytes.fromhex(raw[1:-1].decode())
+    else:
+        if raw.startswith(b"("):
+            raw = raw[1:-1]
+        raw = re.sub(rb"\\([0-7]{1,3})", lambda m: bytes([int(m.group(1), 8) & 0xFF]), raw)
+        raw = re.sub(rb"\\(.)", lambda m: {b"n": b"\n", b"t": b"\t"}.get(m.group(1), m.group(1)), raw)
+    if raw.startswith(b"\xfe\xff"):
+        return raw[2:].decode("utf-16-be", errors="replace")
+    return raw.decode("latin-1")
+
+def parse_objects(data: bytes):
+    """{object number: PdfObject} for top-level and object-stream objects"""
+    objects = {}
+    containers = []
+    pos = 0
+    while True:
+        match = OBJ_RE.search(data, pos)
+        if not match:
+            break
+        num = int(match.group(1))
+        body_start = match.end()
+        end = data.find(b"endobj", body_start)
+        if end < 0:
+            break
+        stream_kw = data.find(b"stream", body_start, end)
+        stream = None
+        if stream_kw >= 0:
+            dict_bytes = data[body_start:stream_kw]
+            start = stream_kw + len(b"stream")
+            start += 2 if data[start:start + 2] == b"\r\n" else 1
+            length = LENGTH_RE.search(dict_bytes)
+            stream_end = start + int(length.group(1)) if length else data.find(b"endstream", start)
+            stream = data[start:stream_end]
+            end = data.find(b"endobj", stream_end)
+        else:
+            dict_bytes = data[body_start:end]
+        end += len(b"endobj")
+        obj = PdfObject(num, dict_bytes, stream, end - match.start())
+        objects[num] = obj
+        if obj.type == "ObjStm":
+            containers.append(obj)
+        pos = end
+
+    # Objects packed in compressed object streams share the container's bytes
+    for container in containers:
+        try:
+            content = zlib.decompress(container.stream) if b"/FlateDecode" in container.dict else container.stream
+            first = int(re.search(rb"/First\s+(\d+)", container.dict).group(1))
+        except (zlib.error, AttributeError):
+            continue
+        header = [int(n) for n in content[:first].split()]
+        offsets = list(zip(header[0::2], header[1::2]))
+        body = content[first:]
+        for i, (num, offset) in enumerate(offsets):
+            end = offsets[i + 1][1] if i + 1 < len(offsets) else len(body)
+            text = body[offset:end]
+            objects[num] = PdfObject(num, text, None, container.size * len(text) / max(len(body), 1))
+        container.size = container.size * (1 - len(body) / max(len(content), 1))  # header share
+    return objects
+
+def page_order(objects):
+    """Page object numbers in document order, following the page tree"""
+    roots = [o for o in objects.values() if o.type == "Pages" and b"/Parent" not in o.dict]
+    pages = []
+    stack = [o.num for o in roots[:1]]
+    while stack:
+        obj = objects.get(stack.pop())
+        if obj is None:
+            continue
+        if obj.type == "Page":
+            pages.append(obj.num)
+            continue
+        kids = KIDS_RE.search(obj.dict)
+        if kids:
+            stack.extend(reversed([int(n) for n in REF_RE.findall(kids.group(1))]))
+    return pages
+
+def lecture_starts(objects, pages):
+    """[(page index, label)] where each chapter (\\lecture) begins, from the named destinations"""
+    page_index = {num: i for i, num in enumerate(pages)}
+    # Outline (bookmark) entries: /Title and a GoTo action, either possibly indirect
+    titles = {}
+    for obj in objects.values():
+        if b"/Parent" not in obj.dict:
+            continue
+        title = TITLE_RE.search(obj.dict)
+        if not title:
+            continue
+        action = ACTION_RE.search(obj.dict)
+        action_dict = objects[int(action.group(1))].dict if action and int(action.group(1)) in objects else obj.dict
+        dest = GOTO_RE.search(action_dict)
+        if not dest:
+            continue
+        if title.group(1):
+            title_obj = objects.get(int(title.group(1)))
+            text = pdf_string(title_obj.dict) if title_obj else ""
+        else:
+            text = pdf_string(title.group(2))
+        chapter = CHAPTER_DEST_RE.match(pdf_string(dest.group(1)))
+        if chapter and text:
+            titles[chapter.group(1)] = text
+
+    starts = {}
+    for obj in objects.values():
+        if b"/Names" not in obj.dict:
+            continue
+        for name, direct, ref in NAMED_DEST_RE.findall(obj.dict):
+            dest = pdf_string(name)
+            chapter = CHAPTER_DEST_RE.match(dest)
+            if not chapter:
+                continue
+            if direct:
+                page = int(direct)
+            else:
+                target = objects.get(int(ref))
+                refs = target.refs() if target else []
+                page = refs[0] if refs else None
+            if page in page_index:
+                label = f"Lecture {chapter.group(1)}"
+                if chapter.group(1) in titles:
+                    label += f": {titles[chapter.group(1)]}"
+                starts[page_index[page]] = label
+    return sorted(starts.items())
+
+def closure(objects, start, claimed, stop):
+    """Objects reachable from start that aren't claimed yet or excluded by stop(obj)"""
+    found = []
+    pending = [start]
+    while pending:
+        num = pending.pop()
+        obj = objects.get(num)
+        if obj is None or num in claimed or (num != start and stop(obj)):
+            continue
+        claimed.add(num)
+        found.append(obj)
+        pending.extend(obj.refs())
+    return found
+
+def attribute_sizes(pdf_file):
+    """Bytes per lecture, figure and font, plus the rest, summing to the file size"""
+    data = Path(pdf_file).read_bytes()
+    objects = parse_objects(data)
+    pages = page_order(objects)
+    claimed = set()
+
+    def is_structural(obj):
+        return obj.type in ("Page", "Pages", "Catalog", "Font")
+
+    fonts = {}
+    for obj in objects.values():
+        if obj.type == "Font":
+            name = BASEFONT_RE.search(obj.dict)
+            label = name.group(1).decode().split("+")[-1] if name else f"font {obj.num}"
+            size = sum(o.size for o in closure(objects, obj.num, claimed, is_structural))
+            fonts[label] = fonts.get(label, 0) + size
+
+    # Top-level figures: XObjects not nested inside another XObject
+    xobjects = [o for o in objects.values() if o.type == "XObject" and o.num not in claimed]
+    nested = set()
+    for obj in xobjects:
+        reach = {o.num for o in closure(objects, obj.num, set(claimed), is_structural)}
+        nested.update(reach - {obj.num})
+    figures = {}
+    for obj in xobjects:
+        if obj.num in nested:
+            continue
+        filename = FILENAME_RE.search(obj.dict)
+        if filename:
+            label = os.path.basename(pdf_string(filename.group(1)))
+        else:
+            subtype = SUBTYPE_RE.search(obj.dict)
+            label = f"{subtype.group(1).decode() if subtype else 'XObject'} {obj.num}"
+        size = sum(o.size for o in closure(objects, obj.num, claimed, is_structural))
+        figures[label] = figures.get(label, 0) + size
+
+    # Page content (and per-page objects such as links) grouped by lecture
+    starts = lecture_starts(objects, pages)
+    lectures = {}
+    for index, num in enumerate(pages):
+        label = "Front matter"
+        for start, lecture in starts:
+            if start <= index:
+                label = lecture
+        page_objs = closure(objects, num, claimed, lambda o: o.type in ("Page", "Pages", "Catalog"))
+        lectures[label] = lectures.get(label, 0) + sum(o.size for o in page_objs)
+
+    attributed = sum(fonts.values()) + sum(figures.values()) + sum(lectures.values())
+    return {
+        "size": len(data),
+        "pages": len(pages),
+        "lectures": lectures,
+        "figures": figures,
+        "fonts": fonts,
+        "other": len(data) - attributed,
+    }
+
+def figure_key(stream):
+    """Identity of an embedded figure: its dictionary (minus lengths) and raw stream bytes"""
+    items = sorted((str(k), repr(v)) for k, v in stream.stream_dict.items() if k not in ("/Length", "/PTEX.FileName"))
+    return hashlib.sha256(repr(items).encode() + stream.read_raw_bytes()).hexdigest()
+
+def dedupe_figures(pdf):
+    """Point every resource dictionary at one copy of each identical XObject; returns duplicates removed"""
+    canonical = {}
+    replaced = 0
+    for obj in pdf.objects:
+        if isinstance(obj, pikepdf.Stream) and obj.get("/Type") == "/XObject":
+            canonical.setdefault(figure_key(obj), obj)
+
+    seen = set()
+    pending = [page.obj for page in pdf.pages]
+    while pending:
+        holder = pending.pop()
+        if holder.objgen != (0, 0):
+            if holder.objgen in seen:
+                continue
+            seen.add(holder.objgen)
+        resources = holder.get("/Resources")
+        xobjects = resources.get("/XObject") if resources is not None else None
+        if xobjects is None:
+            continue
+        for name in list(xobjects.keys()):
+            xobject = xobjects[name]
+            original = canonical.get(figure_key(xobject))
+            if original is not None and original.objgen != xobject.objgen:
+                xobjects[name] = original
+                replaced += 1
+            pending.append(xobjects[name])
+    return replaced
+
+def optimize_pdf(pdf_file):
+    """Rewrite pdf_file losslessly in place; returns (before, after, duplicate figures removed)"""
+    pdf_file = Path(pdf_file)
+    before = pdf_file.stat().st_size
+    tmp_path = pdf_file.with_name(pdf_file.name + ".opt")
+    duplicates = 0
+
+    if pikepdf is not None:
+        try:
+            with pikepdf.open(pdf_file) as pdf:
+                duplicates = dedupe_figures(pdf)
+                pdf.remove_unreferenced_resources()
+                # deterministic_id keeps reproducible builds byte-stable
+                pdf.save(tmp_path, object_stream_mode=pikepdf.ObjectStreamMode.generate,
+                         compress_streams=True, recompress_flate=True, deterministic_id=True)
+        except BaseException:
+            tmp_path.unlink(missing_ok=True)
+            raise
+    elif shutil.which("qpdf"):
+        result = subprocess.run(["qpdf", "--object-streams=generate", "--compress-streams=y",
+                                 "--recompress-flate", "--deterministic-id", str(pdf_file), str(tmp_path)],
+                                capture_output=True, text=True)
+        if result.returncode not in (0, 3):  # 3 = succeeded with warnings
+            tmp_path.unlink(missing_ok=True)
+            raise RuntimeError(result.stderr.strip() or "qpdf failed")
+    else:
+        raise RuntimeError("Optimizing needs pikepdf (pip install pikepdf) or qpdf")
+
+    after = tmp_path.stat().st_size
+    if after < before:
+        os.replace(tmp_path, pdf_file)
+    else:
+        tmp_path.unlink()
+        after = before
+    return before, after, duplicates
+
+def record_sizes(pdf_file, before, after, root_dir="~/university"):
+    """Remember a PDF's size before and after optimization in SIZES_NAME under the root
+
+    Read-modify-write under a lock with an atomic replace, so parallel builds
+    neither lose each other's entries nor leave a truncated file.
+    """
+    root = Path(root_dir).expanduser()
+    path = root / SIZES_NAME
+    try:
+        rel = Path(pdf_file).resolve().relative_to(root.resolve()).as_posix()
+    except ValueError:
+        rel = str(pdf_file)
+    with FileLock(root / SIZES_LOCK_NAME):
+        try:
+            with open(path, 'r') as f:
+                sizes = json.load(f)
+        except (OSError, ValueError):
+            sizes = {}
+        sizes[rel] = {"before": before, "after": after, "optimized": datetime.now().isoformat()}
+        fd, tmp_path = tempfile.mkstemp(dir=root, prefix=f"{SIZES_NAME}.", suffix=".tmp")
+        try:
+            with os.fdopen(fd, 'w') as f:
+                json.dump(sizes, f, indent=2, sort_keys=True)
+            os.chmod(tmp_path, 0o644)
+            os.replace(tmp_path, path)
+        except BaseException:
+            os.unlink(tmp_path)
+            raise
+
+def format_kb(size) -> str:
+    return f"{size / 1024:8.1f} KB"
+
+def print_report(report, top=10):
+    total = report["size"]
+    print(f"📄 {format_kb(total).strip()} in {report['pages']} pages")
+    for title, group in (("Lectures", "lectures"), ("Figures", "figures"), ("Fonts", "fonts")):
+        items = sorted(report[group].items(), key=lambda item: -item[1])
+        if not items:
+            continue
+        group_total = sum(size for _, size in items)
+        print(f"\n{title}: {format_kb(group_total).strip()} ({group_total / total:.0%})")
+        for label, size in items[:top]:
+            print(f"  {format_kb(size)}  {size / total:5.1%}  {label}")
+        if len(items) > top:
+            rest = sum(size for _, size in items[top:])
+            print(f"  {format_kb(rest)}  {rest / total:5.1%}  ({len(items) - top} more)")
+    print(f"\nOther (outlines, structure, xref): {format_kb(report['other']).strip()}")
+
+def main():
+    parser = argparse.ArgumentParser(description="Attribute PDF size and optionally optimize")
+    parser.add_argument("pdf", help="PDF file, e.g. math55/master.pdf")
+    parser.add_argument("--top", type=int, default=10, help="Entries shown per group")
+    parser.add_argument("--optimize", action="store_true", help="Losslessly rewrite the PDF in place")
+    parser.add_argument("--root", default="~/university", help="Root directory (for the size record)")
+    args = parser.parse_args()
+
+    print_report(attribute_sizes(args.pdf), args.top)
+    if args.optimize:
+        try:
+            before, after, duplicates = optimize_pdf(args.pdf)
+        except OPTIMIZE_ERRORS as e:
+            print(f"❌ {e}")
+            return
+        record_sizes(args.pdf, before, after, args.root)
+        print(f"\n✨ {format_kb(before).strip()} → {format_kb(after).strip()} "
+              f"({duplicates} duplicate figures merged)")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,328 @@
+#!/usr/bin/env python3
+"""
+Preamble load-time profiler
+Splits preamble.tex into its \\usepackage lines and definition blocks (named
+by their banner comments) and compiles progressively longer prefixes of it
+in an otherwise empty document. Prefixes are bisected: a span of the
+preamble is only split further while it costs more than the threshold, so
+the expensive items are isolated in a few dozen compiles and cheap runs are
+reported as one group. An item's cost is what its prefix adds over the
+shorter one: wall time, peak memory of the pdflatex process, and TeX main
+memory (words, from the log). Runs go through tex_runner, so a prefix that
+hangs is killed at the pass timeout instead of stalling the profile.
+
+Usage:
+  python3 preamble_profile.py
+  python3 preamble_profile.py --threshold 0.02 --repeat 5
+  python3 preamble_profile.py --exhaustive --json
+  python3 preamble_profile.py --preamble ~/university/preamble.tex
+"""
+
+import os
+import re
+import json
+import argparse
+import tempfile
+from pathlib import Path
+
+from compile_master import MasterCompiler
+from tex_runner import run_supervised
+
+DOCUMENT_CLASS = "report"  # what master.tex and the lecture files use
+PROFILE_NAME = "profile"
+
+DEFAULT_THRESHOLD = 0.03   # seconds; spans cheaper than this are not split
+DEFAULT_REPEAT = 3
+
+PACKAGE_RE = re.compile(r"\\(?:usepackage|RequirePackage)\s*(?:\[[^\]]*\]\s*)?\{([^}]*)\}", re.DOTALL)
+COMMENT_RE = re.compile(r"(?<!\\)%.*")
+# Banners: a rule of = or % around a title line, or "%= Title =" on one line
+RULE_RE = re.compile(r"^%\s*[=%]{5,}\s*$")
+INLINE_BANNER_RE = re.compile(r"^%=\s*(\S.*?)\s*=\s*$")
+TEX_MEMORY_RE = re.compile(r"(\d+) words of memory out of")
+
+def group_depth(code: str) -> int:
+    """Net {/[ nesting a line of code opens (escaped braces don't count)"""
+    depth = 0
+    for i, char in enumerate(code):
+        if i and code[i - 1] == "\\":
+            continue
+        if char in "{[":
+            depth += 1
+        elif char in "}]":
+            depth -= 1
+    return depth
+
+def iter_statements(text: str):
+    """Top-level statements of a preamble, in order
+
+    Yields {"start", "end", "text", "banner", "section"}: 1-based inclusive
+    line numbers, the lines themselves, and the banner comment title above
+    (with a counter that changes at every banner). A statement runs until
+    its {} and [] groups close, and on while the next line opens another
+    argument (\\lstset on one line, {...} on the next). Blank and comment
+    lines come out as statements of their own.
+    """
+    lines = text.splitlines(keepends=True)
+    banner = None
+    section = 0
+    statement = []
+    depth = 0
+    previous_rule = False
+
+    for number, line in enumerate(lines, 1):
+        stripped = line.strip()
+        if not statement:
+            # Banner titles only count between statements
+            inline = INLINE_BANNER_RE.match(stripped)
+            if inline and not RULE_RE.match(stripped):
+                banner = inline.group(1)
+                section += 1
+            elif previous_rule and stripped.startswith("%") and not RULE_RE.match(stripped):
+                title = stripped.strip("%= \t")
+                if title:
+                    banner = title
+                    section += 1
+            previous_rule = bool(RULE_RE.match(stripped)) or (previous_rule and not stripped)
+
+        code = COMMENT_RE.sub("", line)
+        statement.append(line)
+        depth += group_depth(code)
+        if depth > 0:
+            continue
+        depth = 0
+        if code.strip() and number < len(lines) and lines[number].lstrip()[:1] in ("{", "["):
+            continue
+
+        yield {"start": number - len(statement) + 1, "end": number, "text": "".join(statement),
+               "banner": banner, "section": section}
+        statement = []
+
+    if statement:
+        # Unbalanced group at the end of the file
+        yield {"start": len(lines) - len(statement) + 1, "end": len(lines), "text": "".join(statement),
+               "banner": banner, "section": section}
+
+def package_names(statement_text: str):
+    """Package names a \\usepackage statement loads, or None for any other statement"""
+    package = PACKAGE_RE.match(COMMENT_RE.sub("", statement_text).strip())
+    if not package:
+        return None
+    return [name.strip() for name in package.group(1).split(",") if name.strip()]
+
+def split_preamble(text: str):
+    """Units of a preamble in order: one per \\usepackage statement, plus the
+    definition blocks between them, named by the banner comment above them
+
+    Each unit is {"kind": "package" | "block", "name", "start", "end", "text"}
+    with 1-based inclusive line numbers. Statements spanning several lines
+    (package options, \\hypersetup{...}) are never split.
+    """
+    units = []
+    block = None
+
+    def close_block():
+        nonlocal block
+        if block and block["text"].strip():
+            units.append(block)
+        block = None
+
+    for statement in iter_statements(text):
+        if block and block["section"] != statement["section"]:
+            close_block()
+        names = package_names(statement["text"])
+        if names is not None:
+            close_block()
+            units.append({"kind": "package", "name": f"\\usepackage{{{', '.join(names)}}}",
+                          "start": statement["start"], "end": statement["end"], "text": statement["text"]})
+            continue
+        if block is None:
+            if not COMMENT_RE.sub("", statement["text"]).strip():
+                continue  # comments and blank lines between units
+            block = {"kind": "block", "name": statement["banner"], "section": statement["section"],
+                     "start": statement["start"], "end": statement["end"], "text": ""}
+        block["text"] += statement["text"]
+        block["end"] = statement["end"]
+    close_block()
+
+    for unit in units:
+        unit.pop("section", None)
+        if not unit["name"]:
+            unit["name"] = f"definitions (lines {unit['start']}-{unit['end']})"
+        elif unit["kind"] == "block":
+            unit["name"] = f"{unit['name']} (lines {unit['start']}-{unit['end']})"
+    return units
+
+def tex_memory(log_file):
+    """Words of TeX main memory a run used, from its log, or None"""
+    try:
+        with open(log_file, 'r', errors='replace') as f:
+            match = TEX_MEMORY_RE.search(f.read())
+    except OSError:
+        return None
+    return int(match.group(1)) if match else None
+
+class PreambleProfiler:
+    """Measures prefixes of a preamble's units by compiling them in a scratch directory"""
+
+    def __init__(self, preamble_file, repeat=DEFAULT_REPEAT):
+        self.preamble_file = Path(preamble_file)
+        with open(self.preamble_file, 'r') as f:
+            self.units = split_preamble(f.read())
+        self.repeat = max(1, repeat)
+        self.measurements = {}   # prefix length -> {"time", "rss_kb", "words", "ok"}
+        self.compiles = 0
+        self.workdir = None
+
+    def document(self, count):
+        """Empty document loading the first `count` units"""
+        body = "".join(unit["text"] for unit in self.units[:count])
+        return (f"\\documentclass{{{DOCUMENT_CLASS}}}\n\\tracingstats=1\n"
+                f"{body}\n\\begin{{document}}\n\\end{{document}}\n")
+
+    def write_document(self, count):
+        with open(Path(self.workdir) / f"{PROFILE_NAME}.tex", 'w') as f:
+            f.write(self.document(count))
+
+    def run_once(self):
+        """(seconds, peak RSS in KB, success) of one pdflatex run on the scratch document"""
+        env = dict(os.environ)
+        # Resolve anything the preamble reads relative to itself
+        env["TEXINPUTS"] = f"{self.preamble_file.parent}{os.pathsep}{env.get('TEXINPUTS', '')}"
+        command = ["pdflatex", "-interaction=batchmode", "-draftmode", f"{PROFILE_NAME}.tex"]
+        result = run_supervised(command, cwd=self.workdir, env=env, capture=False)
+        self.compiles += 1
+        return result.elapsed, result.max_rss_kb or 0, result.ok
+
+    def measure(self, count):
+        """Cost of the first `count` units: fastest of `repeat` runs, cached"""
+        if count in self.measurements:
+            return self.measurements[count]
+        self.write_document(count)
+        runs = [self.run_once() for _ in range(self.repeat)]
+        self.measurements[count] = {
+            "time": min(run[0] for run in runs),
+            "rss_kb": max(run[1] for run in runs),
+            "words": tex_memory(Path(self.workdir) / f"{PROFILE_NAME}.log"),
+            "ok": all(run[2] for run in runs),
+        }
+        return self.measurements[count]
+
+    def cost(self, start, end):
+        return self.measure(end)["time"] - self.measure(start)["time"]
+
+    def bisect(self, threshold=DEFAULT_THRESHOLD):
+        """Spans (start, end) of units: single expensive units, or runs cheaper than threshold"""
+        spans = []
+        pending = [(0, len(self.units))]
+        while pending:
+            start, end = pending.pop()
+            if end - start <= 1 or self.cost(start, end) < threshold:
+                spans.append((start, end))
+                continue
+            middle = (start + end) // 2
+            pending.extend([(middle, end), (start, middle)])
+        return sorted(spans)
+
+    def profile(self, threshold=DEFAULT_THRESHOLD, exhaustive=False):
+        """Measure the preamble and return its ranked cost report
+
+        Returns {"baseline", "total", "compiles", "items"} with items sorted by
+        time, each {"name", "lines", "units", "time", "rss_kb", "words", "ok"}
+        holding the increase over the prefix before it.
+        """
+        with tempfile.TemporaryDirectory(prefix="preamble-profile-") as workdir:
+            self.workdir = workdir
+            # Warm the file cache with the full preamble so the first package isn't charged for it
+            self.write_document(len(self.units))
+            self.run_once()
+            full = self.measure(len(self.units))
+            baseline = self.measure(0)
+            if exhaustive:
+                spans = [(i, i + 1) for i in range(len(self.units))]
+            else:
+                spans = self.bisect(threshold)
+            items = [self.item(start, end) for start, end in spans]
+        items.sort(key=lambda item: item["time"], reverse=True)
+        return {
+            "baseline": baseline["time"],
+            "total": full["time"] - baseline["time"],
+            "full_ok": full["ok"],
+            "compiles": self.compiles,
+            "items": items,
+        }
+
+    def item(self, start, end):
+        before, after = self.measure(start), self.measure(end)
+        first, last = self.units[start], self.units[end - 1]
+        if end - start == 1:
+            name = first["name"]
+        else:
+            name = f"{end - start} items: {first['name']} … {last['name']}"
+        words = None
+        if before["words"] is not None and after["words"] is not None:
+            words = after["words"] - before["words"]
+        return {
+            "name": name,
+            "lines": [first["start"], last["end"]],
+            "units": end - start,
+            "time": after["time"] - before["time"],
+            "rss_kb": after["rss_kb"] - before["rss_kb"],
+            "words": words,
+            "ok": after["ok"],
+        }
+
+def print_report(report, top=None):
+    total = report["total"]
+    print(f"📊 Preamble load cost: {total * 1000:.0f} ms over the bare {DOCUMENT_CLASS} class "
+          f"({report['baseline'] * 1000:.0f} ms), {report['compiles']} compiles")
+    if not report["full_ok"]:
+        print("⚠️  The full preamble reported errors; costs after the first error are unreliable")
+    print(f"\n{'#':>3}  {'Time':>8} {'Share':>6} {'Memory':>9} {'TeX mem':>9}  {'Lines':<10} Item")
+    items = report["items"][:top] if top else report["items"]
+    for rank, item in enumerate(items, 1):
+        share = item["time"] / total * 100 if total > 0 else 0.0
+        words = f"{item['words']:+,}" if item["words"] is not None else "?"
+        lines = f"{item['lines'][0]}-{item['lines'][1]}"
+        flag = "" if item["ok"] else "  ❌"
+        print(f"{rank:>3}  {item['time'] * 1000:>6.0f}ms {share:>5.1f}% "
+              f"{item['rss_kb'] / 1024:>+7.1f}MB {words:>9}  {lines:<10} {item['name']}{flag}")
+    if top and len(report["items"]) > top:
+        print(f"  ... {len(report['items']) - top} more")
+    print("\nTimes are the fastest of several runs; small negative values are noise.")
+
+def main():
+    parser = argparse.ArgumentParser(description="Rank the load-time cost of each part of preamble.tex")
+    parser.add_argument("--root", default="~/university", help="Root directory")
+    parser.add_argument("--preamble", "-p", help="Preamble to profile (default: the one master builds use)")
+    parser.add_argument("--threshold", type=float, default=DEFAULT_THRESHOLD,
+                        help="Seconds below which a span of the preamble is not split further")
+    parser.add_argument("--repeat", type=int, default=DEFAULT_REPEAT, help="Runs per prefix (fastest is kept)")
+    parser.add_argument("--exhaustive", action="store_true", help="Measure every item instead of bisecting")
+    parser.add_argument("--top", type=int, help="Only show the N most expensive items")
+    parser.add_argument("--json", action="store_true", help="Print the report as JSON")
+    args = parser.parse_args()
+
+    preamble_file = Path(args.preamble).expanduser() if args.preamble else MasterCompiler(args.root).find_preamble()
+    if not preamble_file or not preamble_file.exists():
+        print("❌ preamble.tex not found")
+        return
+
+    profiler = PreambleProfiler(preamble_file, args.repeat)
+    if not args.json:
+        packages = sum(unit["kind"] == "package" for unit in profiler.units)
+        print(f"⏱️  Profiling {preamble_file} ({packages} \\usepackage lines, "
+              f"{len(profiler.units) - packages} definition blocks)")
+    try:
+        report = profiler.profile(args.threshold, args.exhaustive)
+    except FileNotFoundError:
+        print("❌ pdflatex not found. Make sure LaTeX is installed.")
+        return
+
+    if args.json:
+        print(json.dumps(report, indent=2))
+    else:
+        print_report(report, args.top)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,316 @@
+#!/usr/bin/env python3
+"""
+Usage-driven preamble pruning per course
+Scans a course's lectures (the content compile_master.py extracts) for the
+commands and environments they use, follows them through the preamble's
+own definitions, and writes a copy of preamble.tex without the optional
+packages and definitions nothing reaches. Master builds load it with
+compile_master.py --prune-preamble.
+
+Only packages listed in PRUNABLE_PACKAGES (with the commands and
+environments they provide) are ever dropped; everything else in the
+preamble (core packages, \\renewcommand, settings) is kept unless it only
+configures a dropped package. The result is cached in the course directory
+and regenerated when the preamble or a lecture changes; lectures are
+rescanned only when their mtime or size changed, and the file is rewritten
+only when the set of used names changed.
+
+Usage:
+  python3 preamble_prune.py math55
+  python3 preamble_prune.py math55 --report
+"""
+
+import os
+import re
+import json
+import argparse
+import tempfile
+from pathlib import Path
+
+from catalog import file_stamp, get_catalog
+from compile_master import MasterCompiler
+from preamble_profile import COMMENT_RE, PACKAGE_RE, iter_statements, package_names
+
+PRUNED_NAME = ".pruned_preamble.tex"
+STATE_NAME = ".pruned_preamble.json"
+STATE_VERSION = 1
+
+# Optional packages: name -> (commands, environments) they provide. A package
+# stays if the course, or a definition the course reaches, uses any of them.
+PRUNABLE_PACKAGES = {
+    "braket": ("bra ket braket Bra Ket Braket set Set", ""),
+    "lipsum": ("lipsum Lipsum lipsumexp unpacklipsum", ""),
+    "systeme": ("systeme sysdelim syseqsep sysalign syssubstitute sysnosubstitute sysautonum", ""),
+    "mathrsfs": ("mathscr", ""),
+    "bm": ("bm hm", ""),
+    "subcaption": ("subcaption subcaptionbox subref", "subfigure subtable"),
+    "multicol": ("columnbreak", "multicols"),
+    "booktabs": ("toprule midrule bottomrule cmidrule addlinespace specialrule", ""),
+    "algorithm2e": ("SetCommentSty SetKwFunction SetKwInOut SetKw SetAlgoLined DontPrintSemicolon "
+                    "KwIn KwOut KwData KwResult KwRet", "algorithm procedure function"),
+    "listings": ("lstset lstinline lstinputlisting lstdefinestyle lstdefinelanguage", "lstlisting"),
+    "siunitx": ("SI si num qty unit ang SIrange numrange qtyrange sisetup SIlist numlist", ""),
+    "tikz-cd": ("tikzcdset", "tikzcd"),
+    "tikz-3dplot": ("tdplotsetmaincoords tdplotsetrotatedcoords tdplotdrawarc tdplotsetcoord "
+                    "tdplotsphericalsurfaceplot", ""),
+    "tikzsymbols": ("Smiley Sadey Winkey Laughey Neutrey Cooley Innocey Xey Nosey Tongey "
+                    "Walley Sey Annoey Strichmaxerl Chair Bed Coffeecup Cooking Candle Moai", ""),
+    "pgfplots": ("pgfplotsset addplot addlegendentry legend", "axis semilogxaxis semilogyaxis loglogaxis"),
+    "mdframed": ("mdfsetup mdfdefinestyle newmdenv newmdtheoremenv surroundwithmdframed", "mdframed"),
+    "witharrows": ("WithArrowsOptions", "WithArrows DispWithArrows"),
+    "forest": ("forestset Forest", "forest"),
+    "multirow": ("multirow multirowsetup", ""),
+    "tabularx": ("", "tabularx"),
+    "extarrows": ("xlongequal xLongleftarrow xLongrightarrow xLongleftrightarrow xLeftrightarrow "
+                  "xlongleftarrow xlongrightarrow xlongleftrightarrow xleftrightarrow", ""),
+    "biblatex": ("addbibresource printbibliography cite autocite textcite parencite footcite "
+                 "citeauthor citeyear nocite fullcite supercite", ""),
+    "cancel": ("cancel bcancel xcancel cancelto", ""),
+    "tensor": ("tensor indices", ""),
+    "derivative": ("odv pdv fdv jdv mdv adv odif pdif fdif jdif mdif adif derivset "
+                   "NewDerivative RenewDerivative DeclareDerivative NewDifferential", ""),
+    "annotate-equations": ("eqnmark eqnmarkbox annotate annotatetwo eqnhighlightheight "
+                           "eqnhighlightshade", ""),
+    "dashbox": ("dbox", ""),
+    "nicematrix": ("NiceMatrixOptions", "NiceMatrix pNiceMatrix bNiceMatrix BNiceMatrix vNiceMatrix "
+                   "VNiceMatrix NiceArray pNiceArray bNiceArray NiceTabular NiceTabularX NiceMatrixBlock"),
+    "ytableau": ("ydiagram ytableausetup ytableaushort", "ytableau"),
+    "tabularray": ("SetCell SetCells SetHline SetRow SetTblrInner SetTblrOuter SetTblrStyle "
+                   "NewTblrEnviron UseTblrLibrary", "tblr longtblr talltblr"),
+    "stmaryrd": ("llbracket rrbracket llparenthesis rrparenthesis mapsfrom Mapsfrom Mapsto "
+                 "lightning Lbag Rbag lbag rbag sslash bbslash interleave fatsemi varcurlyvee "
+                 "varcurlywedge oblong inplus niplus subsetplus supsetplus", ""),
+    "xfrac": ("sfrac", ""),
+    "comment": ("excludecomment includecomment specialcomment", "comment"),
+    "marginnote": ("marginnote", ""),
+    "stackengine": ("stackon stackunder stackengine Shortstack Longstack stackanchor Centerstack "
+                    "Vectorstack stackinset savestack setstackgap stackMath stackText", ""),
+    "scalerel": ("scalerel stretchrel scaleto scaleobj hstretch vstretch scaleleftright "
+                 "stretchleftright ThisStyle SavedStyle", ""),
+}
+
+# Names the generated master.tex uses itself (templates, glossary, volumes)
+TEMPLATE_NAMES = {
+    "\\course", "\\me", "\\title", "\\author", "\\date", "\\today", "\\maketitle", "\\tableofcontents",
+    "\\pdfbookmark", "\\contentsname", "\\appendix", "\\chapter", "\\item", "\\pageref", "\\includepdf",
+    "\\pagenumbering", "\\newpage", "\\clearpage", "\\pagebreak", "\\Huge", "\\huge", "description",
+}
+
+COMMAND_RE = re.compile(r"\\([A-Za-z@]+)")
+ENV_RE = re.compile(r"\\begin\s*\{([^{}]+)\}")
+NEW_COMMAND_RE = re.compile(r"\\(?:newcommand|providecommand|DeclareRobustCommand|DeclareMathOperator|"
+                            r"NewDocumentCommand|DeclareDocumentCommand|newrobustcmd)\*?\s*\{?\s*\\([A-Za-z@]+)")
+DEF_RE = re.compile(r"\\[egx]?def\s*\\([A-Za-z@]+)")
+LET_RE = re.compile(r"\\let\s*\\([A-Za-z@]+)")
+NEW_ENV_RE = re.compile(r"\\(?:newenvironment|NewDocumentEnvironment|newtcolorbox|newtcbtheorem|NewTColorBox|"
+                        r"DeclareTColorBox|newtheorem|declaretheorem|newmdenv|newmdtheoremenv)\*?\s*"
+                        r"(?:\[[^\]]*\]\s*)?\{([^{}]+)\}")
+
+def names_used(text: str) -> set:
+    """Commands (as '\\name') and environments (as 'name', without '*') a piece of TeX uses"""
+    text = COMMENT_RE.sub("", text)
+    names = {f"\\{name}" for name in COMMAND_RE.findall(text)}
+    names.update(env.strip().rstrip("*") for env in ENV_RE.findall(text))
+    return names
+
+def package_provides():
+    """{name: package} over PRUNABLE_PACKAGES"""
+    provides = {}
+    for package, (commands, environments) in PRUNABLE_PACKAGES.items():
+        provides.update((f"\\{command}", package) for command in commands.split())
+        provides.update((env, package) for env in environments.split())
+    return provides
+
+def classify(statement_text: str):
+    """(kind, packages, defines, references) of one preamble statement
+
+    kind is "package", "definition" (only introduces new names, so it can go
+    when nothing uses them), "setting" (anything else: kept if a used name is
+    \\let to it, or unless it only configures dropped packages) or "comment".
+    """
+    code = COMMENT_RE.sub("", statement_text)
+    if not code.strip():
+        return "comment", [], set(), set()
+    packages = package_names(statement_text)
+    if packages is not None:
+        return "package", packages, set(), set()
+
+    defines = {f"\\{name}" for name in NEW_COMMAND_RE.findall(code)}
+    defined_by_def = {f"\\{name}" for name in DEF_RE.findall(code)}
+    defines |= defined_by_def
+    defines.update(env.strip() for env in NEW_ENV_RE.findall(code))
+    # \def of internals or \the... counters redefines what LaTeX already has
+    internal = any("@" in name or name.startswith("\\the") for name in defined_by_def)
+    if defines and not internal:
+        return "definition", [], defines, names_used(code) - defines
+    # \let\marginpar\marginnote: a setting, but one a course using \marginpar needs
+    defines.update(f"\\{name}" for name in LET_RE.findall(code))
+    return "setting", [], defines, names_used(code) - defines
+
+def prune_preamble(preamble_text: str, used: set):
+    """(pruned text, summary) keeping what `used` reaches through the preamble
+
+    The summary holds the dropped packages and the numbers of definitions
+    and settings dropped.
+    """
+    statements = []
+    for statement in iter_statements(preamble_text):
+        statements.append((statement, *classify(statement["text"])))
+    provides = package_provides()
+    base = set(used) | TEMPLATE_NAMES
+
+    # Fixpoint: kept statements can reach more names, which can keep more packages
+    needed = base
+    while True:
+        needed_packages = {provides[name] for name in needed if name in provides}
+        dropped_names = {name for name, package in provides.items() if package not in needed_packages}
+        keep = []
+        for statement, kind, packages, defines, references in statements:
+            if kind == "definition":
+                keep.append(bool(defines & needed))
+            elif kind == "setting":
+                keep.append(bool(defines & needed) or not (references & dropped_names))
+            else:
+                keep.append(kind == "package")
+        reached = set(base)
+        for kept, (statement, kind, packages, defines, references) in zip(keep, statements):
+            if kept and kind in ("definition", "setting"):
+                reached |= references
+        if reached == needed:
+            break
+        needed = reached
+
+    output = []
+    dropped_packages = []
+    counts = {"definition": 0, "setting": 0}
+    for kept, (statement, kind, packages, defines, references) in zip(keep, statements):
+        if kind == "package":
+            remaining = [p for p in packages if p not in PRUNABLE_PACKAGES or p in needed_packages]
+            dropped_packages += [p for p in packages if p not in remaining]
+            if remaining == packages:
+                output.append(statement["text"])
+            elif remaining:
+                code = COMMENT_RE.sub("", statement["text"])
+                match = PACKAGE_RE.search(code)
+                output.append(code[:match.start(1)] + ",".join(remaining) + code[match.end(1):])
+        elif kept:
+            output.append(statement["text"])
+        elif kind in counts:
+            counts[kind] += 1
+    summary = {
+        "packages": sorted(set(dropped_packages)),
+        "definitions": counts["definition"],
+        "settings": counts["setting"],
+    }
+    return "".join(output), summary
+
+def replace_file(path: Path, text: str):
+    """Write text to path through a temp file of our own, so concurrent builds can't clobber it"""
+    fd, tmp_path = tempfile.mkstemp(dir=path.parent, prefix=f"{path.name}.", suffix=".tmp")
+    try:
+        with os.fdopen(fd, 'w') as f:
+            f.write(text)
+        os.chmod(tmp_path, 0o644)
+        os.replace(tmp_path, path)
+    except BaseException:
+        os.unlink(tmp_path)
+        raise
+
+class PrunedPreamble:
+    """A course's pruned preamble file plus the usage scan it was built from"""
+
+    def __init__(self, root_dir, course_name, preamble_file):
+        self.root_dir = Path(root_dir).expanduser()
+        self.course_name = course_name
+        self.course_path = self.root_dir / course_name
+        self.preamble_file = Path(preamble_file)
+        self.output_file = self.course_path / PRUNED_NAME
+        self.state_file = self.course_path / STATE_NAME
+        self.summary = None
+
+    def load_state(self):
+        try:
+            with open(self.state_file, 'r') as f:
+                data = json.load(f)
+            if data.get("version") == STATE_VERSION:
+                return data
+        except (OSError, ValueError):
+            pass
+        return {}
+
+    def save_state(self, state):
+        replace_file(self.state_file, json.dumps(dict(state, version=STATE_VERSION), separators=(",", ":")))
+
+    def scan(self, previous):
+        """{relative path: {"stamp", "names"}} of the course's lectures, reusing unchanged entries"""
+        extractor = MasterCompiler(self.root_dir)
+        files = {}
+        for lecture in get_catalog(self.root_dir).lecture_files(self.course_name):
+            rel = lecture.relative_to(self.course_path).as_posix()
+            stamp = file_stamp(lecture)
+            entry = previous.get(rel)
+            if entry and entry["stamp"] == (list(stamp) if stamp else None):
+                files[rel] = entry
+                continue
+            files[rel] = {"stamp": list(stamp) if stamp else None,
+                          "names": sorted(names_used(extractor.extract_content(lecture)))}
+        return files
+
+    def ensure(self) -> Path:
+        """Path of the pruned preamble, regenerating it if the preamble or the lectures changed"""
+        state = self.load_state()
+        preamble_stamp = file_stamp(self.preamble_file)
+        preamble_stamp = list(preamble_stamp) if preamble_stamp else None
+        files = self.scan(state.get("files", {}))
+        used = sorted(set().union(*(set(entry["names"]) for entry in files.values())))
+
+        # Same preamble and same set of used names: the file on disk is still right
+        if (self.output_file.exists() and state.get("preamble") == preamble_stamp
+                and state.get("used") == used and state.get("source") == str(self.preamble_file)):
+            self.summary = state.get("summary")
+            if state.get("files") != files:
+                self.save_state(dict(state, files=files))
+            return self.output_file
+
+        with open(self.preamble_file, 'r') as f:
+            text, self.summary = prune_preamble(f.read(), set(used))
+        header = (f"% Generated by preamble_prune.py for {self.course_name} from {self.preamble_file}\n"
+                  f"% Regenerated when the preamble or the lectures change; edit the preamble instead.\n")
+        replace_file(self.output_file, header + text)
+        self.save_state({"source": str(self.preamble_file), "preamble": preamble_stamp, "used": used,
+                         "files": files, "summary": self.summary})
+        return self.output_file
+
+def describe(summary) -> str:
+    packages = summary["packages"]
+    return (f"dropped {len(packages)} packages, {summary['definitions']} definitions "
+            f"and {summary['settings']} settings")
+
+def main():
+    parser = argparse.ArgumentParser(description="Write a course's preamble without what it never uses")
+    parser.add_argument("course", help="Course name")
+    parser.add_argument("--root", default="~/university", help="Root directory")
+    parser.add_argument("--preamble", "-p", help="Preamble to prune (default: the one master builds use)")
+    parser.add_argument("--report", action="store_true", help="List the dropped packages")
+    args = parser.parse_args()
+
+    compiler = MasterCompiler(args.root)
+    preamble_file = Path(args.preamble).expanduser() if args.preamble else compiler.find_preamble()
+    if not preamble_file or not preamble_file.exists():
+        print("❌ preamble.tex not found")
+        return
+    if not (compiler.root_dir / args.course).is_dir():
+        print(f"❌ Course not found: {args.course}")
+        return
+
+    pruned = PrunedPreamble(args.root, args.course, preamble_file)
+    path = pruned.ensure()
+    print(f"✂️  {args.course}: {describe(pruned.summary)}")
+    print(f"✓ Wrote {path}")
+    if args.report and pruned.summary["packages"]:
+        print("\nDropped packages:")
+        for package in pruned.summary["packages"]:
+            print(f"  • {package}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,285 @@
+#!/usr/bin/env python3
+"""
+Supervised runner for TeX and figure-export subprocesses
+Runs pdflatex/ipetoipe jobs with a wall-clock timeout, CPU and memory
+rlimits, stdin closed (so an interactive prompt ends the run instead of
+hanging it) and in their own process group, so a timeout or cancel kills
+the whole job including anything it spawned. Each run returns a JobResult
+with a structured exit reason and the job's own resource usage.
+
+Usage:
+  python3 tex_runner.py --timeout 60 -- pdflatex -interaction=nonstopmode master.tex
+"""
+
+import os
+import sys
+import signal
+import argparse
+import tempfile
+import threading
+import subprocess
+import time
+
+from tracing import span
+
+try:
+    import resource
+except ImportError:  # Windows: no rlimits or per-job usage; timeouts still apply
+    resource = None
+
+# Defaults for one pdflatex pass
+TEX_TIMEOUT = 300.0       # seconds of wall-clock time
+TEX_MEMORY_MB = 4096      # address space
+# ipetoipe exports a single figure
+IPE_TIMEOUT = 60.0
+
+# Seconds between SIGTERM and SIGKILL when stopping a job
+KILL_GRACE = 2.0
+# Extra CPU seconds between the soft limit (SIGXCPU) and the hard one (SIGKILL)
+CPU_GRACE = 5
+
+# Exit reasons
+OK = "ok"
+FAILED = "failed"              # exited with a nonzero status
+TIMEOUT = "timeout"
+CPU_LIMIT = "cpu_limit"
+MEMORY_LIMIT = "memory_limit"
+SIGNALED = "signaled"          # killed by a signal we didn't send
+CANCELLED = "cancelled"
+
+# Messages allocation failures print when the address-space limit is hit
+OUT_OF_MEMORY_MARKERS = ("cannot allocate memory", "out of memory", "memory exhausted",
+                         "memory allocation failed")
+OUT_OF_MEMORY_SIGNALS = {signal.SIGSEGV, signal.SIGABRT, getattr(signal, "SIGBUS", signal.SIGSEGV)}
+
+class JobResult:
+    """Outcome of one supervised run"""
+    __slots__ = ("command", "reason", "returncode", "elapsed", "cpu_seconds", "max_rss_kb",
+                 "stdout", "stderr", "limits")
+
+    def __init__(self, command, reason, returncode, elapsed, cpu_seconds=None, max_rss_kb=None,
+                 stdout="", stderr="", limits=None):
+        self.command = command
+        self.reason = reason
+        self.returncode = returncode
+        self.elapsed = elapsed
+        self.cpu_seconds = cpu_seconds
+        self.max_rss_kb = max_rss_kb
+        self.stdout = stdout
+        self.stderr = stderr
+        self.limits = limits or {}
+
+    @property
+    def ok(self):
+        return self.reason == OK
+
+    def describe(self) -> str:
+        """Short human-readable reason, e.g. 'timed out after 300s'"""
+        if self.reason == OK:
+            return f"finished in {self.elapsed:.1f}s"
+        if self.reason == TIMEOUT:
+            return f"timed out after {self.limits.get('timeout', self.elapsed):g}s"
+        if self.reason == CPU_LIMIT:
+            return f"exceeded the {self.limits.get('cpu_seconds'):g}s CPU limit"
+        if self.reason == MEMORY_LIMIT:
+            return f"exceeded the {self.limits.get('memory_mb')} MB memory limit"
+        if self.reason == CANCELLED:
+            return "was cancelled"
+        if self.reason == SIGNALED:
+            try:
+                return f"was killed by {signal.Signals(-self.returncode).name}"
+            except ValueError:
+                return f"was killed by signal {-self.returncode}"
+        return f"exited with status {self.returncode}"
+
+    def to_dict(self):
+        return {"command": self.command, "reason": self.reason, "returncode": self.returncode,
+                "elapsed": self.elapsed, "cpu_seconds": self.cpu_seconds, "max_rss_kb": self.max_rss_kb}
+
+def rlimits(cpu_seconds, memory_mb):
+    """[(resource, (soft, hard))] for the given CPU and memory limits"""
+    limits = []
+    if cpu_seconds:
+        soft = max(1, int(cpu_seconds))
+        limits.append((resource.RLIMIT_CPU, (soft, soft + CPU_GRACE)))
+    if memory_mb:
+        limit = int(memory_mb) * 1024 * 1024
+        limits.append((resource.RLIMIT_AS, (limit, limit)))
+    return limits
+
+def set_limits(limits, pid=None):
+    """Apply rlimits to a running child (Linux prlimit) or, with no pid, to this process"""
+    for which, values in limits:
+        try:
+            if pid is None:
+                resource.setrlimit(which, values)
+            else:
+                resource.prlimit(pid, which, values)
+        except (ValueError, OSError):
+            pass  # not enforceable here (RLIMIT_AS on macOS); the timeout still bounds the job
+
+def kill_group(process, exited, grace=KILL_GRACE):
+    """SIGTERM the job's process group, then SIGKILL it if `exited` isn't set in time
+
+    `exited` is the Event the reaping thread sets; the group is killed even
+    after the leader exits, so nothing it spawned outlives the job.
+    """
+    try:
+        if os.name == "posix":
+            os.killpg(process.pid, signal.SIGTERM)
+        else:
+            process.terminate()
+    except (ProcessLookupError, PermissionError):
+        return
+    exited.wait(grace)
+    try:
+        if os.name == "posix":
+            os.killpg(process.pid, signal.SIGKILL)
+        else:
+            process.kill()
+    except (ProcessLookupError, PermissionError):
+        pass
+
+def classify(returncode, cpu_seconds, output, limits, stopped):
+    """Exit reason of a finished job"""
+    if stopped:
+        return stopped
+    if returncode == 0:
+        return OK
+    if returncode < 0:
+        sig = -returncode
+        if sig == getattr(signal, "SIGXCPU", None):
+            return CPU_LIMIT
+        if sig == signal.SIGKILL and limits.get("cpu_seconds") and cpu_seconds is not None \
+                and cpu_seconds >= limits["cpu_seconds"]:
+            return CPU_LIMIT
+        if limits.get("memory_mb") and sig in OUT_OF_MEMORY_SIGNALS:
+            return MEMORY_LIMIT
+        return SIGNALED
+    if limits.get("memory_mb") and any(marker in output[-4000:].lower() for marker in OUT_OF_MEMORY_MARKERS):
+        return MEMORY_LIMIT
+    return FAILED
+
+def run_supervised(command, cwd=None, env=None, timeout=TEX_TIMEOUT, cpu_seconds=None,
+                   memory_mb=TEX_MEMORY_MB, cancel=None, capture=True) -> JobResult:
+    """Run one command under supervision and wait for it
+
+    cpu_seconds defaults to the timeout (a single-threaded job can't use
+    more). `cancel` is an optional threading.Event; setting it stops the job
+    with reason "cancelled". Raises FileNotFoundError if the program is
+    missing, like subprocess.run. Ctrl-C kills the job before propagating.
+    """
+    command = [str(part) for part in command]
+    with span(os.path.basename(command[0]), "subprocess", command=command, cwd=str(cwd or "")) as trace:
+        if cpu_seconds is None:
+            cpu_seconds = timeout
+        limits = {"timeout": timeout, "cpu_seconds": cpu_seconds, "memory_mb": memory_mb}
+
+        popen_args = {"cwd": cwd, "env": env, "stdin": subprocess.DEVNULL}
+        if os.name == "posix":
+            popen_args["start_new_session"] = True  # own process group, for kill_group
+        child_limits = rlimits(cpu_seconds, memory_mb) if resource is not None else []
+        # prlimit after the fork is safe with other jobs' threads running; preexec_fn isn't
+        use_prlimit = hasattr(resource, "prlimit")
+        if child_limits and not use_prlimit:
+            popen_args["preexec_fn"] = lambda: set_limits(child_limits)
+
+        # Output goes to temporary files: no pipe to fill up, and no reader threads
+        with tempfile.TemporaryFile() as out, tempfile.TemporaryFile() as err:
+            if capture:
+                popen_args.update(stdout=out, stderr=err)
+            else:
+                popen_args.update(stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+
+            started = time.perf_counter()
+            process = subprocess.Popen(command, **popen_args)
+            if child_limits and use_prlimit:
+                set_limits(child_limits, process.pid)
+            usage = {}
+            done = threading.Event()
+
+            def reap():
+                # wait4 gives this job's own rusage, which stays correct with parallel jobs
+                if hasattr(os, "wait4"):
+                    _, status, rusage = os.wait4(process.pid, 0)
+                    process.returncode = os.waitstatus_to_exitcode(status)
+                    usage["cpu"] = rusage.ru_utime + rusage.ru_stime
+                    # ru_maxrss is KB on Linux, bytes on macOS
+                    usage["rss"] = rusage.ru_maxrss // 1024 if sys.platform == "darwin" else rusage.ru_maxrss
+                else:
+                    process.wait()
+                usage["elapsed"] = time.perf_counter() - started
+                done.set()
+
+            waiter = threading.Thread(target=reap, daemon=True)
+            waiter.start()
+
+            stopped = None
+            deadline = started + timeout if timeout else None
+            try:
+                while not done.is_set():
+                    wait = 0.5 if cancel is not None else None
+                    if deadline is not None:
+                        remaining = deadline - time.perf_counter()
+                        wait = remaining if wait is None else min(wait, remaining)
+                        if remaining <= 0:
+                            stopped = TIMEOUT
+                            break
+                    if done.wait(wait):
+                        break
+                    if cancel is not None and cancel.is_set():
+                        stopped = CANCELLED
+                        break
+            except KeyboardInterrupt:
+                kill_group(process, done)
+                waiter.join()
+                raise
+            if stopped and not done.is_set():
+                kill_group(process, done)
+            else:
+                stopped = None
+            waiter.join()
+            if os.name == "posix":
+                # Anything the job left running in its group goes with it
+                try:
+                    os.killpg(process.pid, signal.SIGKILL)
+                except (ProcessLookupError, PermissionError):
+                    pass
+
+            stdout = stderr = ""
+            if capture:
+                out.seek(0)
+                err.seek(0)
+                stdout = out.read().decode(errors="replace")
+                stderr = err.read().decode(errors="replace")
+
+        reason = classify(process.returncode, usage.get("cpu"), stdout + stderr, limits, stopped)
+        trace.update(reason=reason, returncode=process.returncode, cpu_seconds=usage.get("cpu"),
+                     max_rss_kb=usage.get("rss"))
+        return JobResult(command, reason, process.returncode, usage["elapsed"], usage.get("cpu"),
+                         usage.get("rss"), stdout, stderr, limits)
+
+def main():
+    parser = argparse.ArgumentParser(description="Run a command under the TeX job supervisor")
+    parser.add_argument("--timeout", type=float, default=TEX_TIMEOUT, help="Wall-clock limit in seconds")
+    parser.add_argument("--cpu", type=float, help="CPU-time limit in seconds (default: the timeout)")
+    parser.add_argument("--memory", type=int, default=TEX_MEMORY_MB, help="Address-space limit in MB")
+    parser.add_argument("command", nargs=argparse.REMAINDER, help="Command to run (after --)")
+    args = parser.parse_args()
+
+    command = args.command[1:] if args.command[:1] == ["--"] else args.command
+    if not command:
+        parser.error("a command is required")
+    try:
+        result = run_supervised(command, timeout=args.timeout, cpu_seconds=args.cpu,
+                                memory_mb=args.memory, capture=False)
+    except FileNotFoundError:
+        print(f"❌ {command[0]} not found")
+        sys.exit(127)
+    status = "✓" if result.ok else "❌"
+    print(f"{status} {command[0]} {result.describe()} "
+          f"(cpu {result.cpu_seconds or 0:.1f}s, peak {(result.max_rss_kb or 0) / 1024:.0f} MB)")
+    sys.exit(0 if result.ok else 1)
+
+if __name__ == "__main__":
+    main()
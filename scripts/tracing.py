@@ -0,0 +1,212 @@
+#!/usr/bin/env python3
+"""
+Span tracing shared by the scripts, in Chrome trace format
+With UNI_TRACE set, file scans, JSON loads and saves, lecture extraction
+and every subprocess are recorded as spans (name, arguments, start and
+duration, process and thread) and appended to one trace file when the
+script exits or its buffer fills, so a day of compile_master/ipe-figures/
+academic_cli runs ends up on a single timeline. Open the file in chrome://tracing or
+https://ui.perfetto.dev.
+
+UNI_TRACE=1 writes to ~/university/.trace.json; any other value is the
+trace file path. Unset, span() returns a shared no-op and traced() leaves
+functions untouched, so the instrumentation costs next to nothing.
+
+Usage:
+  UNI_TRACE=1 python3 compile_master.py math55
+  python3 tracing.py                # time per span name
+  python3 tracing.py --clear
+"""
+
+import os
+import sys
+import json
+import time
+import atexit
+import argparse
+import threading
+from pathlib import Path
+from functools import wraps
+
+from file_lock import FileLock
+
+TRACE_ENV = "UNI_TRACE"
+DEFAULT_TRACE = "~/university/.trace.json"
+
+def trace_path(value=None):
+    """Trace file for a UNI_TRACE value, or None when tracing is off"""
+    value = os.environ.get(TRACE_ENV, "") if value is None else value
+    if not value or value == "0":
+        return None
+    return Path(DEFAULT_TRACE if value == "1" else value).expanduser()
+
+TRACE_FILE = trace_path()
+ENABLED = TRACE_FILE is not None
+
+# Buffered events are appended to the trace file once there are this many
+TRACE_FLUSH_EVENTS = 5000
+
+# Events of this process, written out at exit or when the buffer fills
+_events = []
+_events_lock = threading.Lock()
+
+class _NullArgs(dict):
+    """Span arguments of a disabled span: updates are dropped"""
+    __slots__ = ()
+
+    def __setitem__(self, key, value):
+        pass
+
+    def update(self, *args, **kwargs):
+        pass
+
+class _NullSpan:
+    __slots__ = ()
+
+    def __enter__(self):
+        return _NULL_ARGS
+
+    def __exit__(self, *exc):
+        return False
+
+_NULL_ARGS = _NullArgs()
+_NULL_SPAN = _NullSpan()
+
+class Span:
+    """One timed region; entering it returns its argument dict for results known only at the end"""
+    __slots__ = ("name", "category", "args", "wall_ns", "start_ns")
+
+    def __init__(self, name, category, args):
+        self.name = name
+        self.category = category
+        self.args = args
+
+    def __enter__(self):
+        self.wall_ns = time.time_ns()  # wall clock, so spans of different processes line up
+        self.start_ns = time.perf_counter_ns()
+        return self.args
+
+    def __exit__(self, exc_type, exc, tb):
+        duration_ns = time.perf_counter_ns() - self.start_ns
+        if exc_type is not None:
+            self.args["error"] = exc_type.__name__
+        record({"name": self.name, "cat": self.category, "ph": "X", "ts": self.wall_ns // 1000,
+                "dur": duration_ns // 1000, "pid": os.getpid(), "tid": threading.get_native_id(),
+                "args": self.args})
+        return False
+
+def span(name, category="", **args):
+    """Context manager timing a region as a trace span
+
+    with span("json.load", "io", path=str(path)):
+        data = json.load(f)
+    """
+    if not ENABLED:
+        return _NULL_SPAN
+    return Span(name, category, args)
+
+def traced(name=None, category=""):
+    """Decorator recording each call of a function as a span"""
+    def decorate(function):
+        if not ENABLED:
+            return function
+        span_name = name or function.__qualname__
+
+        @wraps(function)
+        def wrapper(*args, **kwargs):
+            with Span(span_name, category, {}):
+                return function(*args, **kwargs)
+        return wrapper
+    return decorate
+
+def record(event):
+    with _events_lock:
+        _events.append(event)
+        full = len(_events) >= TRACE_FLUSH_EVENTS
+    if full:
+        flush()
+
+def process_metadata():
+    """Metadata event naming this process after its script"""
+    script = Path(sys.argv[0]).name if sys.argv and sys.argv[0] else "python"
+    return {"name": "process_name", "ph": "M", "pid": os.getpid(), "tid": threading.get_native_id(),
+            "args": {"name": f"{script} ({os.getpid()})"}}
+
+def flush():
+    """Append this process's events to the trace file
+
+    The file is a JSON array without its closing bracket, which trace viewers
+    accept; that lets concurrent processes append under a lock without
+    rewriting what's there.
+    """
+    with _events_lock:
+        events = list(_events)
+        _events.clear()
+    if not events or TRACE_FILE is None:
+        return
+    lines = "".join(json.dumps(event, separators=(",", ":"), default=str) + ",\n"
+                    for event in [process_metadata()] + events)
+    try:
+        TRACE_FILE.parent.mkdir(parents=True, exist_ok=True)
+        with FileLock(TRACE_FILE.with_name(TRACE_FILE.name + ".lock")):
+            with open(TRACE_FILE, 'a') as f:
+                if f.tell() == 0:
+                    f.write("[\n")
+                f.write(lines)
+    except (OSError, TimeoutError) as e:
+        print(f"⚠️  Could not write trace {TRACE_FILE}: {e}", file=sys.stderr)
+
+if ENABLED:
+    atexit.register(flush)
+
+def read_trace(path):
+    """Events of a trace file"""
+    with open(path, 'r') as f:
+        text = f.read().strip()
+    if not text:
+        return []
+    if not text.endswith("]"):
+        text = text.rstrip(",") + "]"
+    return json.loads(text)
+
+def summarize(events):
+    """[(name, count, total seconds, longest seconds)] of complete spans, by total time"""
+    totals = {}
+    for event in events:
+        if event.get("ph") != "X":
+            continue
+        count, total, longest = totals.get(event["name"], (0, 0, 0))
+        duration = event.get("dur", 0) / 1e6
+        totals[event["name"]] = (count + 1, total + duration, max(longest, duration))
+    return sorted(((name, *values) for name, values in totals.items()), key=lambda row: -row[2])
+
+def main():
+    parser = argparse.ArgumentParser(description="Summarize or clear the span trace")
+    parser.add_argument("trace", nargs="?", help=f"Trace file (default: ${TRACE_ENV} or {DEFAULT_TRACE})")
+    parser.add_argument("--clear", action="store_true", help="Delete the trace file")
+    parser.add_argument("--top", type=int, default=20, help="Span names to show")
+    args = parser.parse_args()
+
+    path = Path(args.trace).expanduser() if args.trace else (TRACE_FILE or trace_path("1"))
+    if args.clear:
+        path.unlink(missing_ok=True)
+        print(f"✓ Cleared {path}")
+        return
+    try:
+        events = read_trace(path)
+    except (OSError, ValueError) as e:
+        print(f"❌ Could not read {path}: {e}")
+        sys.exit(1)
+
+    rows = summarize(events)
+    if not rows:
+        print("No spans recorded")
+        return
+    print(f"{'span':<28} {'calls':>7} {'total':>10} {'longest':>10}")
+    for name, count, total, longest in rows[:args.top]:
+        print(f"{name:<28} {count:>7} {total:>9.3f}s {longest:>9.3f}s")
+    processes = len({event.get("pid") for event in events})
+    print(f"\n{len(events)} events from {processes} processes in {path}")
+
+if __name__ == "__main__":
+    main()